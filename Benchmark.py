@@ -0,0 +1,264 @@
+import os
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen") # Qt objects are created but never shown --> no display needed
+
+import argparse
+import json
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from Detection import BACKENDS, detectShapes
+from Export import ExportThread
+from Pipeline import HeadlessViewer
+from Tracking import assign
+import SyntheticData
+
+
+class Signal:
+    """Stand-in for a pyqtSignal that records the time of every emit."""
+    def __init__(self):
+        self.times = []
+
+    def emit(self, *args):
+        self.times.append(time.perf_counter())
+
+class Progress:
+    """Stand-in for the thread objects that Image and ImageViewer methods emit progress bar signals to."""
+    def __init__(self):
+        self.startPbar = Signal()
+        self.incrementPbar = Signal()
+        self.finishPbar = Signal()
+
+class StageResult:
+    """Timing and memory measurements of one pipeline stage."""
+    def __init__(self, name, numItems, total, latencies, peak):
+        self.name = name
+        self.numItems = numItems # Number of images/rows processed in the stage
+        self.total = total # Wall time of the whole stage in seconds
+        self.latencies = latencies # Per item latencies in seconds
+        self.peak = peak # Peak traced memory in bytes
+
+    def toDict(self):
+        """Returns the result as a dictionary of JSON serializable values, times in ms and memory in MB."""
+        lat = np.array(self.latencies) * 1000 if len(self.latencies) else np.zeros(1)
+        return {
+            "stage": self.name,
+            "items": self.numItems,
+            "total_ms": self.total * 1000,
+            "throughput_per_s": self.numItems / self.total if self.total > 0 else float("inf"),
+            "p50_ms": float(np.percentile(lat, 50)),
+            "p90_ms": float(np.percentile(lat, 90)),
+            "p99_ms": float(np.percentile(lat, 99)),
+            "peak_mb": self.peak / 2**20,
+        }
+
+def measure(name, items, func):
+    """
+    Runs func on every item, measuring the latency of each call and the peak memory of the stage.
+    Args:
+      name: Name of the stage.
+      items: List of items to pass to func. Use [None] for stages that run once.
+      func: Function to benchmark, called as func(item).
+    Returns:
+      StageResult of the stage.
+    """
+    tracemalloc.start()
+    latencies = []
+    start = time.perf_counter()
+    for item in items:
+        t0 = time.perf_counter()
+        func(item)
+        latencies.append(time.perf_counter() - t0)
+    total = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return StageResult(name, len(items), total, latencies, peak)
+
+def runPipeline(path, outPath, bfParams, trParams):
+    """
+    Benchmarks every stage of the analysis pipeline on an experiment folder.
+    Args:
+      path: Experiment folder in any of the supported folder structures.
+      outPath: Folder to export the Excel workbook to.
+      bfParams: (threshold, (min radius, max radius)) for spheroid detection.
+      trParams: (threshold, (min radius, max radius)) for sensor detection.
+    Returns:
+      List of StageResults in pipeline order.
+    """
+    results = []
+
+    # Loading is a single call, so per image latencies are taken from the progress bar increments
+    viewer = HeadlessViewer(path)
+    progress = Progress()
+    result = measure("getImages", [progress], viewer.getImages)
+    ticks = progress.startPbar.times[:1] + progress.incrementPbar.times
+    if len(ticks) > 1:
+        result.latencies = list(np.diff(ticks))
+    result.numItems = len(viewer.bfImages.list) + len(viewer.trImages.list)
+    results.append(result)
+
+    # Sensors are detected first, spheroids without sensors in them are dropped when detecting spheroids
+    results.append(measure("drawEllipse", viewer.trImages.list, lambda img: img.drawEllipse(trParams[0], trParams[1], Progress())))
+    results.append(measure("drawCircle", viewer.bfImages.list, lambda img: img.drawCircle(bfParams[0], bfParams[1], Progress())))
+    # Sensors again, searched for around the spheroids only (see ImageCollection.cropSensors)
+    viewer.trImages.cropSensors = True
+    results.append(measure("drawEllipse cropped", viewer.trImages.list, lambda img: img.drawEllipse(trParams[0], trParams[1], Progress())))
+    viewer.trImages.cropSensors = False
+
+    # Same detection in worker processes, frames go through shared memory. Workers are started before timing.
+    # Per image latencies are the time between completions.
+    viewer.trImages.detectAll(viewer.trImages.list[:1], trParams[0], trParams[1], True)
+    progress = Progress()
+    result = measure("detectAll", [None], lambda _: viewer.trImages.detectAll(viewer.trImages.list, trParams[0], trParams[1], True, progress))
+    result.latencies = list(np.diff(progress.startPbar.times + progress.incrementPbar.times))
+    result.numItems = len(progress.incrementPbar.times)
+    results.append(result)
+
+    viewer.setBaseImage(sorted(viewer.bfImages.map.keys())[0])
+    def matchShapes(img):
+        img.base_shapes = {}
+        for i in range(len(img.shapes)):
+            img.getClosestBaseShape(i)
+    results.append(measure("getClosestBaseShape", viewer.bfImages.list + viewer.trImages.list, matchShapes))
+
+    thread = ExportThread(viewer.bfImages, viewer.trImages, "all-excel", outPath)
+    results.append(measure("exportExcel", [None], lambda _: thread.exportExcel(*thread.getAllData())))
+
+    # Images are exported in parallel, so per image latencies are the time between completions
+    thread = ExportThread(viewer.bfImages, viewer.trImages, "all-images", outPath)
+    thread.startPbar, thread.incrementPbar, thread.finishPbar = Signal(), Signal(), Signal()
+    result = measure("exportAllImages", [None], lambda _: thread.exportAllImages())
+    result.latencies = list(np.diff(thread.startPbar.times + thread.incrementPbar.times))
+    result.numItems = len(thread.incrementPbar.times)
+    results.append(result)
+    return results
+
+def scoreShapes(shapes, truth):
+    """
+    Matches detected shapes one to one with the true shapes, closest first. A detected shape matches a true shape if
+    its centre is within half the true radius.
+    Args:
+      shapes: List of detected shape data. (Ellipse: [(x,y),(w,h),ang,id] ; Circle: [(x,y),r,id])
+      truth: List of true shapes without ids, see SyntheticData.plateShapes()
+    Returns:
+      (number of matches, list of centre errors, list of radius errors) Errors in pixels, one per match.
+    """
+    radius = lambda shape: max(shape[1]) / 2 if isinstance(shape[1], (tuple, list)) else shape[1]
+    if not shapes or not truth:
+        return 0, [], []
+    found = np.array([(shape[0][0], shape[0][1], radius(shape)) for shape in shapes], dtype=float)
+    true = np.array([(shape[0][0], shape[0][1], radius(shape)) for shape in truth], dtype=float)
+    dists = np.hypot(found[:, None, 0] - true[None, :, 0], found[:, None, 1] - true[None, :, 1])
+    cost = np.where(dists <= true[None, :, 2] / 2, dists, np.inf)
+    rows, cols = assign(cost)
+    return len(rows), dists[rows, cols].tolist(), np.abs(found[rows, 2] - true[cols, 2]).tolist()
+
+def runBackends(viewer, truth, bfParams, trParams, backends=None):
+    """
+    Benchmarks detection backends on both channels against the true shapes of a synthetic experiment, so the fastest
+    accurate backend of every channel can be picked. Spheroids (BF) are detected as circles, sensors (TR) as ellipses.
+    Args:
+      viewer: HeadlessViewer with the images of the experiment loaded.
+      truth: Dictionary of {normalized image path : list of true shapes}, see SyntheticData.plateShapes()
+      bfParams: (threshold, (min radius, max radius)) for spheroid detection.
+      trParams: (threshold, (min radius, max radius)) for sensor detection.
+      backends: (Optional) List of backend names, all of BACKENDS by default.
+    Returns:
+      List of dictionaries, one per channel and backend, with the StageResult values and the precision, recall,
+      mean centre error and mean radius error of the detected shapes.
+    """
+    rows = []
+    for channel, images, (threshold, radiusRange), ellipse in (("BF", viewer.bfImages.list, bfParams, False),
+                                                               ("TR", viewer.trImages.list, trParams, True)):
+        for name in backends or list(BACKENDS):
+            found = {}
+            def detect(img):
+                found[img.path] = detectShapes(img.originalImg, threshold, radiusRange, ellipse, backend=name)
+            for img in images:
+                img.originalImg # Decoded before timing
+            row = measure(name + " " + channel, images, detect).toDict()
+            scores = [scoreShapes(found[img.path], truth[os.path.normpath(img.path)]) for img in images]
+            matches = sum(score[0] for score in scores)
+            numFound = sum(len(shapes) for shapes in found.values())
+            numTrue = sum(len(truth[os.path.normpath(img.path)]) for img in images)
+            centreErrors = [error for score in scores for error in score[1]]
+            radiusErrors = [error for score in scores for error in score[2]]
+            row.update({"backend": name, "channel": channel,
+                        "precision": matches / numFound if numFound else float("nan"),
+                        "recall": matches / numTrue if numTrue else float("nan"),
+                        "centre_error_px": float(np.mean(centreErrors)) if centreErrors else float("nan"),
+                        "radius_error_px": float(np.mean(radiusErrors)) if radiusErrors else float("nan")})
+            rows.append(row)
+    return rows
+
+def printBackendResults(rows):
+    """Prints the results of runBackends() as a table."""
+    header = "{:<10}{:<8}{:>10}{:>10}{:>11}{:>8}{:>13}{:>13}"
+    print(header.format("backend", "channel", "p50 ms", "p90 ms", "precision", "recall", "centre err", "radius err"))
+    for r in rows:
+        print("{:<10}{:<8}{:>10.2f}{:>10.2f}{:>11.2f}{:>8.2f}{:>13.1f}{:>13.1f}".format(
+            r["backend"], r["channel"], r["p50_ms"], r["p90_ms"], r["precision"], r["recall"], r["centre_error_px"], r["radius_error_px"]))
+
+def printResults(numImages, results):
+    """Prints the results of a single dataset as a table."""
+    print("\n{} images per channel".format(numImages))
+    header = "{:<22}{:>8}{:>12}{:>12}{:>10}{:>10}{:>10}{:>10}"
+    print(header.format("stage", "items", "total ms", "items/s", "p50 ms", "p90 ms", "p99 ms", "peak MB"))
+    for result in results:
+        r = result.toDict()
+        print("{:<22}{:>8}{:>12.1f}{:>12.1f}{:>10.2f}{:>10.2f}{:>10.2f}{:>10.1f}".format(
+            r["stage"], r["items"], r["total_ms"], r["throughput_per_s"], r["p50_ms"], r["p90_ms"], r["p99_ms"], r["peak_mb"]))
+
+def main():
+    """Command line entry point. Run with --help for arguments."""
+    parser = argparse.ArgumentParser(description="Benchmark the image analysis pipeline on synthetic data.")
+    parser.add_argument("--sizes", default="5,20", help="Comma separated numbers of days to benchmark")
+    parser.add_argument("--layout", choices=SyntheticData.LAYOUTS[:2], default="timelapse")
+    parser.add_argument("--width", type=int, default=1024)
+    parser.add_argument("--height", type=int, default=1024)
+    parser.add_argument("--spheroids", type=int, default=4)
+    parser.add_argument("--sensors", type=int, default=2, help="Sensors per spheroid")
+    parser.add_argument("--noise", type=float, default=25.0)
+    parser.add_argument("--drift", type=float, default=6.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--backends", default=",".join(BACKENDS), help="Comma separated detection backends to compare, empty to skip")
+    parser.add_argument("--json", help="Optional file to write all results to as JSON")
+    args = parser.parse_args()
+
+    bfParams, trParams = (120, (40, 500)), (120, (10, 100)) # Defaults of Image
+    backends = [name for name in args.backends.split(",") if name]
+    allResults = []
+    for numImages in [int(n) for n in args.sizes.split(",")]:
+        tmpDir = tempfile.mkdtemp(prefix="cmed_bench_")
+        try:
+            dataPath = os.path.join(tmpDir, "Experiment") + "/"
+            outPath = os.path.join(tmpDir, "Export") + "/"
+            os.makedirs(outPath)
+            shapes = []
+            paths = SyntheticData.generateDataset(dataPath, args.layout, numImages, (args.width, args.height), args.spheroids,
+                                                  args.sensors, args.noise, args.drift, seed=args.seed, truth=shapes)
+            results = runPipeline(dataPath, outPath, bfParams, trParams)
+            backendResults = []
+            if backends:
+                truth = {}
+                for (bfPath, trPath), (circles, ellipses) in zip(paths, shapes):
+                    truth[os.path.normpath(bfPath)], truth[os.path.normpath(trPath)] = circles, ellipses
+                viewer = HeadlessViewer(dataPath)
+                viewer.getImages(Progress())
+                backendResults = runBackends(viewer, truth, bfParams, trParams, backends)
+        finally:
+            shutil.rmtree(tmpDir, ignore_errors=True)
+        printResults(numImages, results)
+        if backendResults:
+            printBackendResults(backendResults)
+        allResults.append({"images": numImages, "stages": [result.toDict() for result in results], "backends": backendResults})
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "results": allResults}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import csv
+import importlib.util
+
+# Tidy long format --> one row per shape per day
+COLUMNS = ("day", "type", "id", "spheroid", "area", "x", "y", "major", "minor", "angle",
+           "area_strain", "radial_strain", "circumferential_strain")
+TEXT_COLUMNS = ("day", "type", "id", "spheroid")
+FORMATS = {"csv": ".csv", "parquet": ".parquet", "feather": ".feather", "hdf5": ".h5"} # Supported formats and their extensions
+APPENDABLE_FORMATS = ("csv", "hdf5") # Formats that rows can be appended to without rewriting the file
+LIBRARIES = {"parquet": "pyarrow", "feather": "pyarrow", "hdf5": "h5py"} # Optional libraries the formats need
+
+
+def isAvailable(format_):
+    """Returns True if the library needed to write a format is installed, without importing it"""
+    library = LIBRARIES.get(format_)
+    return library is None or importlib.util.find_spec(library) is not None
+
+
+class CsvWriter:
+    """Writes tidy rows to a CSV file. Rows are flushed to disk after every day."""
+    def __init__(self, path, append=False):
+        self.file = open(path, "a" if append else "w", newline="")
+        self.writer = csv.writer(self.file)
+        if not append:
+            self.writer.writerow(COLUMNS)
+
+    def write(self, rows):
+        self.writer.writerows([[row[col] for col in COLUMNS] for row in rows])
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+class ArrowWriter:
+    """Writes tidy rows to a Parquet (one row group per day) or Feather file. Requires pyarrow."""
+    def __init__(self, path, format_):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("pyarrow is required to export {} files. Install it with 'pip install pyarrow'".format(format_))
+        self.pa = pa
+        self.schema = pa.schema([(col, pa.string() if col in TEXT_COLUMNS else pa.float64()) for col in COLUMNS])
+        if format_ == "parquet":
+            self.writer = pq.ParquetWriter(path, self.schema)
+        else:
+            # Feather V2 is the Arrow IPC file format
+            self.writer = pa.ipc.new_file(path, self.schema)
+
+    def write(self, rows):
+        columns = [[row[col] for row in rows] for col in COLUMNS]
+        self.writer.write_table(self.pa.Table.from_arrays([self.pa.array(col, field.type) for col, field in zip(columns, self.schema)],
+                                                          schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+class Hdf5Writer:
+    """Writes tidy rows to an HDF5 file, one resizable dataset per column. Requires h5py."""
+    def __init__(self, path, append=False):
+        try:
+            import h5py
+        except ImportError:
+            raise ImportError("h5py is required to export HDF5 files. Install it with 'pip install h5py'")
+        if append:
+            self.file = h5py.File(path, "a")
+            self.length = len(self.file[COLUMNS[0]])
+            return
+        self.file = h5py.File(path, "w")
+        self.length = 0
+        for col in COLUMNS:
+            dtype = h5py.string_dtype() if col in TEXT_COLUMNS else "f8"
+            self.file.create_dataset(col, shape=(0,), maxshape=(None,), dtype=dtype, chunks=True)
+
+    def write(self, rows):
+        for col in COLUMNS:
+            dataset = self.file[col]
+            dataset.resize((self.length + len(rows),))
+            dataset[self.length:] = [row[col] for row in rows]
+        self.length = self.length + len(rows)
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+def openWriter(path, format_, append=False):
+    """
+    Opens a tidy data writer.
+    Args:
+      path: File path without extension. Ex. r"C:/User/Rahul/Export/Experiment - Shapes"
+      format_: One of the keys of FORMATS
+      append: (Default value = False) Appends to an existing file instead of replacing it. Only for APPENDABLE_FORMATS.
+    Returns:
+      Writer object with write(rows) and close() methods. Rows are dictionaries with a value for every column of COLUMNS.
+    """
+    path = path + FORMATS[format_]
+    if append and format_ not in APPENDABLE_FORMATS:
+        raise ValueError("Can't append to {} files. Appendable formats are {}".format(format_, APPENDABLE_FORMATS))
+    if format_ == "csv":
+        return CsvWriter(path, append)
+    elif format_ in ("parquet", "feather"):
+        return ArrowWriter(path, format_)
+    elif format_ == "hdf5":
+        return Hdf5Writer(path, append)
+    raise ValueError("Unknown format '{}'. Expected one of {}".format(format_, tuple(FORMATS)))
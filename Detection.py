@@ -0,0 +1,400 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+# Shape detection on 8-bit grayscale frames. Only numpy and OpenCV are used, no Image or Qt objects,
+# so these functions can run in worker processes (see SharedFrames).
+
+
+def significantContours(img, threshold, minRadius, offset=(0, 0)):
+    """
+    Finds the contours of the bright regions of an image that are big enough to be a shape.
+    Args:
+      img: Numpy array of 8-bit grayscale image.
+      threshold: Integer value to run binary thresholding on. Pixel values below this will be turned black, above white.
+      minRadius: Minimum radius in pixels. Contours with a smaller area than a circle of this radius are dropped.
+      offset: (Default value = (0, 0)) (x, y) added to every contour point. Ex. position of img in a larger image.
+    Returns:
+      List of OpenCV contours.
+    """
+    _, thresh = cv2.threshold(img, threshold, np.max(img), cv2.THRESH_BINARY)
+
+    # Retrieval modes and contour approximation types found on OpenCV docs
+    raw_contours, _ = cv2.findContours(thresh, cv2.RETR_TREE, cv2.CHAIN_APPROX_NONE, offset=offset)
+
+    # Most items in raw contours are lines or small shapes
+    return [contour for contour in raw_contours if cv2.contourArea(contour) >= np.pi * minRadius ** 2]
+
+def fitCircles(contours, maxRadius, callback=None):
+    """
+    Fits circles to contours.
+    Args:
+      contours: List of OpenCV contours. Ex. from significantContours()
+      maxRadius: Maximum radius in pixels, larger circles are dropped.
+      callback: (Optional) Called with no arguments after every contour.
+    Returns:
+      List of circles numbered starting from 1. Ex. [[(x, y), r, "1"], ...]
+    """
+    circle_coords = []
+    for contour in contours:
+        if callback is not None:
+            callback()
+        (x, y), r = cv2.minEnclosingCircle(contour) # Fits contours to a circle shape
+        if r > maxRadius:
+            continue
+        circle_coords.append([(x, y), r, str(len(circle_coords) + 1)])
+    return circle_coords
+
+def fitEllipses(contours, maxRadius, callback=None):
+    """
+    Fits ellipses to contours.
+    Args:
+      contours: List of OpenCV contours. Ex. from significantContours()
+      maxRadius: Maximum size in pixels, ellipses with a larger axis are dropped.
+      callback: (Optional) Called with no arguments after every contour.
+    Returns:
+      List of ellipses numbered starting from 1. Ex. [[(x, y), (w, h), ang, "1"], ...]
+    """
+    ellipse_coords = []
+    for contour in contours:
+        if callback is not None:
+            callback()
+        (x, y), (w, h), ang = cv2.fitEllipse(contour)
+        if max(w, h) > maxRadius:
+            continue
+        ellipse_coords.append([(x, y), (w, h), ang, str(len(ellipse_coords) + 1)])
+    return ellipse_coords
+
+def circleMask(points, circles):
+    """
+    Args:
+      points: List of (x, y) points.
+      circles: List of circles. Ex. [[(x, y), r, "1"], ...]
+    Returns:
+      Numpy bool array of points x circles, True where a point is inside a circle. Same test as Image.isPointInsideCircle
+    """
+    points = np.array(points, dtype=float).reshape(-1, 2)
+    centres = np.array([circle[0] for circle in circles], dtype=float).reshape(-1, 2)
+    radii = np.array([circle[1] for circle in circles], dtype=float)
+    dists = (centres[None, :, 0] - points[:, None, 0]) ** 2 + (centres[None, :, 1] - points[:, None, 1]) ** 2
+    return radii[None, :] ** 2 - dists >= 0
+
+def shapesInCircles(shapes, circles):
+    """
+    Keeps the shapes with their centre inside any circle (Ex. sensors within spheroids) and numbers them again starting
+    from 1, top to bottom then left to right, so the numbers don't depend on the shapes outside of the circles.
+    Args:
+      shapes: List of shape data. (Ellipse: [(x,y),(w,h),ang,id] ; Circle: [(x,y),r,id])
+      circles: List of circles. Ex. [[(x, y), r, "1"], ...]
+    Returns:
+      List of the shapes inside the circles.
+    """
+    inside = circleMask([shape[0] for shape in shapes], circles).any(axis=1)
+    kept = sorted((shape for shape, keep in zip(shapes, inside) if keep), key=lambda shape: (shape[0][1], shape[0][0], shape[1:-1]))
+    return [shape[:-1] + [str(i + 1)] for i, shape in enumerate(kept)]
+
+def windowContours(img, threshold, minRadius, window, circle):
+    """
+    Finds the significant contours in a window of an image, see significantContours().
+    Args:
+      img: Numpy array of 8-bit grayscale image.
+      threshold: Integer value to run binary thresholding on.
+      minRadius: Minimum radius in pixels.
+      window: (x0, y0, x1, y1) Window in image pixels.
+      circle: Circle the window is around. Ex. [(x, y), r, "1"]
+    Returns:
+      List of OpenCV contours in image coordinates that aren't cut by the window edges (but may be by the image edges).
+      None if a contour cut by the window reaches into the square around the circle, as it may belong to the circle.
+    """
+    height, width = img.shape[:2]
+    x0, y0, x1, y1 = window
+    (x, y), r = circle[0], circle[1]
+    if x1 <= x0 or y1 <= y0:
+        return [] # Circle outside of the image
+    # Only whether pixels are above the threshold matters to findContours, not their value
+    _, thresh = cv2.threshold(img[y0:y1, x0:x1], threshold, 255, cv2.THRESH_BINARY)
+    raw_contours, _ = cv2.findContours(thresh, cv2.RETR_TREE, cv2.CHAIN_APPROX_NONE, offset=(x0, y0))
+
+    contours = []
+    for contour in raw_contours:
+        bx, by, bw, bh = cv2.boundingRect(contour)
+        if (bx == x0 > 0) or (by == y0 > 0) or (bx + bw == x1 < width) or (by + bh == y1 < height):
+            # Contours are checked before the area, a cut piece may be smaller than the whole contour
+            if bx <= x + r and bx + bw >= x - r and by <= y + r and by + bh >= y - r:
+                return None
+            continue
+        if cv2.contourArea(contour) >= np.pi * minRadius ** 2:
+            contours.append(contour)
+    return contours
+
+def detectInCircles(img, threshold, radiusRange, ellipse, circles, workers=1):
+    """
+    Detects circles or ellipses only in windows around circles (Ex. sensors within spheroids). Only the windows are
+    thresholded and searched, so sparse frames take a fraction of the time of the full frame.
+    Args:
+      img: Numpy array of 8-bit grayscale image.
+      threshold: Integer value to run binary thresholding on.
+      radiusRange: (int, int) Minimum and maximum radius range to consider in pixels.
+      ellipse: True to fit ellipses, False to fit circles.
+      circles: List of circles to search. Ex. [[(x, y), r, "1"], ...]
+      workers: (Default value = 1) Number of windows searched at once in threads, OpenCV releases the GIL.
+    Returns:
+      List of shape data, the same as shapesInCircles(detectShapes(img, threshold, radiusRange, ellipse), circles).
+      None if a window cuts through a contour that may be inside its circle, the full frame has to be searched then.
+    """
+    height, width = img.shape[:2]
+    pad = radiusRange[1] # Larger shapes are dropped anyway
+    windows = []
+    for circle in circles:
+        (x, y), r = circle[0], circle[1]
+        windows.append((max(int(x - r - pad), 0), max(int(y - r - pad), 0),
+                        min(int(np.ceil(x + r + pad)) + 1, width), min(int(np.ceil(y + r + pad)) + 1, height)))
+
+    search = lambda window, circle: windowContours(img, threshold, radiusRange[0], window, circle)
+    if workers > 1 and len(circles) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(search, windows, circles))
+    else:
+        results = list(map(search, windows, circles))
+
+    shapes = []
+    for k, contours in enumerate(results):
+        if contours is None:
+            return None
+        found = fitEllipses(contours, radiusRange[1]) if ellipse else fitCircles(contours, radiusRange[1])
+        # Shapes inside several circles are kept from the window of the first one only
+        inside = circleMask([shape[0] for shape in found], circles)
+        shapes.extend(shape for shape, row in zip(found, inside) if row.any() and row.argmax() == k)
+    return shapesInCircles(shapes, circles)
+
+def detectShapes(img, threshold, radiusRange, ellipse, circles=None, workers=1, backend="contour", params=None):
+    """
+    Detects circles or ellipses in an image, same as Image.drawCircle and Image.drawEllipse without drawing.
+    Args:
+      img: Numpy array of 8-bit grayscale image.
+      threshold: Integer value to run binary thresholding on.
+      radiusRange: (int, int) Minimum and maximum radius range to consider in pixels.
+      ellipse: True to fit ellipses, False to fit circles.
+      circles: (Optional) List of circles. Only shapes inside them are kept, see detectInCircles()
+      workers: (Default value = 1) Number of windows around the circles searched at once.
+      backend: (Default value = "contour") Name of the detection backend in BACKENDS.
+      params: (Optional) Dictionary of backend parameters, the declared defaults are used for the missing ones.
+    Returns:
+      List of shape data. (Ellipse: [(x,y),(w,h),ang,id] ; Circle: [(x,y),r,id])
+    """
+    engine = BACKENDS[backend]
+    if circles:
+        shapes = engine.detectInCircles(img, threshold, radiusRange, ellipse, circles, workers, params)
+        if shapes is not None:
+            return shapes
+    shapes = engine.detect(img, threshold, radiusRange, ellipse, params)
+    return shapesInCircles(shapes, circles) if circles else shapes
+
+def numberShapes(rows, ellipse):
+    """
+    Args:
+      rows: Iterable of (x, y, radius) of round shapes.
+      ellipse: True to give ellipses, False to give circles.
+    Returns:
+      List of shape data numbered starting from 1. Ellipses have both axes equal to the diameter.
+    """
+    if ellipse:
+        return [[(float(x), float(y)), (2 * float(r), 2 * float(r)), 0.0, str(i + 1)] for i, (x, y, r) in enumerate(rows)]
+    return [[(float(x), float(y)), float(r), str(i + 1)] for i, (x, y, r) in enumerate(rows)]
+
+def sizeLimits(radiusRange, ellipse):
+    """Returns (minimum, maximum) radius of a kept shape. The maximum of ellipses limits their longest axis, see fitEllipses()"""
+    return radiusRange[0], radiusRange[1] / 2 if ellipse else radiusRange[1]
+
+def thresholdMask(img, threshold, scale=1.0):
+    """
+    Args:
+      img: Numpy array of 8-bit grayscale image.
+      threshold: Pixels above this are 1, the others 0. Same thresholding as significantContours()
+      scale: (Default value = 1.0) Downsampling factor, the mask is averaged over the pixels it shrinks.
+    Returns:
+      Numpy float32 mask of the image with values from 0 to 1.
+    """
+    mask = (img > threshold).astype(np.float32)
+    if scale < 1:
+        mask = cv2.resize(mask, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return mask
+
+
+class Backend:
+    """
+    Detection engine. Every backend finds shapes in the pixels above (or below) a threshold, so the threshold and
+    radius range mean the same for all of them. Extra parameters are declared in params and passed as a dictionary.
+    """
+    name = "" # Key in BACKENDS
+    label = "" # Name shown to users
+    params = [] # Extra parameters: (key, label, default, (minimum, maximum)), like OptionsDialog.OPTION_FIELDS
+
+    def defaults(self, params=None):
+        """Returns a dictionary of every declared parameter, the given values replacing the defaults"""
+        values = {key: default for key, _, default, _ in self.params}
+        values.update((key, value) for key, value in (params or {}).items() if key in values)
+        return values
+
+    def detect(self, img, threshold, radiusRange, ellipse, params=None, start=None, callback=None):
+        """
+        Args:
+          img: Numpy array of 8-bit grayscale image.
+          threshold: Integer value to run binary thresholding on.
+          radiusRange: (int, int) Minimum and maximum radius range to consider in pixels.
+          ellipse: True to give ellipses, False to give circles.
+          params: (Optional) Dictionary of extra parameters, see defaults()
+          start: (Optional) Called as start(number of steps) once the number of steps is known.
+          callback: (Optional) Called with no arguments after every step.
+        Returns:
+          List of shape data numbered starting from 1. (Ellipse: [(x,y),(w,h),ang,id] ; Circle: [(x,y),r,id])
+        """
+        raise NotImplementedError
+
+    def detectInCircles(self, img, threshold, radiusRange, ellipse, circles, workers=1, params=None):
+        """
+        Detects the shapes inside circles only, see Detection.detectInCircles().
+        Returns:
+          None if the backend can't search windows on their own, the whole image is searched then.
+        """
+        return None
+
+class ContourBackend(Backend):
+    """Thresholding, contours and a circle or ellipse fitted to every contour. Exact outlines, the reference engine."""
+    name = "contour"
+    label = "Contours"
+
+    def detect(self, img, threshold, radiusRange, ellipse, params=None, start=None, callback=None):
+        contours = significantContours(img, threshold, radiusRange[0])
+        if start is not None:
+            start(len(contours))
+        if ellipse:
+            return fitEllipses(contours, radiusRange[1], callback)
+        return fitCircles(contours, radiusRange[1], callback)
+
+    def detectInCircles(self, img, threshold, radiusRange, ellipse, circles, workers=1, params=None):
+        return detectInCircles(img, threshold, radiusRange, ellipse, circles, workers)
+
+class HoughBackend(Backend):
+    """
+    Circle Hough transform of the threshold mask, downsampled so the smallest shapes are a few pixels wide.
+    Meant for large round spheroids (BF), the cost barely grows with the size or number of shapes.
+    """
+    name = "hough"
+    label = "Hough Circles"
+    params = [
+        ("minPixels", "Smallest Radius After Downsampling (px)", 8, (3, 64)),
+        ("perfectness", "Circle Perfectness", 0.6, (0.1, 1.0)),
+    ]
+
+    def detect(self, img, threshold, radiusRange, ellipse, params=None, start=None, callback=None):
+        params = self.defaults(params)
+        if start is not None:
+            start(1)
+        minRadius, maxRadius = sizeLimits(radiusRange, ellipse)
+        scale = min(params["minPixels"] / max(minRadius, 1), 1.0)
+        small = (thresholdMask(img, threshold, scale) * 255).astype(np.uint8)
+        # Spheroids don't overlap, so centres are at least two minimum radii apart
+        found = cv2.HoughCircles(small, cv2.HOUGH_GRADIENT_ALT, 1.5, max(2 * minRadius * scale, 1), param1=300,
+                                 param2=params["perfectness"], minRadius=max(int(minRadius * scale), 1),
+                                 maxRadius=int(np.ceil(maxRadius * scale)) + 1)
+        if callback is not None:
+            callback()
+        if found is None:
+            return []
+        rows = found[0].astype(float) / scale
+        rows = rows[(rows[:, 2] >= minRadius) & (rows[:, 2] <= maxRadius)]
+        return numberShapes(rows, ellipse)
+
+class BlobBackend(Backend):
+    """
+    Scale-space blob detector. The threshold mask is downsampled, then the Difference of Gaussians (an approximation
+    of the scale-normalized Laplacian of Gaussian) is taken over a stack of scales and its local extrema in space and
+    scale are blobs, bright or dark. All scales are searched at once with numpy. Meant for small round sensors (TR).
+    """
+    name = "blob"
+    label = "Laplacian of Gaussian Blobs"
+    params = [
+        ("levels", "Scales per Radius Range", 10, (3, 40)),
+        ("contrast", "Minimum Blob Contrast", 0.3, (0.01, 1.0)),
+        ("minPixels", "Smallest Radius After Downsampling (px)", 4, (2, 64)),
+    ]
+
+    def detect(self, img, threshold, radiusRange, ellipse, params=None, start=None, callback=None):
+        params = self.defaults(params)
+        if start is not None:
+            start(2) # Scale space, then its extrema
+        minRadius, maxRadius = sizeLimits(radiusRange, ellipse)
+        if maxRadius < minRadius:
+            return []
+        scale = min(params["minPixels"] / max(minRadius, 1), 1.0)
+        mask = thresholdMask(img, threshold, scale)
+
+        # A disk of radius r gives its strongest response at sigma = r / sqrt(2), one scale is added on both sides
+        levels = int(params["levels"])
+        sigmas = np.geomspace(minRadius, max(maxRadius, minRadius * 1.01), levels) * scale / np.sqrt(2)
+        step = (sigmas[-1] / sigmas[0]) ** (1 / max(levels - 1, 1))
+        sigmas = np.concatenate([[sigmas[0] / step], sigmas, [sigmas[-1] * step, sigmas[-1] * step ** 2]])
+        # Scales are blurred on a mask halved in size for every doubling of sigma (a pyramid), so every blur is small.
+        # The differences are brought back to the size of the mask, where all scales are compared at once.
+        height, width = mask.shape
+        pyramid = {1: mask}
+        dog = np.empty((len(sigmas) - 1, height, width), np.float32)
+        for i, (before, sigma) in enumerate(zip(sigmas[:-1], sigmas[1:])):
+            factor = 2 ** int(np.log2(before / sigmas[0]))
+            if factor not in pyramid:
+                pyramid[factor] = cv2.resize(mask, (max(width // factor, 1), max(height // factor, 1)), interpolation=cv2.INTER_AREA)
+            small = pyramid[factor]
+            diff = (cv2.GaussianBlur(small, (0, 0), before / factor, borderType=cv2.BORDER_REPLICATE) -
+                    cv2.GaussianBlur(small, (0, 0), sigma / factor, borderType=cv2.BORDER_REPLICATE))
+            dog[i] = cv2.resize(diff, (width, height), interpolation=cv2.INTER_LINEAR) if factor > 1 else diff
+        np.abs(dog, out=dog) # Bright and dark blobs alike
+        dog /= step - 1 # Scale normalized
+        if callback is not None:
+            callback()
+
+        # Local maxima over the 3x3x3 neighbourhood in space and scale, only the scales of the radius range are kept.
+        # The neighbourhood is only looked up at the few points above the contrast.
+        spatial = np.empty_like(dog)
+        for i in range(len(dog)):
+            cv2.dilate(dog[i], np.ones((3, 3), np.uint8), dst=spatial[i])
+        level, ys, xs = np.nonzero(dog[1:-1] > params["contrast"])
+        inside = (ys > 0) & (ys < height - 1) & (xs > 0) & (xs < width - 1)
+        level, ys, xs = level[inside], ys[inside], xs[inside]
+        inner = dog[1:-1]
+        strength = inner[level, ys, xs]
+        peak = strength >= np.maximum(np.maximum(spatial[level, ys, xs], spatial[level + 1, ys, xs]), spatial[level + 2, ys, xs])
+        level, ys, xs, strength = level[peak], ys[peak], xs[peak], strength[peak]
+
+        # Sub-pixel centres by fitting a parabola through each peak and its neighbours
+        def offset(minus, centre, plus):
+            curve = minus - 2 * centre + plus
+            return np.where(curve < 0, 0.5 * (minus - plus) / np.where(curve < 0, curve, -1), 0.0)
+        dx = offset(inner[level, ys, xs - 1], strength, inner[level, ys, xs + 1])
+        dy = offset(inner[level, ys - 1, xs], strength, inner[level, ys + 1, xs])
+        ds = offset(dog[level, ys, xs], strength, dog[level + 2, ys, xs]) # In scales, they're evenly spaced in log
+        # Pixel centres are at +0.5, same convention as the coordinates of cv2.resize
+        rows = np.column_stack([(xs + dx + 0.5) / scale - 0.5, (ys + dy + 0.5) / scale - 0.5,
+                                np.sqrt(2 * sigmas[level + 1] * sigmas[level + 2]) * step ** ds / scale])
+        keep = (rows[:, 2] >= minRadius) & (rows[:, 2] <= maxRadius)
+        rows, strength = rows[keep], strength[keep]
+
+        # The same blob can peak at neighbouring positions, weaker blobs centred inside a stronger one are dropped
+        order = np.argsort(-strength, kind="stable")
+        rows = rows[order]
+        kept = np.ones(len(rows), dtype=bool)
+        for i in range(len(rows)):
+            if kept[i]:
+                inside = np.hypot(rows[i + 1:, 0] - rows[i, 0], rows[i + 1:, 1] - rows[i, 1]) < rows[i, 2]
+                kept[i + 1:] &= ~inside
+        rows = rows[kept]
+        if callback is not None:
+            callback()
+        return numberShapes(rows[np.lexsort((rows[:, 0], rows[:, 1]))], ellipse)
+
+BACKENDS = {backend.name: backend for backend in (ContourBackend(), HoughBackend(), BlobBackend())} # Registry of detection engines by name
+
+def registerBackend(backend):
+    """Adds a detection backend (a Backend instance) to BACKENDS, replacing the one with the same name"""
+    BACKENDS[backend.name] = backend
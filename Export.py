@@ -1,8 +1,29 @@
 from PyQt5 import QtCore, QtGui, QtWidgets
-import xlsxwriter
 from numpy import pi
 import cv2
 
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import hashlib
+import json
+import os
+
+from ColumnarExport import APPENDABLE_FORMATS, FORMATS, LIBRARIES, isAvailable, openWriter
+from Strain import getSpheroidNum, strainTable
+
+IMAGE_FORMATS = {"png": ".png", "jpeg": ".jpg", "webp": ".webp"} # Supported image export formats and their extensions
+
+# Default image export settings
+IMAGE_OPTIONS = {
+    "format": "png",      # One of IMAGE_FORMATS
+    "pngCompression": 3,  # 0 (fastest, largest) to 9 (slowest, smallest)
+    "jpegQuality": 95,    # 0 to 100
+    "webpQuality": 95,    # 1 to 100, above 100 is lossless
+    "scale": 1.0,         # Downscale factor, 1 keeps full resolution
+    "workers": os.cpu_count() or 1, # Number of images rendered and encoded in parallel
+}
+
+MANIFEST_NAME = ".cmed_manifest.json" # Written next to exported files, records what they were exported from
+
 class ExportThread(QtCore.QThread):
     """Thread used for exporting operations. (All/Single Excel/Images)"""
     # Progress bar signals, connected to respective functions in main
@@ -10,29 +31,38 @@ class ExportThread(QtCore.QThread):
     startPbar = QtCore.pyqtSignal(int)
     incrementPbar = QtCore.pyqtSignal()
     finishPbar = QtCore.pyqtSignal()        
+    message = QtCore.pyqtSignal(str) # Status bar message, Ex. formats that couldn't be written
 
-    def __init__(self, bfImages, trImages, type_, path, parent=None):
+    def __init__(self, bfImages, trImages, type_, path, formats=(), imageOptions=None, parent=None):
         super(ExportThread, self).__init__(parent)
         self.bfImages = bfImages # Image collections
         self.trImages = trImages 
         self.type = type_ # Type of export (quantity and filetype)
         self.path = path # Selected path for export
+        self.formats = formats # Columnar formats to write the tidy shape data in beside Excel. Ex. ("csv", "parquet")
+        self.skippedFormats = {} # Formats that couldn't be written because their library is missing, {format : error}
+        self.imageOptions = dict(IMAGE_OPTIONS, **(imageOptions or {})) # Encoder settings for image exports
         self.scale = 0.638 # Scale value in units of pixel/um
 
         self.initializeExcelFormats()
 
     def run(self):
-        if self.type == "all-excel":
-            self.exportAllExcel() 
-        elif self.type == "single-excel":
-            self.exportSingleExcel()
-        elif self.type == "all-images":
-            self.exportAllImages()
-        elif self.type == "single-image":
-            self.exportSingleImage()
-        else:
-            pass
-        self.finished.emit()
+        try:
+            if self.type == "all-excel":
+                self.exportAllExcel() 
+            elif self.type == "single-excel":
+                self.exportSingleExcel()
+            elif self.type == "all-images":
+                self.exportAllImages()
+            elif self.type == "single-image":
+                self.exportSingleImage()
+            if self.skippedFormats:
+                self.message.emit("Exported without {}: {}".format(", ".join(self.skippedFormats), "; ".join(sorted(set(self.skippedFormats.values())))))
+        except Exception as error: # An exception would end the thread silently and leave the progress bar hanging
+            self.message.emit("Export failed: {}: {}".format(type(error).__name__, error))
+        finally:
+            self.finishPbar.emit()
+            self.finished.emit()
 
     def initializeExcelFormats(self):
         """Defining formatting objects to be used with xlsxwriter for cell formatting"""
@@ -46,6 +76,8 @@ class ExportThread(QtCore.QThread):
     def exportExcel(self, data, spheroidIds, sensorIds, dayIds):
         """
         Exports an Excel sheet for both raw data and calculated data or just raw data for single image.
+        The workbook is written in constant memory mode, so every sheet is written strictly row by row,
+        across all of the day blocks, and is flushed to disk as it goes.
         Args:
           data: Dictionary containing all shape data sorted by days and spheroid/sensor. Format given in getBaseData().
           spheroidIds: List of spheroid ids. Ex. ["1", "2", "3"]
@@ -53,13 +85,11 @@ class ExportThread(QtCore.QThread):
           dayIds: List of day ids. Ex. ["p00", "p01", "p02"]        
         """
         # Full Excle file save path
-        if self.bfImages.path:
-            path = self.path + self.bfImages.path.split("/")[-2] + " - Dimensions.xlsx"
-        else:
-            path = self.path + "Dimensions.xlsx"
+        path = self.getExportPath("Dimensions") + ".xlsx"
 
         # Create new workbook and sheet
-        workbook = xlsxwriter.Workbook(path)
+        import xlsxwriter # Only needed for Excel exports, so it isn't loaded on startup
+        workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
         rawDataSheet = workbook.add_worksheet("Raw Data")
 
         # Excel formats -- format object must be added to workbook object to be used when writing cells
@@ -72,136 +102,57 @@ class ExportThread(QtCore.QThread):
         strain_format = workbook.add_format(self.strain_data)
         strain_format.set_num_format('0.00000000')        
 
-        # Create map of {spheroidId:sensor count (int)} (sensors within spheroids)
+        # Map of {spheroidId: list of sensorIds} (sensors within spheroids)
         # Used for writing data to Excel with appropriate spacing
-        sensorCount = {}
-        for spheroidId in spheroidIds:
-            sensorList = []
-            for sensorId in sensorIds:
-                if len(spheroidId) == 2: # If two digit spheroidId
-                    if sensorId[0:2].isdigit() and int(sensorId[0:2]) == int(spheroidId): # If sensor number matches spheroid number
-                        sensorList.append(sensorId)
-                elif int(spheroidId) == int(sensorId[0]) and not sensorId[0:2].isdigit(): # If sensor number matches spheroid number
-                    sensorList.append(sensorId)
-            sensorCount[spheroidId] = sensorList      
+        sensorCount = self.getSensorGroups(spheroidIds, sensorIds)
 
-        # Headings for a single row of data for a day --> First set of attributes is for spheroids, second is for sensors
-        headerRow = ["ID#","AREA","X","Y","MAJOR","MINOR","ADJ. ANGLE","ID#","AREA","X","Y","MAJOR","MINOR","ADJ. ANGLE"]
-        def writeRawDayData(startRow, startCol, dayId):
-            """
-            Writes the raw shape data to an Excel sheet at the given region for the given day.
-            Args:
-              startRow: Number of the row to start at (starting at row 0)
-              startCol: Number of the column to start at (starting at col 0)
-              dayId: Day ID to write the data of
-            """
-            rowNum, colNum = startRow, startCol
-            
-            # Convert spheroid and sensor data into arrays of strings for Excel write
-            # If there is no row data for that shape, use row of empty strings
-            spheroidRows = []
-            for id_ in spheroidIds:
-                rowData = data[dayId][0].get(id_,['','','','','','',''])
-                spheroidRows.append([str(id_)] + rowData)
-            sensorRows = []
-            for id_ in sensorIds:
-                rowData = data[dayId][1].get(id_,['','','','','','',''])
-                sensorRows.append([str(id_)] + rowData)       
-            
+        # Write to Raw Data to Excel file for each day in dictionary
+        dayIds = sorted(data.keys())
+        for i, dayId in enumerate(dayIds):
             # Header Rows --> merge_range used to merge cells in Excel
-            rawDataSheet.merge_range(startRow, startCol, startRow, startCol + 13, "DAY{}".format(dayId.upper()), h1_format)
-            rowNum = rowNum + 1
-            rawDataSheet.merge_range(rowNum, startCol, rowNum, startCol + 6, "SPHEROID", h2_format)
-            rawDataSheet.merge_range(rowNum, startCol + 7, rowNum, startCol + 13, "SENSOR", h2_format)
-            rowNum = rowNum + 1
-            for i in range(len(headerRow)):
-                entry = headerRow[i]
-                # ID rows have different cell formatting (blue colour)
-                if i == 0 or i == 7:
-                    rawDataSheet.write(rowNum, colNum, entry, id_format)
-                else:
-                    rawDataSheet.write(rowNum, colNum, entry, h3_format)
-                colNum = colNum + 1
-            rowNum = rowNum + 1
-            colNum = startCol
-
-            # Spheroid Rows
-            data_start = rowNum, colNum
-            # Write spheroid row data 
-            for row in spheroidRows:
-                for j in range(len(row)):
-                    entry = row[j]
-                    if j > 0:
-                        # Numbers use a different function to write than an empty string, so check for empty string
-                        if entry:
-                            rawDataSheet.write_number(rowNum, colNum, float(entry), data_format)
-                        else:
-                            rawDataSheet.write(rowNum, colNum, entry, data_format)
+            rawDataSheet.merge_range(0, 15*i, 0, 15*i + 13, "DAY{}".format(dayId.upper()), h1_format)
+        for i in range(len(dayIds)):
+            rawDataSheet.merge_range(1, 15*i, 1, 15*i + 6, "SPHEROID", h2_format)
+            rawDataSheet.merge_range(1, 15*i + 7, 1, 15*i + 13, "SENSOR", h2_format)
+        # Headings for a single row of data for a day --> First set of attributes is for spheroids, second is for sensors
+        for i in range(len(dayIds)):
+            # ID columns have different cell formatting (blue colour)
+            for startCol in (15*i, 15*i + 7):
+                rawDataSheet.write_string(2, startCol, "ID#", id_format)
+                rawDataSheet.write_row(2, startCol + 1, ["AREA","X","Y","MAJOR","MINOR","ADJ. ANGLE"], h3_format)
+
+        blankRow = ['','','','','','','']
+        for rowNum, (spheroidSlot, sensorSlot) in enumerate(self.getRawLayout(spheroidIds, sensorIds, sensorCount), 3):
+            for i, dayId in enumerate(dayIds):
+                spheroidMap, sensorMap = data[dayId]
+                startCol = 15*i
+                if spheroidSlot is not None:
+                    kind, id_ = spheroidSlot
+                    rowData = spheroidMap.get(id_)
+                    # Rows without data are one blank cell wider, spilling into the sensor ID column when it's free
+                    width = 6 if rowData is not None or sensorSlot is not None else 7
+                    if kind == "shape":
+                        rawDataSheet.write_number(rowNum, startCol, float(id_), id_format)
+                    else:
+                        # Blank rows under a spheroid, one for every sensor in it, for easier data readability
+                        rawDataSheet.write_blank(rowNum, startCol, '', id_format)
+                    if kind == "shape" and rowData is not None:
+                        rawDataSheet.write_row(rowNum, startCol + 1, rowData, data_format)
+                    else:
+                        rawDataSheet.write_row(rowNum, startCol + 1, blankRow[:width], data_format)
+                if sensorSlot is not None:
+                    kind, id_ = sensorSlot
+                    rowData = sensorMap.get(id_)
+                    if kind == "shape":
+                        rawDataSheet.write_string(rowNum, startCol + 7, id_, id_format)
                     else:
-                        # ID requires separate data formatting
-                        rawDataSheet.write_number(rowNum, colNum, float(entry), id_format)
-                    colNum = colNum + 1
-                currRow = rowNum
-
-                rowNum = rowNum + 1
-                colNum = startCol   
-
-                # Skip the number of rows corresponding to the number of sensors in the spheroid
-                # This allows for easier data readability in the Excel sheet
-                if row == spheroidRows[-1]:
-                    break
-                while rowNum < currRow + len(sensorCount[row[0]]) + 1:
-                    for j in range(len(row)):
-                        if j > 0:
-                            rawDataSheet.write(rowNum, colNum, "", data_format)
-                        else:
-                            rawDataSheet.write(rowNum, colNum, "", id_format)
-                        colNum = colNum + 1     
-                    rowNum = rowNum + 1
-                    colNum = startCol
-
-            # Sensor Rows
-            rowNum, colNum = data_start
-            colNum = colNum + 7
-            # Write sensor row data
-            for i in range(len(sensorRows)):
-                row = sensorRows[i]
-                for j in range(len(row)):
-                    entry = row[j]
-                    if j > 0:
-                        if entry:
-                            rawDataSheet.write_number(rowNum, colNum, float(entry), data_format)
-                        else:
-                            rawDataSheet.write(rowNum, colNum, entry, data_format)
+                        # Blank row between the sensors of different spheroids
+                        rawDataSheet.write_blank(rowNum, startCol + 7, '', id_format)
+                    if kind == "shape" and rowData is not None:
+                        rawDataSheet.write_row(rowNum, startCol + 8, rowData, data_format)
                     else:
-                        rawDataSheet.write(rowNum, colNum, entry, id_format)
-                    colNum = colNum + 1
-
-                # Writes a blank row with proper formatting if the sensor NUMBER changes
-                if i < len(sensorRows) - 1:
-                    # Gets row number, checks for single digit and double digit row numbers
-                    currRowNum = row[0][0:2] if row[0][0:2].isdigit() else row[0][0]
-                    nextRowNum = sensorRows[i+1][0][0:2] if sensorRows[i+1][0][0:2].isdigit() else sensorRows[i+1][0][0]
-                    # Write blank row if current row number isn't equal to the next row number
-                    if int(currRowNum) != int(nextRowNum):
-                        rowNum = rowNum + 1  
-                        colNum = startCol + 7
-                        for j in range(len(row)):
-                            if j > 0:
-                                rawDataSheet.write(rowNum, colNum, "", data_format)
-                            else:
-                                rawDataSheet.write(rowNum, colNum, "", id_format)
-                            colNum = colNum + 1     
-
-                rowNum = rowNum + 1            
-                colNum = startCol + 7    
+                        rawDataSheet.write_row(rowNum, startCol + 8, blankRow[:6 if rowData is not None else 7], data_format)
 
-        # Write to Raw Data to Excel file for each day in dictionary
-        dayIds = sorted(data.keys())
-        rowNum, colNum = 0, 0
-        for i in range(len(dayIds)):
-            id_ = dayIds[i]
-            writeRawDayData(rowNum, colNum+(15*i), id_)
         # Change column widths to ensure numbers fit appropriately
         rawDataSheet.set_column(0, 15*len(dayIds), 10)
         if len(dayIds) < 2:
@@ -211,126 +162,237 @@ class ExportThread(QtCore.QThread):
 
         # Worksheet used to represent calculated data from raw shape dimensions (i.e. strain data)
         calcDataSheet = workbook.add_worksheet("Calculated Data")
-        headerRow = ["ID#","SPHEROID AREA STRAIN","RADIAL STRAIN","CIRCUMFERENTIAL STRAIN"]
-        def writeCalcDayData(startRow, startCol, dayId):
-            """
-            Writes the strain data on a separate spreadsheet for the given region and day.
-            Args:
-              startRow: Number of the row to start at (starting at row 0)
-              startCol: Number of the column to start at (starting at col 0)
-              dayId: Day ID to write the data of
-            """
-            rowNum, colNum = startRow, startCol
-            
-            # Get strain data for row
-            strainRows = []
-            for sensorId in sensorIds:
-                # Data indices: -1: Adjusted Angle, 0: Area, 3: Major, 4: Minor
-                row = []
-                # Number of the sensor (string), accounting for both double and single digits
-                sensorNum = sensorId[0][0:2] if sensorId[0][0:2].isdigit() else sensorId[0][0]
-                day0 = dayIds[0]
-
-                # Get spheroid data
-                currSpheroidData = data[dayId][0].get(sensorNum, '')
-                day0SpheroidData = data[day0][0].get(sensorNum, '')
-
-                # Empty row if either spheroid or day0 spheroid data doesn't exist
-                if not currSpheroidData or not day0SpheroidData:
-                    row = [sensorId, '', '', '']
-                    strainRows.append(row)
-                    continue
-
-                # Calculating spheroid area strain *(currSpheroidArea - day0SpheroidArea) / day0SpheroidArea)
-                areaStrain = (float(currSpheroidData[0]) - float(day0SpheroidData[0])) / float(day0SpheroidData[0]) 
-
-                # Get sensor data
-                currSensorData = data[dayId][1].get(sensorId, '')
-                day0SensorData = data[day0][1].get(sensorId, '')
-
-                # Emptry row if either sensor or day0 sensor data doesn't exist
-                if not currSensorData or not day0SensorData:
-                    row = [sensorId, areaStrain, '', '']
-                    strainRows.append(row)
-                    continue    
-                # Check if difference of adjusted angles is less than 45 degrees
-                if float(currSensorData[-1]) - float(currSpheroidData[-1]) < 45:
-                    # (sensorMinor - day0SensorMajor) / (day0SensorMajor)
-                    radialStrain = (float(currSensorData[4]) - float(day0SensorData[3])) / float(day0SensorData[3])
-                    # (sensorMajor - day0SensorMinor) / (day0SensorMinor)
-                    circStrain = (float(currSensorData[3]) - float(day0SensorData[4])) / float(day0SensorData[4])
+        calcDayIds = dayIds[1:]
+        for i, dayId in enumerate(calcDayIds):
+            calcDataSheet.merge_range(0, 5*i, 0, 5*i + 3, "DAY{}".format(dayId.upper()), h1_format)
+        for i in range(len(calcDayIds)):
+            calcDataSheet.write_string(1, 5*i, "ID#", id_format)
+            calcDataSheet.write_row(1, 5*i + 1, ["SPHEROID AREA STRAIN","RADIAL STRAIN","CIRCUMFERENTIAL STRAIN"], h3_format)
+
+        # Strains of every sensor on every day, relative to the first day
+        strains = strainTable(data, spheroidIds, sensorIds, dayIds)
+        sensorIdx = {sensorId: i for i, sensorId in enumerate(sensorIds)}
+        for rowNum, (_, sensorSlot) in enumerate(self.getRawLayout([], sensorIds, sensorCount), 2):
+            kind, sensorId = sensorSlot
+            for i, dayId in enumerate(calcDayIds):
+                startCol = 5*i
+                if kind == "shape":
+                    calcDataSheet.write_string(rowNum, startCol, sensorId, id_format)
+                    # Strains that can't be calculated (NaN) are left blank
+                    strainRow = strains[i + 1, sensorIdx[sensorId]].tolist()
+                    calcDataSheet.write_row(rowNum, startCol + 1, ['' if strain != strain else strain for strain in strainRow], strain_format)
                 else:
-                    # (sensorMajor - day0SensorMinor) / (day0SensorMinor)
-                    radialStrain = (float(currSensorData[3]) - float(day0SensorData[4])) / float(day0SensorData[4])
-                    # (sensorMinor - day0SensorMajor) / (day0SensorMajor)
-                    circStrain = (float(currSensorData[4]) - float(day0SensorData[3])) / float(day0SensorData[3])
-
-                row = [sensorId, areaStrain, radialStrain, circStrain] # Row to write to Excel
-                strainRows.append(row)
-                
-            # Writing header rows
-            calcDataSheet.merge_range(startRow, startCol, startRow, startCol + 3, "DAY{}".format(dayId.upper()), h1_format)
-            rowNum = rowNum + 1
-            for i, entry in enumerate(headerRow): 
-                if i == 0:
-                    calcDataSheet.write(rowNum, colNum, entry, id_format)
-                else:
-                    calcDataSheet.write(rowNum, colNum, entry, h3_format)
-                colNum = colNum + 1
-            colNum = startCol
-            rowNum = rowNum + 1
-
-            # Writing to calculated data spreadsheet
-            for i, row in enumerate(strainRows):
-                for j in range(len(row)):
-                    entry = row[j]
-                    if j > 0:
-                        if entry:
-                            calcDataSheet.write_number(rowNum, colNum, float(entry), strain_format)
-                        else:
-                            calcDataSheet.write(rowNum, colNum, entry, strain_format)
-                    else:
-                        calcDataSheet.write(rowNum, colNum, entry, id_format)
-                    colNum = colNum + 1
-
-                # Write blank row when going between sensors
-                if i < len(strainRows) - 1:
-                    currRowNum = row[0][0:2] if row[0][0:2].isdigit() else row[0][0]
-                    nextRowNum = strainRows[i+1][0][0:2] if strainRows[i+1][0][0:2].isdigit() else strainRows[i+1][0][0]
-
-                    if int(currRowNum) != int(nextRowNum):
-                        rowNum = rowNum + 1  
-                        colNum = startCol
-                        for j in range(len(row)):
-                            if j > 0:
-                                calcDataSheet.write(rowNum, colNum, "", strain_format)
-                            else:
-                                calcDataSheet.write(rowNum, colNum, "", id_format)
-                            colNum = colNum + 1     
-
-                rowNum = rowNum + 1            
-                colNum = startCol        
-
-        # Writing calculated data to the Excel sheet
-        rowNum, colNum = 0, 0
-        for i, id_ in enumerate(dayIds[1:]):
-            writeCalcDayData(rowNum, colNum+(5*i), id_)
+                    # Write blank row when going between sensors
+                    calcDataSheet.write_blank(rowNum, startCol, '', id_format)
+                    calcDataSheet.write_row(rowNum, startCol + 1, blankRow[:3], strain_format)
         # Changing size of columns to fit numbers appropriately
         calcDataSheet.set_column(0, 5*(len(dayIds)-1), 20) 
 
         workbook.close() 
 
+    def getExportPath(self, name):
+        """
+        Args:
+          name: Name of the exported file. Ex. "Dimensions"
+        Returns:
+          Full save path without extension, prefixed by the experiment folder name if there is one
+          and by the well and field when exporting a single well of a plate (see ImageCollection.subset)
+        """
+        if self.bfImages.label:
+            name = self.bfImages.label + " - " + name
+        if self.bfImages.path:
+            return self.path + self.bfImages.path.split("/")[-2] + " - " + name
+        return self.path + name
+
+    def getSensorGroups(self, spheroidIds, sensorIds):
+        """
+        Args:
+          spheroidIds: List of spheroid ids. Ex. ["1", "2", "3"]
+          sensorIds: List of sensor ids. Ex. ["1a", "1b", "2a"]
+        Returns:
+          Map of {spheroidId : list of sensorIds within that spheroid}. Ex. {"1": ["1a", "1b"], "2": ["2a"], "3": []}
+        """
+        groups = {}
+        for sensorId in sensorIds:
+            groups.setdefault(int(getSpheroidNum(sensorId)), []).append(sensorId)
+        return {spheroidId: groups.get(int(spheroidId), []) for spheroidId in spheroidIds}
+
+    def getRawLayout(self, spheroidIds, sensorIds, sensorCount):
+        """
+        Gets the rows of a single day block, below its header rows. Every day block has the same rows.
+        Args:
+          spheroidIds: List of spheroid ids. Ex. ["1", "2", "3"]
+          sensorIds: List of sensor ids. Ex. ["1a", "1b", "2a"]
+          sensorCount: Map of {spheroidId : list of sensorIds}, given by getSensorGroups()
+        Returns:
+          List of (spheroid slot, sensor slot) for each row. A slot is either None (empty),
+          ("shape", id) for a row of shape data or ("blank", id) for a spacing row following that shape.
+        """
+        # Spheroids are followed by a blank row for every sensor in them
+        spheroidSlots = []
+        for i, spheroidId in enumerate(spheroidIds):
+            spheroidSlots.append(("shape", spheroidId))
+            if i < len(spheroidIds) - 1:
+                spheroidSlots.extend([("blank", spheroidId)] * len(sensorCount[spheroidId]))
+
+        # Sensors are followed by a blank row if the next sensor is in a different spheroid
+        sensorSlots = []
+        for i, sensorId in enumerate(sensorIds):
+            sensorSlots.append(("shape", sensorId))
+            if i < len(sensorIds) - 1 and int(getSpheroidNum(sensorId)) != int(getSpheroidNum(sensorIds[i+1])):
+                sensorSlots.append(("blank", sensorId))
+
+        numRows = max(len(spheroidSlots), len(sensorSlots))
+        spheroidSlots += [None] * (numRows - len(spheroidSlots))
+        sensorSlots += [None] * (numRows - len(sensorSlots))
+        return list(zip(spheroidSlots, sensorSlots))
+
     def exportAllExcel(self):
-        """Exports excel with shape data and strain data for all images"""
-        # Redraw all images to ensure base shapes are up to date with base image
+        """
+        Exports excel with shape data and strain data for all images.
+        Re-exporting into the same folder reuses the shape data of every day whose images haven't changed,
+        and skips the export entirely if nothing changed and the files are still there.
+        When only new days were added, their rows are appended to CSV and HDF5 tidy files.
+        Plates with several wells or fields get separate files for each well and field that has the base day.
+        """
+        groups = self.bfImages.groups()
+        if len(groups) > 1:
+            bfImages, trImages = self.bfImages, self.trImages
+            try:
+                for group in groups:
+                    self.bfImages, self.trImages = bfImages.subset(group), trImages.subset(group)
+                    if self.bfImages.baseImage is not None and self.trImages.baseImage is not None:
+                        self.exportAllExcel()
+            finally:
+                self.bfImages, self.trImages = bfImages, trImages
+            return
+
+        # Match shapes to the base image to ensure base shapes are up to date, drawing isn't needed
         for img in self.bfImages.list + self.trImages.list:
-            img.redraw()
+            img.matchBaseShapes()
+
+        # Formats whose library is missing are skipped, the workbook and the other formats are still written
+        for format_ in self.formats:
+            if not isAvailable(format_):
+                self.skippedFormats[format_] = "{} is not installed".format(LIBRARIES[format_])
+        formats = [format_ for format_ in self.formats if format_ not in self.skippedFormats]
+
+        manifest = self.loadManifest()
+        section = " - ".join(part for part in ("excel", self.bfImages.label) if part) # Every well and field has its own files
+        excelManifest = manifest.get(section, {})
+        dayKeys = self.getDayKeys()
+        settingsKey = self.getKey([self.bfImages.baseId, self.scale])
+        workbookKey = self.getKey([settingsKey, sorted(formats), sorted(dayKeys.items())])
+        files = [self.getExportPath("Dimensions") + ".xlsx"] + [self.getExportPath("Shapes") + FORMATS[format_] for format_ in formats]
+        if excelManifest.get("key") == workbookKey and all(os.path.exists(file) for file in files):
+            return
 
-        data, spheroidIds, sensorIds, dayIds = self.getAllData()
+        # Days are only clean if their images are unchanged since the last export into this folder
+        cachedDays = {}
+        for dayId, entry in excelManifest.get("days", {}).items():
+            if dayKeys.get(dayId) == entry["key"]:
+                cachedDays[dayId] = tuple(entry["data"])
+        # If only new days were added (Ex. live mode), their rows are appended to the tidy files that allow it
+        isAppendable = excelManifest.get("settings") == settingsKey and set(excelManifest.get("days", {})) <= set(cachedDays)
+
+        # Tidy data is written day by day as the shape data of each day is gathered
+        writers = []
+        def writeDay(data, spheroidIds, sensorIds, dayIds, dayId):
+            rows = None
+            for writer, writtenDays in writers:
+                if dayId in writtenDays:
+                    continue
+                if rows is None:
+                    rows = self.getTidyRows(data, spheroidIds, sensorIds, dayIds, dayId)
+                writer.write(rows)
+        try:
+            # Opened inside the try so the writers opened before one that fails are still closed
+            for format_ in list(formats):
+                append = (isAppendable and format_ in APPENDABLE_FORMATS and format_ in excelManifest.get("formats", ())
+                          and os.path.exists(self.getExportPath("Shapes") + FORMATS[format_]))
+                writtenDays = set(excelManifest["days"]) if append else set()
+                try:
+                    writers.append((openWriter(self.getExportPath("Shapes"), format_, append), writtenDays))
+                except ImportError as error: # Installed but not importable, Ex. a broken install
+                    self.skippedFormats[format_] = str(error)
+                    formats.remove(format_)
+            data, spheroidIds, sensorIds, dayIds = self.getAllData(writeDay if writers else None, cachedDays)
+        finally:
+            for writer, _ in writers:
+                writer.close()
         if len(data) == 0:
             return
+        # Xlsx files are zipped XML and can't be patched in place, so the workbook is always streamed in full
         self.exportExcel(data, spheroidIds, sensorIds, dayIds)
 
+        manifest[section] = {"key": workbookKey, "settings": settingsKey, "formats": formats,
+                             "days": {dayId: {"key": dayKeys[dayId], "data": data[dayId]} for dayId in data}}
+        self.saveManifest(manifest)
+
+    def getDayKeys(self):
+        """
+        Returns:
+          Map of {dayId : key} of every day, the key changes whenever the shape data of the day may have changed.
+        """
+        dayKeys = {}
+        for dayId, bfImg in self.bfImages.map.items():
+            trImg = self.trImages.map[dayId]
+            dayKeys[dayId] = self.getKey([bfImg.contentKey(), trImg.contentKey(), bfImg is self.bfImages.baseImage])
+        return dayKeys
+
+    def getKey(self, parts):
+        """Returns the hex digest of a list of values with a stable repr"""
+        return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+    def loadManifest(self):
+        """
+        Returns:
+          Manifest of the previous export into the export path, empty if there wasn't one or it can't be read.
+        """
+        try:
+            with open(self.path + MANIFEST_NAME) as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def saveManifest(self, manifest):
+        """Writes the manifest to the export path, replacing the previous one only once it's fully written"""
+        tempPath = self.path + MANIFEST_NAME + ".tmp"
+        with open(tempPath, "w") as file:
+            json.dump(manifest, file)
+        os.replace(tempPath, self.path + MANIFEST_NAME)
+
+    def getTidyRows(self, data, spheroidIds, sensorIds, dayIds, dayId):
+        """
+        Gets the shape data of a single day as tidy rows, one row for every spheroid and sensor.
+        Args:
+          data: Dictionary containing shape data sorted by days and spheroid/sensor. Must contain dayId and dayIds[0].
+          spheroidIds: List of spheroid ids. Ex. ["1", "2", "3"]
+          sensorIds: List of sensor ids. Ex. ["1a", "1b", "2a"]
+          dayIds: List of day ids. Ex. ["p00", "p01", "p02"]
+          dayId: Day ID to get the rows of
+        Returns:
+          List of dictionaries with a value for every column in ColumnarExport.COLUMNS. Missing values are NaN.
+        """
+        nan = float("nan")
+        spheroidMap, sensorMap = data[dayId]
+        strains = strainTable(data, spheroidIds, sensorIds, [dayIds[0], dayId])[-1]
+        rows = []
+        for type_, ids, shapeMap in (("spheroid", spheroidIds, spheroidMap), ("sensor", sensorIds, sensorMap)):
+            for i, id_ in enumerate(ids):
+                shapeData = shapeMap.get(id_)
+                if shapeData is None:
+                    continue
+                row = dict(zip(("area", "x", "y", "major", "minor", "angle"), shapeData))
+                row.update({"day": dayId, "type": type_, "id": id_, "area_strain": nan, "radial_strain": nan, "circumferential_strain": nan})
+                if type_ == "spheroid":
+                    row["spheroid"] = id_
+                else:
+                    row["spheroid"] = getSpheroidNum(id_)
+                    row["area_strain"], row["radial_strain"], row["circumferential_strain"] = strains[i].tolist()
+                rows.append(row)
+        return rows
+
     def exportSingleExcel(self):
         """Exports excel with shape data for a single image"""
         self.trImages.baseImage.redraw()
@@ -343,7 +405,7 @@ class ExportThread(QtCore.QThread):
 
     def getShapeData(self, isEllipse, shape):
         """
-        Gets a list of shape data to be written in an Excel row.
+        Gets a list of shape data to be written in an Excel row. Values are kept as floats.
 
         Args:
           isEllipse: Boolean describing type of shape, Ellipse or Circle.
@@ -370,17 +432,22 @@ class ExportThread(QtCore.QThread):
             # Adjust angle from original Excel Sheet
             if ang > 90:
                 ang = 180 - ang
-            data = [str(area),str(x),str(y),str(major),str(minor),str(ang)]            
+            data = [area,x,y,major,minor,ang]
         else:
             (x, y), r, _ = shape
             x, y, r = x/self.scale, y/self.scale, r/self.scale
             area = pi*r**2
-            data = [str(area),str(x),str(y),str(r),str(r),"0"]
+            data = [area,x,y,r,r,0.0]
         return data
 
-    def getAllData(self):
+    def getAllData(self, dayCallback=None, cachedDays=None):
         """ 
         Returns data of all shapes.
+        Args:
+          dayCallback: (Optional) Called in day order as callback(data, spheroidIds, sensorIds, dayIds, dayId)
+              as soon as the data of each day is added. The first day is always added before the others.
+          cachedDays: (Optional) Map of {dayId : (spheroid map, sensor map)} of days known to be unchanged,
+              used instead of gathering their data again.
 
         Returns:
           data: Dictionary containing all shape data sorted by days and spheroid/sensor. Format given in getBaseData().
@@ -394,6 +461,13 @@ class ExportThread(QtCore.QThread):
             bfImg = self.bfImages.map[id_]
             trImg = self.trImages.map[id_]
             if bfImg is self.bfImages.baseImage:
+                if dayCallback is not None:
+                    dayCallback(data, spheroidIds, sensorIds, dayIds, id_)
+                continue
+            if cachedDays and id_ in cachedDays:
+                data[id_] = cachedDays[id_]
+                if dayCallback is not None:
+                    dayCallback(data, spheroidIds, sensorIds, dayIds, id_)
                 continue
             spheroid_map = {}
             sensor_map = {}    
@@ -408,6 +482,8 @@ class ExportThread(QtCore.QThread):
                     sensor_map[shape_id] = self.getShapeData(trImg.ellipse, shape)
             # Add day entry corresponding to spheroid and sensor map to data dictionary
             data[id_] = (spheroid_map, sensor_map)
+            if dayCallback is not None:
+                dayCallback(data, spheroidIds, sensorIds, dayIds, id_)
 
         return data, spheroidIds, sensorIds, dayIds
 
@@ -451,17 +527,72 @@ class ExportThread(QtCore.QThread):
         return data, sorted(spheroidIds), sorted(sensorIds), dayIds
 
     def exportAllImages(self):
-        """Exports all images as PNGs"""
+        """
+        Exports all images, rendering and encoding them in chunks across a pool of worker threads.
+        Re-exporting into the same folder only re-renders and re-writes images that changed since the last export.
+        """
         allImages = self.bfImages.list + self.trImages.list 
+        self.startPbar.emit(len(allImages))
+
+        # Base shapes first, so the keys of all images are up to date before any are compared
         for img in allImages:
-            img.redraw()     
+            img.matchBaseShapes()
+        manifest = self.loadManifest()
+        oldKeys = manifest.get("images", {})
+        options = sorted((key, value) for key, value in self.imageOptions.items() if key in IMAGE_OPTIONS and key != "workers")
+        keys, changed = {}, []
         for img in allImages:
-            filename = img.name.split(".")[0]
-            cv2.imwrite(self.path + filename + ".png", img.imgArr)
-            
+            filename = self.getImageFilename(img)
+            keys[filename] = self.getKey([img.renderKey(), options])
+            if oldKeys.get(filename) == keys[filename] and os.path.exists(self.path + filename):
+                self.incrementPbar.emit()
+            else:
+                changed.append(img)
+
+        def exportImage(img):
+            img.redraw()
+            self.writeImage(img)
+
+        # OpenCV releases the GIL while reading, drawing and encoding, so threads run in parallel
+        workers = self.imageOptions["workers"]
+        chunkSize = workers * 4 # Bounds the number of queued images
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for start in range(0, len(changed), chunkSize):
+                futures = [pool.submit(exportImage, img) for img in changed[start:start + chunkSize]]
+                for future in as_completed(futures):
+                    future.result()
+                    self.incrementPbar.emit()
+        manifest["images"] = dict(oldKeys, **keys)
+        self.saveManifest(manifest)
+        self.finishPbar.emit()
+
     def exportSingleImage(self):
-        """Exports a single pair of images as PNGs"""
+        """Exports a single pair of images"""
         # Here self.bfImages and self.trImages are currImg and complement Image objects
         for img in (self.bfImages, self.trImages):
-            filename = img.name.split(".")[0]
-            cv2.imwrite(self.path + filename + ".png", img.imgArr)        
\ No newline at end of file
+            self.writeImage(img)
+
+    def writeImage(self, img):
+        """
+        Writes the currently drawn image to the export path with the encoder settings in imageOptions.
+        Args:
+          img: Image object to write
+        """
+        options = self.imageOptions
+        imgArr = img.imgArr
+        if options["scale"] < 1:
+            imgArr = cv2.resize(imgArr, None, fx=options["scale"], fy=options["scale"], interpolation=cv2.INTER_AREA)
+
+        format_ = options["format"]
+        if format_ == "png":
+            params = [cv2.IMWRITE_PNG_COMPRESSION, options["pngCompression"]]
+        elif format_ == "jpeg":
+            params = [cv2.IMWRITE_JPEG_QUALITY, options["jpegQuality"]]
+        else:
+            params = [cv2.IMWRITE_WEBP_QUALITY, options["webpQuality"]]
+
+        cv2.imwrite(self.path + self.getImageFilename(img), imgArr, params)
+
+    def getImageFilename(self, img):
+        """Returns the file name an image is exported as, with the extension of the export format"""
+        return img.name.split(".")[0] + IMAGE_FORMATS[self.imageOptions["format"]]
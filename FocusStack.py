@@ -0,0 +1,85 @@
+import os
+import re
+
+import cv2
+import numpy as np
+
+
+def bestFocusSlices(curve, k=1, metric="laplacian"):
+    """
+    Finds the sharpest slices of a z-stack from its focus curve.
+    Args:
+      curve: List of (id_, measures) tuples, see Sharpness.SharpnessEngine.curve
+      k: (Default value = 1) Number of slices to return.
+      metric: (Default value = "laplacian") Focus measure to rank the slices by, see Sharpness.METRICS
+    Returns:
+      List of the k slice ids with the highest focus measure, sharpest first.
+    """
+    ranked = sorted(curve, key=lambda item: item[1][metric], reverse=True)
+    return [id_ for id_, _ in ranked[:k]]
+
+def tileSharpness(img, tileSize):
+    """
+    Computes the local sharpness (mean squared Laplacian) of every tile of an image.
+    Args:
+      img: Numpy array of a grayscale image of any bit depth.
+      tileSize: Width and height of the square tiles in pixels. Edge tiles are padded by reflection.
+    Returns:
+      Numpy float32 array of shape (rows of tiles, columns of tiles)
+    """
+    height, width = img.shape[:2]
+    lap = cv2.Laplacian(img, cv2.CV_32F)
+    padY, padX = -height % tileSize, -width % tileSize
+    if padY or padX:
+        lap = cv2.copyMakeBorder(lap, 0, padY, 0, padX, cv2.BORDER_REFLECT)
+    rows, cols = lap.shape[0] // tileSize, lap.shape[1] // tileSize
+    return cv2.multiply(lap, lap).reshape(rows, tileSize, cols, tileSize).mean(axis=(1, 3))
+
+def focusStack(images, tileSize=64, pBar=None):
+    """
+    Builds an all-in-focus composite from z-stack slices by taking every tile from the slice where it is sharpest.
+    Slices are read from disk one at a time, so only the composite and a single slice are ever in memory.
+    Args:
+      images: List of Image objects to composite. Ex. the top-k slices from bestFocusSlices()
+      tileSize: (Default value = 64) Width and height of the square tiles in pixels.
+      pBar: (Optional) Thread object used to emit progress bar signals.
+    Returns:
+      composite: Numpy array of the composite in the raw bit depth of the slices.
+      tileIds: Numpy array of shape (rows of tiles, columns of tiles) with the id of the sharpest slice of each tile.
+    """
+    composite, best, tileIds = None, None, None
+    for image in images:
+        if pBar is not None:
+            pBar.incrementPbar.emit()
+        raw = cv2.imread(image.path, -1)
+        sharpness = tileSharpness(raw, tileSize)
+        if composite is None:
+            composite, best = raw, sharpness
+            tileIds = np.full(sharpness.shape, image.id, dtype=object)
+            continue
+
+        # Per tile argmax over the slices streamed so far
+        better = sharpness > best
+        best = np.where(better, sharpness, best)
+        tileIds[better] = image.id
+        mask = np.repeat(np.repeat(better, tileSize, axis=0), tileSize, axis=1)[:raw.shape[0], :raw.shape[1]]
+        composite[mask] = raw[mask]
+    return composite, tileIds
+
+def writeFocusStack(images, folder, tileSize=64, pBar=None):
+    """
+    Builds the focus stack of the slices and writes it as a TIFF so it can be loaded as a regular Image.
+    Args:
+      images: List of Image objects to composite.
+      folder: Folder to write the composite to. Ex. the temporary folder of the viewer, see ImageViewer.getFocusStackDir
+      tileSize: (Default value = 64) Width and height of the square tiles in pixels.
+      pBar: (Optional) Thread object used to emit progress bar signals.
+    Returns:
+      (name, path, tileIds): File name and full path of the written composite and the per tile sharpest slice ids.
+    """
+    composite, tileIds = focusStack(images, tileSize, pBar)
+    # Name composite after the sharpest slice, with the z id replaced. Ex. 'EGFP_1mm_Plate_R_p00_zFocus_0_A02f00d4.TIF'
+    name = re.sub(r"z\d{1,4}", "zFocus", images[0].name, count=1)
+    path = os.path.join(folder, name)
+    cv2.imwrite(path, composite)
+    return name, path, tileIds
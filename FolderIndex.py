@@ -0,0 +1,145 @@
+import json
+import os
+import time
+
+INDEX_NAME = ".cmed_index.json" # Written in the experiment folder, beside the session file
+INDEX_VERSION = 1
+RACY_SECONDS = 2 # Folders modified this recently may still change within the same mtime tick, they're rescanned next time
+
+
+class FolderIndex:
+    """
+    Cached listing of the folders of an experiment, persisted in the experiment folder so later opens don't have to
+    list and classify tens of thousands of files again. Every folder is listed with a single os.scandir pass and
+    stored with its modification time. A folder whose modification time is unchanged is reused with a single stat,
+    a changed folder is listed again but only its new files are classified and stat'ed.
+
+    Index file layout: {"version": 1, "folders": {relative folder : {"mtime": ns, "dirs": [name, ...],
+    "files": [name, ...], "context": str, "images": {file name : [id_, name, type_, size, mtime ns]}}}}
+    """
+    def __init__(self, basePath):
+        self.basePath = basePath
+        self.path = os.path.join(basePath, INDEX_NAME)
+        self.folders = {}
+        self.changed = False # True if folders changed since the index was loaded or saved
+        self.load()
+
+    def load(self):
+        """Reads the index file of the experiment folder. A missing, unreadable or outdated index is ignored."""
+        try:
+            with open(self.path) as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return
+        if isinstance(data, dict) and data.get("version") == INDEX_VERSION:
+            self.folders = data.get("folders", {})
+
+    def save(self):
+        """
+        Writes the index to the experiment folder if it changed. A read only folder keeps the index in memory only.
+        The file is rewritten in place: replacing it would change the modification time of the experiment folder on
+        every save, so its listing would never be reused (and live mode would see the folder change after every save).
+        A torn write only costs a rescan, unreadable indexes are ignored by load().
+        Returns:
+          True if the index was written.
+        """
+        if not self.changed:
+            return False
+        try:
+            isNew = not os.path.exists(self.path)
+            before = os.stat(self.basePath).st_mtime_ns
+            self.write()
+            # Creating the file changes the modification time of the folder once, its listing is still current unless
+            # something else changed the folder since it was listed
+            entry = self.folders.get(self.key(self.basePath))
+            if isNew and entry is not None and entry["mtime"] == before:
+                entry["mtime"] = os.stat(self.basePath).st_mtime_ns
+                self.write()
+        except OSError:
+            return False
+        self.changed = False
+        return True
+
+    def write(self):
+        """Writes the index file"""
+        with open(self.path, "w") as file:
+            json.dump({"version": INDEX_VERSION, "folders": self.folders}, file, separators=(",", ":"))
+
+    def key(self, folder):
+        """Returns the key of a folder in the index, its path relative to the experiment folder"""
+        return os.path.relpath(folder, self.basePath).replace("\\", "/")
+
+    def entry(self, folder):
+        """
+        Returns the index entry of a folder, listing it again if it changed on disk.
+        Args:
+          folder: Path of a folder in the experiment.
+        Returns:
+          Dictionary with the "dirs" and "files" names in listing order, see class docstring.
+        """
+        key = self.key(folder)
+        mtime = os.stat(folder).st_mtime_ns
+        cached = self.folders.get(key)
+        if cached is not None and cached["mtime"] == mtime:
+            return cached
+
+        dirs, files = [], []
+        with os.scandir(folder) as entries:
+            for item in entries:
+                if item.is_dir():
+                    dirs.append(item.name)
+                elif item.name != INDEX_NAME:
+                    files.append(item.name)
+        if time.time_ns() - mtime < RACY_SECONDS * 10**9:
+            mtime = None # Files added within the same mtime tick wouldn't change it, so it can't be trusted yet
+        if cached is not None and cached["dirs"] == dirs and cached["files"] == files:
+            # Nothing to save unless the folder can now be trusted, Ex. only a file that isn't listed changed
+            self.changed = self.changed or (cached["mtime"] is None and mtime is not None)
+            cached["mtime"] = mtime
+            return cached
+        entry = {"mtime": mtime, "dirs": dirs, "files": files,
+                 "context": cached["context"] if cached else None, "images": cached["images"] if cached else {}}
+        # Files that are gone are dropped, the rest keep their classification
+        names = set(files)
+        entry["images"] = {name: image for name, image in entry["images"].items() if name in names}
+        self.folders[key] = entry
+        self.changed = True
+        return entry
+
+    def listing(self, folder):
+        """
+        Args:
+          folder: Path of a folder in the experiment.
+        Returns:
+          (list of subfolder names, list of file names) in folder listing order.
+        """
+        entry = self.entry(folder)
+        return entry["dirs"], entry["files"]
+
+    def images(self, folder, context, classify):
+        """
+        Lists the images of a folder, classifying only the files that weren't classified before in the same context.
+        Args:
+          folder: Path of a folder in the experiment.
+          context: String describing everything classify depends on besides the file name. Ex. folder structure and day.
+          classify: Called as classify(file name), returns (id_, name, type_) or None if the file isn't an image.
+        Returns:
+          List of (path, id_, name, type_, size, mtime ns) of every image, in folder listing order.
+        """
+        entry = self.entry(folder)
+        if entry["context"] != context:
+            entry["context"], entry["images"] = context, {}
+            self.changed = True
+        images = entry["images"]
+        result = []
+        for file in entry["files"]:
+            if file not in images:
+                image = classify(file)
+                if image is not None:
+                    stat = os.stat(os.path.join(folder, file))
+                    image = list(image) + [stat.st_size, stat.st_mtime_ns]
+                images[file] = image # Files that aren't images are stored as None so they aren't classified again
+                self.changed = True
+            if images[file] is not None:
+                result.append((os.path.join(folder, file),) + tuple(images[file]))
+        return result
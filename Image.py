@@ -1,8 +1,44 @@
-from PIL.ImageQt import ImageQt 
-import PIL.Image
+from PyQt5.QtGui import QImage, qRgb
 import cv2
 import numpy as np
 from copy import deepcopy
+import hashlib
+import os
+import re
+
+from Sharpness import focusMeasures
+from Session import shapesFromRows
+from MemoryBudget import budget, qimageBytes
+from Detection import BACKENDS, significantContours, fitCircles, fitEllipses, shapesInCircles
+from Registration import MIN_RESPONSE, registerPreviews
+
+PREVIEW_SIZE = 512 # Longest side in pixels of the downsampled image that previews are detected on
+GRAY_TABLE = [qRgb(i, i, i) for i in range(256)] # Colour table of Indexed8 images showing the raw image
+HIGHLIGHT_TABLE = [qRgb(255, i // 3, i // 3) for i in range(256)] # Colours of pixels above the threshold
+MATCH_DISTANCE = 150 # Shapes further than this (pixels) from the closest base shape aren't matched to it
+REGISTERED_MATCH_DISTANCE = 50 # Same, once the drift to the base image is corrected, see Image.getRegistration
+WELL_PATTERN = r"_([A-Z]{1,2}\d{1,3})f(\d{1,3})d\d" # Well and field example: 'scan_Plate_R_p03_0_{A02}f{00}d4.TIF'
+
+
+def thresholdColorTable(threshold):
+    """
+    Args:
+      threshold: Integer threshold, pixels above it are turned white by detection (see Detection.significantContours)
+    Returns:
+      Colour table for Image.indexedQt showing pixels at or below the threshold in gray and pixels above it in red.
+    """
+    threshold = min(max(int(threshold), -1), 255)
+    return GRAY_TABLE[:threshold + 1] + HIGHLIGHT_TABLE[threshold + 1:]
+
+def wellField(name):
+    """
+    Args:
+      name: Image file name. Ex. 'scan_Plate_R_p03_0_A02f00d4.TIF'
+    Returns:
+      (well, field) Ex. ("A02", "00"), ("", "") if the name has neither.
+    """
+    match = re.search(WELL_PATTERN, name)
+    return match.groups() if match else ("", "")
 
 
 class Image:
@@ -11,13 +47,22 @@ class Image:
         self.name = name # Image name with extension
         self.type = type_ # Either "BF" or "TR" for those collections respectively
         self.path = path # Full file path to image
+        self.well, self.field = wellField(name) # Plate position, images are only paired and matched within the same well and field
 
         self.view = view # Reference to ImageViewer
-
-        self.originalImg = self.preprocessImg(self.path) # Raw image
-
-        self.imgArr = self.preprocessImg(self.path) # 8-bit image represented by NumpyArray
-        self.imgQt = self.convertCvImage2QtImage(self.imgArr) # QtImage object
+        self.version = 0 # Incremented whenever the shapes, base shapes or detection parameters change
+        self._key, self._keyVersion = None, -1 # Cached content key, see contentKey()
+        self._pendingState = None # Shape data restored from a session but not built yet, see restoreState()
+        self.needsRedraw = False # True if the shapes aren't drawn on imgArr yet (Ex. restored from a session)
+        self.registration = None # (neighbour image name, dx, dy, response) translation to the next day towards the base, see getRegistration()
+
+        # Pixel buffers are registered with the memory budget and rebuilt when used after being evicted
+        self._originalImg = None # Raw image, see originalImg
+        self._imgArr = None # 8-bit image with shapes drawn, None while nothing is drawn. See imgArr
+        self._imgQt = None # QtImage object, see imgQt
+        self._preview = None # Downsampled raw image for previews and its scale, see preview
+        self._indexedQt = None # Indexed8 QtImage of the raw image for threshold previews, see indexedQt
+        self.shape = self.originalImg.shape[:2] # (height, width), decoding right away so unreadable files fail here
         self.threshold = 120
         self.radiusRange = (40, 500) if type_ == "BF" else (10, 100)
 
@@ -25,6 +70,205 @@ class Image:
         self.base_shapes = {} # Dictionary of {base shape id : shape data tuple} 
         self.ellipse = False # Keeps track of whether the shapes are ellipses or circles
 
+    # Changing any of these properties marks the image as changed (see touch)
+    @property
+    def shapes(self):
+        if self._pendingState is not None:
+            self.loadPendingState()
+        return self._shapes
+
+    @shapes.setter
+    def shapes(self, value):
+        if self._pendingState is not None:
+            self.loadPendingState()
+        self._shapes = value
+        self.touch()
+
+    @property
+    def base_shapes(self):
+        if self._pendingState is not None:
+            self.loadPendingState()
+        return self._base_shapes
+
+    @base_shapes.setter
+    def base_shapes(self, value):
+        if self._pendingState is not None:
+            self.loadPendingState()
+        self._base_shapes = value
+        self.touch()
+
+    @property
+    def threshold(self):
+        return self._threshold
+
+    @threshold.setter
+    def threshold(self, value):
+        self._threshold = value
+        self.touch()
+
+    @property
+    def radiusRange(self):
+        return self._radiusRange
+
+    @radiusRange.setter
+    def radiusRange(self, value):
+        self._radiusRange = value
+        self.touch()
+
+    @property
+    def ellipse(self):
+        return self._ellipse
+
+    @ellipse.setter
+    def ellipse(self, value):
+        self._ellipse = value
+        self.touch()
+
+    @property
+    def originalImg(self):
+        """Raw 8-bit image. Decoded again if it was evicted."""
+        img = self._originalImg
+        if img is None:
+            img = self._originalImg = self.preprocessImg(self.path)
+            budget.register(self, "originalImg", "pixels", img.nbytes, self.evictBuffer)
+        else:
+            budget.touch(self, "originalImg")
+        return img
+
+    @property
+    def imgArr(self):
+        """8-bit image with the shapes drawn on it, the raw image if nothing is drawn. Redrawn if it was evicted."""
+        img = self._imgArr
+        if img is not None:
+            budget.touch(self, "imgArr")
+            return img
+        if self.shapes or self.base_shapes:
+            self.redraw()
+            img = self._imgArr
+        return img if img is not None else self.originalImg
+
+    @imgArr.setter
+    def imgArr(self, value):
+        self.setImg(value)
+
+    @property
+    def imgQt(self):
+        """QtImage object of imgArr, converted when first used"""
+        img = self._imgQt
+        if img is None:
+            img = self._imgQt = self.convertCvImage2QtImage(self.imgArr)
+            budget.register(self, "imgQt", "overlay", qimageBytes(img), self.evictBuffer)
+        else:
+            budget.touch(self, "imgQt")
+        return img
+
+    @property
+    def preview(self):
+        """(Downsampled raw 8-bit image, scale factor) used for previews. The longest side is at most PREVIEW_SIZE."""
+        preview = self._preview
+        if preview is None:
+            img = self.originalImg
+            scale = min(PREVIEW_SIZE / max(img.shape[:2]), 1.0)
+            small = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1 else img
+            preview = self._preview = small, scale
+            budget.register(self, "preview", "zoom", small.nbytes if scale < 1 else 0, self.evictBuffer)
+        else:
+            budget.touch(self, "preview")
+        return preview
+
+    @property
+    def indexedQt(self):
+        """
+        Raw 8-bit image as an Indexed8 QtImage. Its colours only come from its 256 entry colour table,
+        so thresholds can be previewed by swapping the table without touching any pixels.
+        """
+        img = self._indexedQt
+        if img is None:
+            arr = np.ascontiguousarray(self.originalImg)
+            height, width = arr.shape[:2]
+            img = QImage(arr.data, width, height, arr.strides[0], QImage.Format_Indexed8).copy() # Copy owns its pixels
+            img.setColorTable(GRAY_TABLE)
+            self._indexedQt = img
+            budget.register(self, "indexedQt", "overlay", qimageBytes(img), self.evictBuffer)
+        else:
+            budget.touch(self, "indexedQt")
+        return img
+
+    def evictBuffer(self, name):
+        """Called by the memory budget to drop a pixel buffer. It's rebuilt the next time it's used."""
+        setattr(self, "_" + name, None) # Buffers are registered under their property name, see originalImg
+
+    def releaseBuffers(self):
+        """Drops all pixel buffers and unregisters them from the memory budget"""
+        budget.releaseOwner(self)
+        self._originalImg, self._imgArr, self._imgQt, self._preview, self._indexedQt = None, None, None, None, None
+
+    def touch(self):
+        """Marks the image as changed. Must be called after modifying shapes or base_shapes in place."""
+        self.version = self.version + 1
+
+    def restoreState(self, shapeRows, shapeIds, baseRows, baseIds):
+        """
+        Restores shapes and base shapes saved in a session. They are only built when first used.
+        Args:
+          shapeRows: Numpy float array of shape data, given by Session.shapeRows()
+          shapeIds: List of shape ids, one for every row of shapeRows
+          baseRows: Numpy float array of base shape data with the distance to the base shape as last column
+          baseIds: List of base shape ids, one for every row of baseRows
+        """
+        self._pendingState = (shapeRows, shapeIds, baseRows, baseIds)
+        self.needsRedraw = len(shapeIds) + len(baseIds) > 0
+        self.touch()
+
+    def loadPendingState(self):
+        """Builds the shapes and base shapes restored by restoreState()"""
+        shapeRows, shapeIds, baseRows, baseIds = self._pendingState
+        self._pendingState = None
+        self._shapes = shapesFromRows(shapeRows, shapeIds, self.ellipse)
+        baseShapes = shapesFromRows(baseRows[:, :-1], baseIds, self.ellipse)
+        self._base_shapes = {id_: (shape, dist) for id_, shape, dist in zip(baseIds, baseShapes, baseRows[:, -1].tolist())}
+
+    def contentKey(self):
+        """
+        Returns:
+          Hex digest of the shapes, base shapes and detection parameters. Equal keys mean equal content,
+          also across sessions. Only recalculated when the version changes.
+        """
+        if self._keyVersion != self.version:
+            content = (self.threshold, tuple(self.radiusRange), self.ellipse, self.shapes, sorted(self.base_shapes.items()))
+            self._key = hashlib.sha1(repr(content).encode()).hexdigest()
+            self._keyVersion = self.version
+        return self._key
+
+    def renderKey(self):
+        """
+        Returns:
+          Hex digest of everything the drawn image (see redraw) depends on, including the raw image file.
+        """
+        stat = os.stat(self.path)
+        parts = [self.contentKey(), stat.st_size, stat.st_mtime_ns, self.getBaseImage() is not None]
+        bfImage = self.view.bfImages.find(self) if self.type == "TR" and self.getBaseImage() is None else None
+        if bfImage is not None:
+            # Without a base image only sensors within spheroids are drawn
+            parts.append(bfImage.contentKey())
+        return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+    @property
+    def group(self):
+        """(well, field) of the image"""
+        return self.well, self.field
+
+    @property
+    def key(self):
+        """(well, field, id) of the image, unique within its collection. See ImageCollection.ImageIndex"""
+        return self.well, self.field, self.id
+
+    def getBaseImage(self):
+        """Returns the base image of the well and field of this image, None if there isn't one"""
+        if self.type == "TR":
+            return self.view.trImages.getBase(self)
+        return self.view.bfImages.getBase(self)
+
     def preprocessImg(self, img_path):
         """
         Normalize image using minimum and maximum bit values. Necessary to display TIFF properly.
@@ -50,6 +294,8 @@ class Image:
         Returns:
           ImageQt: Qt Image object, necessary for GUI display/Piximap.
         """
+        import PIL.Image # Imported on first use to speed up startup
+        from PIL.ImageQt import ImageQt
         PIL_image = PIL.Image.fromarray(cv_img_arr)
         return ImageQt(PIL_image)   
 
@@ -59,8 +305,11 @@ class Image:
         Args:
           imgArr: Numpy array of 8-bit image.
         """
-        self.imgArr = imgArr
-        self.imgQt = self.convertCvImage2QtImage(self.imgArr)            
+        self._imgArr = imgArr
+        budget.register(self, "imgArr", "overlay", imgArr.nbytes, self.evictBuffer)
+        budget.release(self, "imgQt")
+        self._imgQt = None
+        self.needsRedraw = False            
 
     def drawCircle(self, threshold, radius_range, pBar):
         """
@@ -70,41 +319,39 @@ class Image:
           radius_range: (int, int) Minimum and maximum radius range to consider in pixels.
           pBar: Thread object to be used to emit progress bar signals.
         """
-        pBar.incrementPbar.emit()
-        img = self.preprocessImg(self.path) # Start with fresh image to fit and draw shapes to
-
-        _, thresh = cv2.threshold(img, threshold, np.max(img), cv2.THRESH_BINARY)
-
-        # Retrieval modes and contour approximation types found on OpenCV docs
-        raw_contours, _ = cv2.findContours(thresh, cv2.RETR_TREE, cv2.CHAIN_APPROX_NONE)
-
-        # New contour array that only has significant contours
-        contours = [] 
-        for contour in raw_contours:
-            # Most items in raw contours are lines or small shapes
-            if cv2.contourArea(contour) < (np.pi * radius_range[0] ** 2):
-                continue
-            contours.append(contour)    
-
-        pBar.startPbar.emit(len(contours) + 2)
-        
-        # Get coordinates of circles
-        circle_coords = []
-        circle_num = 1
-        # Circles are numbered starting from 1
-        # circle_coord: (x, y), r, circ_num
-        for contour in contours:
-            pBar.incrementPbar.emit()
-
-            (x, y), r = cv2.minEnclosingCircle(contour) # Fits contours to a circle shape
-            if r > radius_range[1]:
-                continue
-            circle_coords.append([(x, y), r, str(circle_num)])
-            circle_num = circle_num + 1
+        self.setCircles(self.detect(threshold, radius_range, False, pBar))
 
+    def setCircles(self, circle_coords):
+        """
+        Sets detected circles as the shapes of the image and draws them. Spheroids (BF) without sensors in them are dropped.
+        Args:
+          circle_coords: List of circles, numbered starting from 1. Ex. from Detection.fitCircles()
+        """
+        circle_coords = self.nameSensors(circle_coords)
+        self.base_shapes = {}
+        self.shapes = deepcopy(circle_coords)
+        self.ellipse = False
+
+        colour_img = cv2.cvtColor(self.originalImg, cv2.COLOR_GRAY2RGB) # Convert to colour image to outline circles
+        colour = (255, 0, 0) # Red
+        thickness = 3    
+
+        # Actually draw circles to array
+        for (x, y), r, circ_num in circle_coords:
+            colour_img = cv2.circle(colour_img, (int(x),int(y)), int(r), colour, thickness) 
+        self.setImg(colour_img)    
+
+    def nameSensors(self, circle_coords):
+        """
+        Names the sensors of the matching TR image after the spheroid (BF circle) they're in. Ex. "1a", "1b", "2a", etc.
+        Args:
+          circle_coords: List of circles of this image. Ex. [[(x, y), r, "1"], ...]
+        Returns:
+          Circles that have sensors in them, all of them if there are no sensors to check.
+        """
         # Check if spheroids have sensors in them -- Only keep the ones that do
-        if self.type == "BF" and self.id in self.view.trImages.map:
-            trImage = self.view.trImages.map[self.id]
+        trImage = self.view.trImages.find(self) if self.type == "BF" else None
+        if trImage is not None:
             if len(trImage.shapes) > 0:
                 temp = []
                 # Letter map for sensor naming
@@ -128,19 +375,8 @@ class Image:
                             sensor_num = sensor_num + 1
 
                 circle_coords = temp
-
-        self.base_shapes = {}
-        self.shapes = deepcopy(circle_coords)
-        self.ellipse = False
-
-        colour_img = cv2.cvtColor(img, cv2.COLOR_GRAY2RGB) # Convert to colour image to outline circles
-        colour = (255, 0, 0) # Red
-        thickness = 3    
-
-        # Actually draw circles to array
-        for (x, y), r, circ_num in circle_coords:
-            colour_img = cv2.circle(colour_img, (int(x),int(y)), int(r), colour, thickness) 
-        self.setImg(colour_img)    
+                trImage.touch()
+        return circle_coords
 
 
     def drawEllipse(self, threshold, radius_range, pBar):
@@ -151,40 +387,60 @@ class Image:
           radius_range: (int, int) Minimum and maximum radius range (approx. circle) to consider in pixels.
           pBar: Thread object to be used to emit progress bar signals.
         """
-        pBar.incrementPbar.emit()
-        img = self.preprocessImg(self.path) # Start with fresh image to fit and draw shapes to
-
-        # Binary thresholding of image and calculation of contours
-        _, thresh = cv2.threshold(img, threshold, np.max(img), cv2.THRESH_BINARY)
-        raw_contours, _ = cv2.findContours(thresh, cv2.RETR_TREE, cv2.CHAIN_APPROX_NONE)
-
-        # Filter out smaller contours and create new contour list to analyze
-        contours = []
-        for contour in raw_contours:
-            # Most items in raw contours are lines or small shapes
-            if cv2.contourArea(contour) < (np.pi * radius_range[0] ** 2):
-                continue
-            contours.append(contour)
-
-        pBar.startPbar.emit(len(contours) + 2)
-
-        ellipse_coords = []
-        ellipse_num = 1
-        # Loop through contours and attemp to fit ellipse objects, if they're big enough add it
-        for contour in contours:
-            pBar.incrementPbar.emit()
-
-            (x,y),(w,h),ang = cv2.fitEllipse(contour)
-            if max(w,h) > radius_range[1]:
-                continue
-            ellipse_coords.append([(x,y),(w,h),ang,str(ellipse_num)])  
-            ellipse_num = ellipse_num + 1           
+        self.setEllipses(self.detect(threshold, radius_range, True, pBar))
 
+    def detect(self, threshold, radius_range, ellipse, pBar):
+        """
+        Detects circles or ellipses in the image with the detection backend of its collection (see Detection.BACKENDS).
+        Sensors (TR) are only searched for around the spheroids of the matching BF image when the TR collection crops
+        sensors (see sensorRegions), with the same results as searching the whole image and dropping the sensors
+        outside of the spheroids.
+        Args:
+          threshold: Integer value to run binary thresholding on.
+          radius_range: (int, int) Minimum and maximum radius range to consider in pixels.
+          ellipse: True to fit ellipses, False to fit circles.
+          pBar: Thread object to be used to emit progress bar signals.
+        Returns:
+          List of shapes, numbered starting from 1.
+        """
+        col = self.view.trImages if self.type == "TR" else self.view.bfImages
+        backend = BACKENDS[col.backend]
+        pBar.incrementPbar.emit()
+        regions = self.sensorRegions()
+        if regions:
+            shapes = backend.detectInCircles(self.originalImg, threshold, radius_range, ellipse, regions,
+                                             os.cpu_count() or 1, col.backendParams)
+            if shapes is not None:
+                pBar.startPbar.emit(2)
+                return shapes
+        shapes = backend.detect(self.originalImg, threshold, radius_range, ellipse, col.backendParams,
+                                lambda steps: pBar.startPbar.emit(steps + 2), pBar.incrementPbar.emit)
+        return shapesInCircles(shapes, regions) if regions else shapes
+
+    def sensorRegions(self):
+        """
+        Returns:
+          Circles of the matching BF image that sensors are searched in, see ImageCollection.cropSensors.
+          None if the whole image is searched (Ex. BF images, or the BF image has no circles yet).
+        """
+        if self.type != "TR" or not self.view.trImages.cropSensors:
+            return None
+        bfImage = self.view.bfImages.find(self)
+        if bfImage is None or bfImage.ellipse or not bfImage.shapes:
+            return None
+        return bfImage.shapes
+
+    def setEllipses(self, ellipse_coords):
+        """
+        Sets detected ellipses as the shapes of the image and draws them.
+        Args:
+          ellipse_coords: List of ellipses, numbered starting from 1. Ex. from Detection.fitEllipses()
+        """
         self.base_shapes = {}
         self.shapes = deepcopy(ellipse_coords)   
         self.ellipse = True
 
-        colour_img = cv2.cvtColor(img, cv2.COLOR_GRAY2RGB)
+        colour_img = cv2.cvtColor(self.originalImg, cv2.COLOR_GRAY2RGB)
         colour = (255, 0, 0) # Red
         thickness = 3
 
@@ -193,6 +449,32 @@ class Image:
             colour_img = cv2.ellipse(colour_img, ((x,y), (w,h), ang), colour, thickness); 
         self.setImg(colour_img) 
 
+    def drawPreview(self, threshold, radius_range, ellipse):
+        """
+        Quickly detects and draws shapes on the downsampled image (see preview), for showing while parameters change.
+        The shapes and drawn image of this Image are left untouched.
+        Args:
+          threshold: Integer value to run binary thresholding on.
+          radius_range: (int, int) Minimum and maximum radius range to consider in full resolution pixels.
+          ellipse: True to fit ellipses, False to fit circles.
+        Returns:
+          QtImage object of the downsampled image with the shapes drawn.
+        """
+        img, scale = self.preview
+        col = self.view.trImages if self.type == "TR" else self.view.bfImages
+        shapes = BACKENDS[col.backend].detect(img, threshold, (radius_range[0] * scale, radius_range[1] * scale), ellipse, col.backendParams)
+
+        colour_img = cv2.cvtColor(img, cv2.COLOR_GRAY2RGB)
+        colour = (255, 0, 0) # Red
+        thickness = max(int(round(3 * scale)), 1)
+        for shape in shapes:
+            if ellipse:
+                colour_img = cv2.ellipse(colour_img, (shape[0], shape[1], shape[2]), colour, thickness)
+            else:
+                (x, y), r, _ = shape
+                colour_img = cv2.circle(colour_img, (int(x), int(y)), int(r), colour, thickness)
+        return self.convertCvImage2QtImage(colour_img)
+
     def drawBaseShapes(self, colour_img):
         """
         Draws all the base shapes on the provided image. Base shapes are shapes of this image that correlate to the shapes of the base image.
@@ -217,48 +499,150 @@ class Image:
                 colour_img = cv2.circle(colour_img, (int(x),int(y)), int(r), colour, thickness) 
                 colour_img = cv2.putText(colour_img, circ_num, (int(x + r + 10), int(y)), font, 2, colour, thickness, cv2.LINE_AA)                                    
 
-    def redraw(self): 
-        """Draw shapes that correlate with the closest shapes on the base image. These are the base shapes."""
+    def matchBaseShapes(self):
+        """
+        Maps shapes to the base shapes (base_shapes), by tracking them from the base day when the collection tracks
+        shapes (see ImageCollection.trackShapes), else to the closest shapes on the base image. Only uses shape data,
+        and the downsampled pixels once per base image to correct the drift (see getRegistration).
+        """
+        if self.getBaseImage() is None:
+            return
+        col = self.view.trImages if self.type == "TR" else self.view.bfImages
+        if col.tracking and col.trackShapes(self):
+            return
+        candidates, registration = self.getBaseCandidates(), self.getRegistration()
+        for i in range(len(self.shapes)):
+            self.getClosestBaseShape(i, candidates, registration)
+
+    def redraw(self, region=None): 
+        """
+        Draw shapes that correlate with the closest shapes on the base image. These are the base shapes.
+        Args:
+          region: (Optional) (x0, y0, x1, y1) Only redraws this part of the drawn image, used after re-detecting a region.
+            The whole image is redrawn if there is a base image, as the base shapes may change anywhere.
+        """
         colour = (255, 0, 0) # Red
         thickness = 3        
-        font = cv2.FONT_HERSHEY_SIMPLEX
 
-        img = self.preprocessImg(self.path) # Start with raw image
-        colour_img = cv2.cvtColor(img, cv2.COLOR_GRAY2RGB)
-        # Define appropriate base image
-        if self.type == "TR":
-            base_img = self.view.trImages.baseImage
+        base_img = self.getBaseImage()
+        drawn = self._imgArr
+        x0, y0 = 0, 0
+        if region is not None and base_img is None and drawn is not None and drawn.ndim == 3:
+            x0, y0, x1, y1 = region
+            colour_img = cv2.cvtColor(self.originalImg[y0:y1, x0:x1], cv2.COLOR_GRAY2RGB)
         else:
-            base_img = self.view.bfImages.baseImage
+            region = None
+            img = self.originalImg # Start with raw image
+            colour_img = cv2.cvtColor(img, cv2.COLOR_GRAY2RGB)
 
-        shapes_to_remove = []
-        if self.ellipse:
-            for i in range(len(self.shapes)):
-                (x,y),(w,h),ang,num = self.shapes[i]
-                if base_img is not None:
-                    # Finding closest shapes to base image shapes and drawing them
-                    self.getClosestBaseShape(i)
+        if base_img is not None:
+            # Finding closest shapes to base image shapes and drawing them
+            self.matchBaseShapes()
+            self.drawBaseShapes(colour_img)
+        elif self.ellipse:
+            for (x,y),(w,h),ang,num in self.shapes:
                 # If it only is an integer, it is not within a spheroid, so ignore
-                elif self.type == "TR" and not self.isPointInAnySpheroid((x,y)):
-                    shapes_to_remove.append(self.shapes[i])
-                else:
-                    # Draw all in self.shapes if base image is None
-                    colour_img = cv2.ellipse(colour_img, ((x,y), (w,h), ang), colour, thickness); 
+                if self.type == "TR" and not self.isPointInAnySpheroid((x,y)):
+                    continue
+                # Draw all in self.shapes if base image is None
+                colour_img = cv2.ellipse(colour_img, ((x-x0,y-y0), (w,h), ang), colour, thickness); 
         else:
-            for i in range(len(self.shapes)):
-                (x, y), r, circ_num = self.shapes[i]              
-                if base_img is not None:
-                    self.getClosestBaseShape(i)
-                elif self.type == "TR" and not self.isPointInAnySpheroid((x,y)): # Ignore if sensor is not within a spheroid
-                    shapes_to_remove.append(self.shapes[i])
+            for (x, y), r, circ_num in self.shapes:
+                if self.type == "TR" and not self.isPointInAnySpheroid((x,y)): # Ignore if sensor is not within a spheroid
                     continue
-                else:
-                    colour_img = cv2.circle(colour_img, (int(x),int(y)), int(r), colour, thickness) 
-        if base_img is not None:
-            self.drawBaseShapes(colour_img)
-        map(self.shapes.remove, shapes_to_remove)
+                colour_img = cv2.circle(colour_img, (int(x)-x0,int(y)-y0), int(r), colour, thickness) 
+
+        if region is not None:
+            # Shapes are drawn shifted on the region only, then copied in. Shapes outside of it are clipped by OpenCV.
+            drawn = drawn.copy()
+            drawn[y0:y1, x0:x1] = colour_img
+            colour_img = drawn
         self.setImg(colour_img) 
 
+    def redetectRegion(self, rect, threshold, radius_range, ellipse=None):
+        """
+        Detects shapes again inside a rectangle only, with its own parameters, leaving the other shapes as they are.
+        Only the rectangle is thresholded and searched, so it takes time in proportion to its size, not the image's.
+        Shapes with their centre in the rectangle are replaced, shapes cut by its edges are ignored. Every new shape
+        takes the ID of the closest replaced shape, so IDs elsewhere in the image (and of a single re-traced shape)
+        stay the same. Extra shapes get new IDs.
+        Args:
+          rect: (x, y, w, h) Rectangle in image pixels.
+          threshold: Integer value to run binary thresholding on. Pixel values below this will be turned black, above white.
+          radius_range: (int, int) Minimum and maximum radius range to consider in pixels.
+          ellipse: (Optional) True to fit ellipses, False to fit circles. Defaults to the kind of shapes in the image.
+        Returns:
+          (list of IDs of the removed shapes, list of IDs of the new shapes)
+        """
+        if ellipse is None:
+            ellipse = self.ellipse if self.shapes else self.type == "TR"
+        height, width = self.shape
+        x, y, w, h = rect
+        x0, y0 = max(int(x), 0), max(int(y), 0)
+        x1, y1 = min(int(np.ceil(x + w)), width), min(int(np.ceil(y + h)), height)
+        if x1 <= x0 or y1 <= y0:
+            return [], []
+
+        # Image slicing gives a view, nothing outside of the rectangle is copied or thresholded
+        contours = significantContours(self.originalImg[y0:y1, x0:x1], threshold, radius_range[0], (x0, y0))
+        # Contours cut by the rectangle are parts of shapes outside of it (unless it's cut by the image edge)
+        def isCut(contour):
+            bx, by, bw, bh = cv2.boundingRect(contour)
+            return (bx == x0 > 0) or (by == y0 > 0) or (bx + bw == x1 < width) or (by + bh == y1 < height)
+        contours = [contour for contour in contours if not isCut(contour)]
+        found = fitEllipses(contours, radius_range[1]) if ellipse else fitCircles(contours, radius_range[1])
+
+        kept, removed = [], []
+        shapes = self.shapes if ellipse == self.ellipse else [] # Switching between circles and ellipses replaces all
+        for shape in shapes:
+            (cx, cy) = shape[0]
+            (removed if x0 <= cx < x1 and y0 <= cy < y1 else kept).append(shape)
+
+        # New shapes take the IDs (and list positions) of the closest replaced shapes, one each
+        replacements = {}
+        extra = []
+        nextId = 1 + max([int(re.match(r"\d*", shape[-1]).group() or 0) for shape in shapes] or [0])
+        for shape in found:
+            free = [old for old in removed if old[-1] not in replacements]
+            if free:
+                closest = min(free, key=lambda old: self.distance(old[0], shape[0]))
+                shape[-1] = closest[-1]
+                replacements[closest[-1]] = shape
+            else:
+                shape[-1] = str(nextId)
+                nextId = nextId + 1
+                extra.append(shape)
+        newShapes = [replacements.get(shape[-1]) if shape in removed else shape for shape in shapes]
+        newShapes = [shape for shape in newShapes if shape is not None] + extra
+        if not ellipse:
+            newShapes = self.nameSensors(newShapes) # Spheroids without sensors are dropped, like in drawCircle
+        dropped = [shape for shape in kept if shape not in newShapes]
+        self.base_shapes = {}
+        self.shapes = deepcopy(newShapes)
+        self.ellipse = ellipse
+
+        # Only the rectangle and the outlines of the shapes that changed need redrawing
+        self.redraw(self.shapeBounds(removed + found + dropped, (x0, y0, x1, y1)) if shapes else None)
+        return [shape[-1] for shape in removed + dropped], [shape[-1] for shape in found if shape in newShapes]
+
+    def shapeBounds(self, shapes, rect):
+        """
+        Args:
+          shapes: List of shape data. (Ellipse: [(x,y),(w,h),ang,id] ; Circle: [(x,y),r,id])
+          rect: (x0, y0, x1, y1) Rectangle to include.
+        Returns:
+          (x0, y0, x1, y1) Smallest rectangle holding rect and the drawn outlines of the shapes, within the image.
+        """
+        x0, y0, x1, y1 = rect
+        for shape in shapes:
+            (x, y) = shape[0]
+            r = max(shape[1]) / 2 if len(shape) == 4 else shape[1]
+            x0, y0 = min(x0, int(x - r)), min(y0, int(y - r))
+            x1, y1 = max(x1, int(np.ceil(x + r)) + 1), max(y1, int(np.ceil(y + r)) + 1)
+        pad = 3 # Outline thickness
+        height, width = self.shape
+        return max(x0 - pad, 0), max(y0 - pad, 0), min(x1 + pad, width), min(y1 + pad, height)
+
     ## Helper Funcitons ##
     def isPointInsideCircle(self, point, circle_coords):
         """
@@ -282,48 +666,84 @@ class Image:
         Returns:
             True if that point is in any of the spheroids drawn
         """
-        bfImage = self.view.bfImages.map[self.id]
+        bfImage = self.view.bfImages.find(self)
         for shape in bfImage.shapes:
             if self.isPointInsideCircle(point, shape):
                 return True
         return False
 
-    def getClosestBaseShape(self, idx):
+    def getRegistration(self):
+        """
+        Estimates the translation of this image relative to its base image (Ex. stage drift between days) by phase
+        correlation of the downsampled images. Shapes grow between days, so every image is only correlated with the
+        next day towards the base day, and the translations are chained up to the base image. Each translation is
+        estimated once per neighbour. BF and TR images of the same day share the translation of the BF image as it has
+        more structure to correlate.
+        Returns:
+          (dx, dy, reliable) A base shape at (x, y) is expected at (x + dx, y + dy) in this image. (0, 0, False) if
+          there is no base image or a correlation along the way is too weak to trust.
+        """
+        base = self.getBaseImage()
+        if base is None or base is self:
+            return 0.0, 0.0, base is self
+        if self.type == "TR":
+            bfImage = self.view.bfImages.find(self)
+            if bfImage is not None and self.view.bfImages.getBase(bfImage) is not None:
+                return bfImage.getRegistration()
+        col = self.view.trImages if self.type == "TR" else self.view.bfImages
+        neighbour = col.index.step(self, base) or base # Images outside of the collection are correlated with the base directly
+        if self.registration is None or self.registration[0] != neighbour.name:
+            self.registration = (neighbour.name,) + registerPreviews(self.preview, neighbour.preview)
+        _, dx, dy, response = self.registration
+        if response < MIN_RESPONSE:
+            return 0.0, 0.0, False
+        if neighbour is base:
+            return dx, dy, True
+        baseDx, baseDy, reliable = neighbour.getRegistration()
+        return baseDx + dx, baseDy + dy, reliable
+
+    def getBaseCandidates(self):
+        """
+        Returns:
+          (list of base image shapes that shapes can be matched to, numpy array of their (x, y) centres)
+        """
+        base_shapes = [shape for shape in self.getBaseImage().shapes if not (self.type == "TR" and self.isInt(shape[-1]))]
+        return base_shapes, np.array([shape[0] for shape in base_shapes], dtype=float).reshape(-1, 2)
+
+    def getClosestBaseShape(self, idx, candidates=None, registration=None):
         """
         Add shape to base shapes (base_shapes) with id correlating to the closest base shape.
+        Distances are measured after correcting for the translation to the base image, so a tighter gate is used.
         Args:
           idx: Index of shape to add to base shapes
+          candidates: (Optional) Result of getBaseCandidates(), to reuse it for every shape
+          registration: (Optional) Result of getRegistration(), to reuse it for every shape
         """
-        if self.type == "TR":
-            base_shapes = self.view.trImages.baseImage.shapes
-        else:
-            base_shapes = self.view.bfImages.baseImage.shapes
-        
+        base_shapes, centres = candidates if candidates is not None else self.getBaseCandidates()
+        dx, dy, reliable = registration if registration is not None else self.getRegistration()
+
         # Finding closest base shape to the current shape
-        min_dist = float('inf')
-        closest_shape = None
-        for shape in base_shapes:
-            if self.type == "TR" and self.isInt(shape[-1]):
-                continue
-            dist = self.distance(self.shapes[idx][0], shape[0])
-            if dist < min_dist:
-                min_dist = dist
-                closest_shape = shape
+        if len(base_shapes) == 0:
+            return
+        (x, y) = self.shapes[idx][0]
+        dists = np.hypot(centres[:, 0] - (x - dx), centres[:, 1] - (y - dy))
+        closest = int(np.argmin(dists))
+        min_dist = float(dists[closest])
+        closest_shape = base_shapes[closest]
 
         # Replace in self.base_shapes if it is closer to the closest base shape
         # than any other shape in this image
-        if closest_shape is None:
-            return
         closest_shape_num = closest_shape[-1]
         closest_base_shape = self.base_shapes.get(closest_shape_num)
         if closest_base_shape is None or min_dist < closest_base_shape[1]:
-            if min_dist > 150:
-                # If closest shape is arbitrarily far away (150 pixels), ignore it 
+            if min_dist > (REGISTERED_MATCH_DISTANCE if reliable else MATCH_DISTANCE):
+                # If closest shape is arbitrarily far away, ignore it
                 return
             temp = deepcopy(self.shapes[idx])
             temp[-1] = closest_shape[-1]
 
             self.base_shapes[closest_shape_num] = temp, min_dist   
+            self.touch()
     
     def distance(self, p0, p1):
         """
@@ -333,7 +753,7 @@ class Image:
         Returns:
           distance: Distance between two points
         """
-        return np.sqrt((p0[0] - p1[0])**2 + (p0[1] - p1[1])**2)
+        return float(np.sqrt((p0[0] - p1[0])**2 + (p0[1] - p1[1])**2))
 
     def isInt(self, num):
         """
@@ -349,7 +769,5 @@ class Image:
             return False    
 
     def getSharpness(self):
-        """Returns the sharpness value of the image"""
-        # Compute the Laplacian of the image and then return the shar[ness]
-        # measure, which is simply the variance of the Laplacian
-        return cv2.Laplacian(self.imgArr, cv2.CV_64F).var()            
\ No newline at end of file
+        """Returns the sharpness value (variance of the Laplacian) of the raw image, without any drawn shapes"""
+        return focusMeasures(self.originalImg)["laplacian"]
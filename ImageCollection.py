@@ -1,3 +1,68 @@
+from bisect import bisect_left, insort
+from copy import deepcopy
+
+from SharedFrames import FrameStore, pool
+from Tracking import TrackChain, shapePoints
+from Image import MATCH_DISTANCE, REGISTERED_MATCH_DISTANCE
+
+
+class ImageIndex:
+    """
+    Index of images by (well, field, id). Lookups are O(1) and the keys are kept sorted for range scans,
+    Ex. every day of one well, or days p02 to p05 of a single field. Wells and fields are "" when file names have none.
+    """
+    def __init__(self):
+        self.images = {} # {(well, field, id) : Image}
+        self.keys = [] # Sorted keys of images
+
+    def add(self, image):
+        """Adds an image, replacing the image with the same key if there is one"""
+        if image.key not in self.images:
+            insort(self.keys, image.key)
+        self.images[image.key] = image
+
+    def get(self, well, field, id_):
+        """Returns the image with the given well, field and id, None if there isn't one"""
+        return self.images.get((well, field, id_))
+
+    def scan(self, well=None, field=None, start=None, stop=None):
+        """
+        Args:
+          well: (Optional) Only images of this well.
+          field: (Optional) Only images of this field, requires well.
+          start: (Optional) Smallest id to include, requires well and field.
+          stop: (Optional) Largest id to include, requires well and field.
+        Returns:
+          List of images in key order, i.e. by well, field and id.
+        """
+        if well is None:
+            return [self.images[key] for key in self.keys]
+        prefix = (well,) if field is None else (well, field)
+        lo = bisect_left(self.keys, prefix + ((start,) if start is not None and field is not None else ()))
+        images = []
+        for key in self.keys[lo:]:
+            if key[:len(prefix)] != prefix or (stop is not None and field is not None and key[2] > stop):
+                break
+            images.append(self.images[key])
+        return images
+
+    def step(self, image, target):
+        """
+        Returns:
+          The image next to image in id order within its well and field, in the direction of target (Ex. the day before
+          image if target is an earlier day). None if either image isn't in the index or they're in different groups.
+        """
+        if self.images.get(image.key) is not image or self.images.get(target.key) is not target or image.group != target.group:
+            return None
+        if image is target:
+            return image
+        i = bisect_left(self.keys, image.key)
+        return self.images[self.keys[i + 1 if target.key > image.key else i - 1]]
+
+    def groups(self):
+        """Returns the sorted list of distinct (well, field) of the images"""
+        return sorted(set(key[:2] for key in self.keys))
+
 class ImageCollection:
     """
     Image Collection object used to refer to a set of images.
@@ -13,15 +78,160 @@ class ImageCollection:
         self.baseImage = None # Image Object that defines that each image in col. looks for to map base shapes
         self.baseId = None # ID of the base shape
 
-        self.map = {} # Map of image IDs to Image objects
+        self.index = ImageIndex() # Every image by (well, field, id), see ImageIndex
+        self.group = ("", "") # (well, field) of the images in map, the one on screen
+        self.map = {} # Map of image IDs to Image objects of the current group
+        self.label = "" # Name of the group of a collection made by subset(), used in export file names
+        self.tracking = True # If True base shapes are tracked day to day (see trackShapes), else every day is matched to the base image alone
+        self.tracks = {} # Tracks from the base day of every group, {((well, field), forward in time) : Tracking.TrackChain}
+        self.cropSensors = False # TR only. If True sensors are only searched for around the spheroids of the BF images, see Image.sensorRegions
+        self.backend = "contour" # Name of the detection backend of the images, see Detection.BACKENDS
+        self.backendParams = {} # Parameters of the backend that differ from its defaults, see Detection.Backend.params
+
+        self.frames = FrameStore() # Raw frames shared with worker processes, see detectAll()
 
     def initMap(self):
-        """Populate dictionary with images --> dict - {id : Image}"""
+        """Populate the index with images and the map with the images of the current group, or the first one"""
+        self.index = ImageIndex()
         for image in self.list:
+            self.index.add(image)
+        groups = self.index.groups()
+        self.setGroup(self.group if self.group in groups or not groups else groups[0])
+
+    def add(self, image):
+        """Adds a new image to the collection"""
+        self.list.append(image)
+        self.index.add(image)
+        if image.group == self.group:
             self.map[image.id] = image
 
+    def setGroup(self, group):
+        """
+        Makes the images of a single well and field the current group, i.e. the images in map. Ex. the group on screen
+        Args:
+          group: (well, field) tuple
+        """
+        self.group = group
+        self.map = {image.id: image for image in self.index.scan(*group)}
+        self.baseImage = self.map.get(self.baseId) if self.baseId is not None else None
+
+    def setBase(self, id_):
+        """
+        Sets the base id of every group, the base image of each image is the image of its own group with this id.
+        Args:
+          id_: ID of the base images, None to clear them.
+        """
+        self.baseId = id_
+        self.baseImage = self.map.get(id_) if id_ is not None else None
+
+    def find(self, image):
+        """Returns the image of this collection with the same well, field and id as image. Ex. the TR image of a BF image"""
+        return self.index.get(image.well, image.field, image.id)
+
+    def getBase(self, image):
+        """Returns the base image of the group of image, None if there isn't one"""
+        if self.baseId is None:
+            return None
+        return self.index.get(image.well, image.field, self.baseId)
+
+    def trackShapes(self, image):
+        """
+        Links the shapes of every day between the base day and an image into tracks, predicting the position and size
+        of every shape from the previous days (see Tracking), and stores the linked shapes as the base shapes of those
+        days. Days are in id order within the well and field of the image, days without shapes yet are skipped.
+        Only days that are new or changed since the last call are linked again.
+        Args:
+          image: Image object of this collection, not the base image.
+        Returns:
+          False if the image can't be tracked (Ex. it isn't in the collection), True otherwise.
+        """
+        base = self.getBase(image)
+        days = self.index.scan(*image.group)
+        if base is None or base is image or image not in days or base not in days:
+            return False
+        i, b = days.index(image), days.index(base)
+        path = days[b + 1:i + 1] if i > b else days[b - 1:i - 1 if i > 0 else None:-1]
+        path = [img for img in path if img.shapes or img is image]
+
+        baseShapes, _ = base.getBaseCandidates()
+        ids, points = [shape[-1] for shape in baseShapes], shapePoints(baseShapes)
+        seed = ((base.path, tuple(ids), points.tobytes()), ids, points)
+        days = []
+        for img in path:
+            dx, dy, reliable = img.getRegistration()
+            points = shapePoints(img.shapes, (dx, dy)) # In base image coordinates
+            gate = REGISTERED_MATCH_DISTANCE if reliable else MATCH_DISTANCE
+            days.append(((img.path, points.tobytes(), gate), points, gate))
+
+        chain = self.tracks.setdefault((image.group, i > b), TrackChain())
+        for img, links in zip(path, chain.update(seed, days)):
+            base_shapes = {}
+            for id_, (j, dist) in links.items():
+                shape = deepcopy(img.shapes[j])
+                shape[-1] = id_
+                base_shapes[id_] = shape, dist
+            if base_shapes != img.base_shapes:
+                img.base_shapes = base_shapes
+        return True
+
+    def groups(self):
+        """Returns the sorted list of (well, field) of the images"""
+        return self.index.groups()
+
+    def subset(self, group):
+        """
+        Args:
+          group: (well, field) tuple
+        Returns:
+          New collection with only the images of a group, sharing the base id. Ex. to export every well of a plate separately.
+        """
+        col = ImageCollection(self.type, None)
+        col.path, col.baseId = self.path, self.baseId
+        col.list = self.index.scan(*group)
+        col.group = group
+        col.backend, col.backendParams = self.backend, self.backendParams
+        col.label = "".join(part for part in (group[0], "f" + group[1] if group[1] else "") if part)
+        col.initMap()
+        return col
+
     def reset(self):
         """Reset full image collection. Used when selected new set of images."""
+        self.frames.release()
+        for image in self.list:
+            image.releaseBuffers()
         self.list = []
+        self.index = ImageIndex()
         self.map = {}
+        self.group = ("", "")
         self.baseImage = None
+        self.baseId = None
+        self.tracks = {}
+
+    def detectAll(self, images, threshold, radiusRange, ellipse, pBar=None):
+        """
+        Detects and draws the shapes of many images of this collection in worker processes, same as calling
+        drawCircle/drawEllipse on each of them. Frames reach the workers through shared memory (self.frames)
+        and only the shape tables come back. The shared frames are released afterwards.
+        Args:
+          images: List of Image objects of this collection.
+          threshold: Integer value to run binary thresholding on.
+          radiusRange: (int, int) Minimum and maximum radius range to consider in pixels.
+          ellipse: True to fit ellipses, False to fit circles.
+          pBar: (Optional) Thread object to be used to emit progress bar signals.
+        """
+        callback = None
+        if pBar is not None:
+            pBar.startPbar.emit(len(images))
+            callback = lambda image, shapes: pBar.incrementPbar.emit()
+        circles = {image.path: image.sensorRegions() for image in images}
+        try:
+            results = pool.detect(self.frames, images, threshold, radiusRange, ellipse, callback, circles,
+                                  self.backend, self.backendParams)
+        finally:
+            self.frames.release(images)
+        # Applied in order here, circles depend on the sensors of the matching TR image
+        for image in images:
+            if ellipse:
+                image.setEllipses(results[image.path])
+            else:
+                image.setCircles(results[image.path])
@@ -3,16 +3,21 @@ from PyQt5.QtWidgets import QApplication, QWidget
 from PyQt5.QtCore import QTimer
 from PyQt5 import QtCore, QtGui, QtWidgets
 
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
-from matplotlib.figure import Figure
-from numpy import arange
-
-from Image import Image
+from Image import Image, thresholdColorTable, wellField
 from ImageCollection import ImageCollection
 from Export import ExportThread
+from Sharpness import SharpnessEngine
+from FocusStack import bestFocusSlices, writeFocusStack
+from Session import saveSession, loadSession
+from Watch import FolderWatcher
+from FolderIndex import FolderIndex
+from Sweep import sweepGrid, runSweep
+from MemoryBudget import budget, qimageBytes
+
+import cv2
+import os, re, tempfile, time
 
-import os, re
+SHARPNESS_TITLES = {"BF": "Spheroid Sharpness", "TR": "Sensor Sharpness"} # Sharpness graph title of each image collection
 
 class ImageViewer:
     """Image viewer class to display an image with zoom and pan functionaities."""
@@ -23,7 +28,7 @@ class ImageViewer:
         self.currImageCol = self.trImages   # Current image collection
 
         self.window = window
-        self.qimage_scaled = QImage()       # Scaled image to fit to the size of currImageCol.qlabel
+        self._qimage_scaled = QImage()      # Scaled image to fit to the size of currImageCol.qlabel, see qimage_scaled
         self.qpixmap = QPixmap()            # QPixmap to fill the currImageCol.qlabel
 
         self.zoomX = 1                      # Zoom factor w.r.t size of currImageCol.qlabel
@@ -31,11 +36,25 @@ class ImageViewer:
         self.mousex, self.mousey = 0, 0
         self.panFlag = False                # To enable or disable pan
         self.pressed = False                # Mouse pressed
+        self.regionMode = False             # If True, dragging selects a region of the image to re-detect, see setRegionMode
+        self.regionOrigin = None            # Widget position where the region selection started
+        self.rubberBand = None              # QRubberBand showing the region being selected
+        self.roi = None                     # (x, y, w, h) Selected region in image pixels, None if no region is selected
+        self.thresholdPreview = False       # If True, the raw image is shown with the pixels above the threshold highlighted
 
         self.basePath = ""
         self.dayFolders = []                # If populated, folder structure is in Days
         self.isZstack = False               # If True, folder structure in in Z-Stack
+        self.folderIndex = None             # Cached listing of the experiment folders, see FolderIndex
         self.sharpnessGraphs = []           # Sharpness graph windows for Z-Stacks
+        self.sharpnessCurves = {}           # Focus curves of the Z-Stack, {graph title : curve}
+        self.focusStackDir = None           # Temporary folder of the focus stack composites, deleted with the images
+        self.sweepWindows = []              # Heatmap windows of parameter sweeps
+        self.lastParams = {}                # Last detection parameters of each collection, {type : (threshold, radius range, ellipse)}
+        self.liveExports = {}               # Exports repeated in live mode when new images arrive, {export type : ExportThread arguments}
+        self.watcher = None                 # FolderWatcher of live mode, None until live mode is first enabled
+        self.ingestThread = None            # Thread of the current live mode step: loading, detecting or exporting new images
+        self.isIngesting = False            # True from loading new images in live mode until their exports are done
 
         self.currImage = None               # Current Image object being displayed in the viewer
         self.currImageIdx = -1              # Index of current image object being displayed (in qlist and col.list)
@@ -77,112 +96,153 @@ class ImageViewer:
         Args:
           pBar: Thread object used to emit signals to the progress bar
         """
-        VALID_FORMAT = ('.TIFF', '.TIF')  # Image formats supported
-        id_pattern = "(p\d{1,4})" # Image id example: 'scan_Plate_R_{p03}_0_A02f00d4.TIF',
-        zStack_pattern = r"z(\d{1,4}).*d(\d)" # Zstack image example: 'EGFP_1mm_Plate_R_p00_{z79}_0_A02f00{d4}.TIF'
-
         self.bfImages.reset()
         self.trImages.reset()
 
+        imageFiles = self.listImageFiles()
+        pBar.startPbar.emit(len(imageFiles))
+        for im_path, id_, name, type_ in imageFiles:
+            pBar.incrementPbar.emit()
+            image_obj = Image(id_, name, type_, im_path, self)
+            if type_ == "BF":
+                self.bfImages.list.append(image_obj)
+            else:
+                self.trImages.list.append(image_obj)
+
+        self.bfImages.initMap()
+        self.trImages.initMap()
+        return
+
+    def listImageFiles(self):
+        """
+        Lists the images of the folder structure found by findFolderStructure(), without loading them.
+        Only files that are new since the folder index was saved are classified.
+        Returns:
+          List of (path, id_, name, type_) of every image file, in folder listing order.
+        """
+        imageFiles = []
         # If data is timelapse divided into BF and Texas Red Folders
         if len(self.dayFolders) == 0 and not self.isZstack:
-            # Initializing progress bar
-            totalNumFiles = len(os.listdir(self.bfImages.path)) + len(os.listdir(self.trImages.path))
-            pBar.startPbar.emit(totalNumFiles)
-
-            # Populate Bright Field image list
-            for file in os.listdir(self.bfImages.path):
-                pBar.incrementPbar.emit()
-                if file.upper().endswith(VALID_FORMAT):
-                    im_path = os.path.join(self.bfImages.path, file)
-
-                    match = re.search(id_pattern, file)
-                    if match:
-                        id_ = match.group()
-                    else:
-                        continue
-
-                    image_obj = Image(id_, file, "BF", im_path, self)
-                    self.bfImages.list.append(image_obj)
-
-            # Populate Texas Red image list
-            for file in os.listdir(self.trImages.path):
-                pBar.incrementPbar.emit()
-                if file.upper().endswith(VALID_FORMAT):
-                    im_path = os.path.join(self.trImages.path, file)
-
-                    match = re.search(id_pattern, file)
-                    id_ = match.group()
-
-                    image_obj = Image(id_, file, "TR", im_path, self)
-                    self.trImages.list.append(image_obj)
+            for folder in (self.bfImages.path, self.trImages.path):
+                imageFiles += self.folderIndex.images(folder, "BF" if folder == self.bfImages.path else "TR", lambda file: self.classifyFile(file, folder))
         elif self.isZstack: # If Z-stack folder structure
-            # Initialize progress bar
-            pBar.startPbar.emit(len(os.listdir(self.basePath)))
-
-            for file in os.listdir(self.basePath):
-                pBar.incrementPbar.emit()
-                if file.upper().endswith(VALID_FORMAT):
-                    im_path = os.path.join(self.basePath, file)
-
-                    match = re.search(zStack_pattern, file)
-                    if not match or len(match.groups()) != 2:
-                        continue
-                    # Needs (match.groups(),) to unpack tuple properly
-                    for id_, type_ in (match.groups(),):
-                        if type_ == "4": # Number beside "d" in the image name
-                            image_obj = Image(id_, file, "BF", im_path, self)
-                            self.bfImages.list.append(image_obj)
-                        elif type_ == "2": # Number beside "d" in the image name
-                            image_obj = Image(id_, file, "TR", im_path, self)
-                            self.trImages.list.append(image_obj)
-                        else:
-                            continue
+            imageFiles += self.folderIndex.images(self.basePath, "z", lambda file: self.classifyFile(file, self.basePath))
         else: # Or else it must be daily folders
-            # Initializing progress bar
-            totalNumFiles = len(self.dayFolders*3) # 3 files in every day folder
-            pBar.startPbar.emit(totalNumFiles)
-
-            day_file_pattern = "_.{6}d(\d)" # Looks for _ followed by 6 characters + d, and then a digit after that
-
             for day_num, day_path in self.dayFolders:
-                for file in os.listdir(day_path):
-                    pBar.incrementPbar.emit()
-
-                    im_path = os.path.join(day_path, file)
-                    # All files with day structure have p00, so in id and name it's replaced with p[day_num]
-                    id_ = "p{0:0=2d}".format(int(day_num))
-                    name = file.replace("p00",id_)
-
-                    match = re.search(day_file_pattern, file)
-                    if match:
-                        groups = match.groups()[0]
-                        if groups == "4": # Number beside "d" in the image name
-                            image_obj = Image(id_, name, "BF", im_path, self)
-                            self.bfImages.list.append(image_obj)
-                        elif groups == "3": # Number beside "d" in the image name
-                            image_obj = Image(id_, name, "TR", im_path, self)
-                            self.trImages.list.append(image_obj)
-                        else:
-                            continue
+                imageFiles += self.folderIndex.images(day_path, "d" + day_num, lambda file: self.classifyFile(file, day_path, day_num))
+        self.folderIndex.save()
+        return [imageFile[:4] for imageFile in imageFiles]
 
-        self.bfImages.initMap()
-        self.trImages.initMap()
-        return
+    def classifyFile(self, file, folder, day_num=None):
+        """
+        Finds the id, display name and collection of an image file in the current folder structure.
+        Args:
+          file: File name. Ex. 'scan_Plate_R_p03_0_A02f00d4.TIF'
+          folder: Folder the file is in.
+          day_num: (Optional) Day number of the day folder the file is in, for the day folder structure.
+        Returns:
+          (id_, name, type_) or None if the file isn't an image of the experiment.
+        """
+        VALID_FORMAT = ('.TIFF', '.TIF')  # Image formats supported
+        id_pattern = r"(p\d{1,4})" # Image id example: 'scan_Plate_R_{p03}_0_A02f00d4.TIF',
+        zStack_pattern = r"z(\d{1,4}).*d(\d)" # Zstack image example: 'EGFP_1mm_Plate_R_p00_{z79}_0_A02f00{d4}.TIF'
+        day_file_pattern = r"_.{6}d(\d)" # Looks for _ followed by 6 characters + d, and then a digit after that
+
+        if day_num is not None:
+            # All files with day structure have p00, so in id and name it's replaced with p[day_num]
+            id_ = "p{0:0=2d}".format(int(day_num))
+            match = re.search(day_file_pattern, file)
+            if not match:
+                return None
+            type_ = {"4": "BF", "3": "TR"}.get(match.groups()[0]) # Number beside "d" in the image name
+            return (id_, file.replace("p00", id_), type_) if type_ else None
+
+        if not file.upper().endswith(VALID_FORMAT):
+            return None
+        if self.isZstack:
+            match = re.search(zStack_pattern, file)
+            if not match:
+                return None
+            id_, type_ = match.groups()
+            type_ = {"4": "BF", "2": "TR"}.get(type_) # Number beside "d" in the image name
+            return (id_, file, type_) if type_ else None
+
+        match = re.search(id_pattern, file)
+        if not match:
+            return None
+        return match.group(), file, "BF" if folder == self.bfImages.path else "TR"
 
     def selectDir(self):
         """
         Select a directory, then make and initialize ImageCollections based on folder structure.
         --> 3 possible folder structures: timelapse, day folders, and z-stack
         """
+        # Keep the detection state of the current experiment before switching
+        self.saveSession()
+        self.window.menu_watch.setChecked(False)
+        self.liveExports = {}
+
         # open 'select folder' dialog box
         self.basePath = str(QtWidgets.QFileDialog.getExistingDirectory(self.window, "Select Directory")) + "/"
         if not self.basePath:
             QtWidgets.QMessageBox.warning(self.window, 'No Folder Selected', 'Please select a valid Folder')
             return
 
+        error = self.findFolderStructure()
+        if error is not None:
+            QtWidgets.QMessageBox.warning(self.window, *error)
+            return
+
+        self.window.tabWidget.setCurrentIndex(1)
+        self.removeFocusStacks()
+
+        # Pass off loading images to a separate thread as it can be computationally intensive 
+        self.thread = InitializeImagesThread(self)
+
+        self.thread.startPbar.connect(self.window.startPbar)
+        self.thread.incrementPbar.connect(self.window.incrementPbar)
+        self.thread.finishPbar.connect(self.window.finishPbar)
+        self.thread.finished.connect(self.restoreSession)
+        self.thread.finished.connect(self.finishedInitializing)
+
+        self.thread.start()
+
+    def saveSession(self):
+        """Saves the detection state of all images to the session file of the experiment folder"""
+        if not self.basePath or self.numImages <= 0:
+            return
+        try:
+            numSaved = saveSession(self.basePath, self.bfImages.list + self.trImages.list, self.bfImages.baseId)
+        except OSError as error:
+            self.window.statusbar.showMessage("Session could not be saved: {}".format(error), 5000)
+            return
+        if numSaved:
+            self.window.statusbar.showMessage("Session saved ({} images)".format(numSaved), 5000)
+
+    def restoreSession(self):
+        """Restores the detection state saved in the experiment folder, if there is one. No shapes are detected."""
+        baseId, numRestored = loadSession(self.basePath, self.bfImages.list + self.trImages.list)
+        if baseId is not None and all(any(img.id == baseId for img in col.list) for col in (self.bfImages, self.trImages)):
+            self.trImages.setBase(baseId)
+            self.bfImages.setBase(baseId)
+        if numRestored:
+            self.window.statusbar.showMessage("Session restored ({} images)".format(numRestored), 5000)
+
+    def findFolderStructure(self):
+        """
+        Finds which of the 3 folder structures basePath is in and sets the collection paths, day folders, or z-stack flag.
+        Returns:
+          None if the structure is supported, else (title, message) tuple describing the problem.
+        """
+        self.bfImages.path, self.trImages.path = "", ""
+        self.dayFolders = []
+        self.isZstack = False
+
+        if self.folderIndex is None or self.folderIndex.basePath != self.basePath:
+            self.folderIndex = FolderIndex(self.basePath)
+
         # Get array of subdirectories with formatting removed (dir_clean)
-        subdirs = next(os.walk(self.basePath))[1]
+        subdirs, files = self.folderIndex.listing(self.basePath)
         dirs = [os.path.join(self.basePath, dir_) for dir_ in subdirs]
         dir_clean = list(map(str.strip, list(map(str.upper, subdirs))))
 
@@ -206,7 +266,7 @@ class ImageViewer:
 
         if len(dir_clean) == 0:
             # If folder is structured in terms of Z-Stack
-            for file in os.listdir(self.basePath):
+            for file in files:
                 zStack_pattern = r"z(\d{1,4}).*d(\d)"
                 match = re.search(zStack_pattern, file)
                 if match:
@@ -214,26 +274,12 @@ class ImageViewer:
                     break
 
         if len(self.dayFolders) + len(self.trImages.path + self.bfImages.path) == 0 and not self.isZstack:
-            QtWidgets.QMessageBox.warning(self.window, 'Improper Folder Structure', 'Folder structure selected is not supported. Please refer to available documentation.')
-            return
+            return 'Improper Folder Structure', 'Folder structure selected is not supported. Please refer to available documentation.'
         elif self.bfImages.path == "" and len(self.dayFolders) == 0 and not self.isZstack:
-            QtWidgets.QMessageBox.warning(self.window, 'Missing Folder', 'Brightfield (BF) folder cannot be found. Please select directory with BF folder.')
-            return
+            return 'Missing Folder', 'Brightfield (BF) folder cannot be found. Please select directory with BF folder.'
         elif self.trImages.path == "" and len(self.dayFolders) == 0 and not self.isZstack:
-            QtWidgets.QMessageBox.warning(self.window, 'Missing Folder', 'Texas Red folder cannot be found. Please select directory with Texas Red folder.')
-            return
-
-        self.window.tabWidget.setCurrentIndex(1)
-
-        # Pass off loading images to a separate thread as it can be computationally intensive 
-        self.thread = InitializeImagesThread(self)
-
-        self.thread.startPbar.connect(self.window.startPbar)
-        self.thread.incrementPbar.connect(self.window.incrementPbar)
-        self.thread.finishPbar.connect(self.window.finishPbar)
-        self.thread.finished.connect(self.finishedInitializing)
-
-        self.thread.start()
+            return 'Missing Folder', 'Texas Red folder cannot be found. Please select directory with Texas Red folder.'
+        return None
 
     def finishedInitializing(self):
         """Set current image and list after loading and display"""
@@ -287,6 +333,22 @@ class ImageViewer:
             self.currImageIdx = self.qImageNameItems.index(item)
             self.changeImage()
 
+    @property
+    def qimage_scaled(self):
+        """Zoom cache of the current image. Scaled again if it was evicted by the memory budget."""
+        if self._qimage_scaled is None:
+            self.qimage_scaled = self.qimage.scaled(self.currImageCol.qlabel.width() * self.zoomX, self.currImageCol.qlabel.height() * self.zoomX, QtCore.Qt.KeepAspectRatioByExpanding)
+        return self._qimage_scaled
+
+    @qimage_scaled.setter
+    def qimage_scaled(self, value):
+        self._qimage_scaled = value
+        budget.register(self, "qimage_scaled", "zoom", qimageBytes(value), self.evictBuffer)
+
+    def evictBuffer(self, name):
+        """Called by the memory budget to drop the zoom cache"""
+        self._qimage_scaled = None
+
     def action_move(self):
         """Called when user attempts to click and drag mouse across image (pan)"""
         if self.window.toggle_move.isChecked():
@@ -298,10 +360,16 @@ class ImageViewer:
             return
 
         # Redrawing if there is a base image allows for image shapes to be mapped to base shapes
-        if self.currImageCol.baseImage is not None and not self.isZstack:
+        # Images restored from a session have their shapes drawn the first time they're shown
+        if (self.currImageCol.baseImage is not None or self.currImage.needsRedraw) and not self.isZstack:
             self.currImage.redraw()
 
-        self.qimage = self.currImage.imgQt
+        budget.pin([self.currImage]) # The image on screen keeps its pixels, only its zoom cache can be evicted
+        if self.thresholdPreview:
+            self.qimage = self.currImage.indexedQt
+            self.qimage.setColorTable(thresholdColorTable(self.window.threshold_slider.value()))
+        else:
+            self.qimage = self.currImage.imgQt
         self.qpixmap = QPixmap(self.currImageCol.qlabel.size())
         if not self.qimage.isNull():
             self.qimage_scaled = self.qimage.scaled(self.currImageCol.qlabel.width(), self.currImageCol.qlabel.height(), QtCore.Qt.KeepAspectRatioByExpanding)
@@ -338,6 +406,14 @@ class ImageViewer:
 
     def mousePressAction(self, QMouseEvent):
         """Called when mouse is pressed"""
+        if self.regionMode and self.currImage is not None:
+            # Region selection takes over from panning
+            self.regionOrigin = QMouseEvent.pos()
+            if self.rubberBand is None or self.rubberBand.parent() is not self.currImageCol.qlabel:
+                self.rubberBand = QtWidgets.QRubberBand(QtWidgets.QRubberBand.Rectangle, self.currImageCol.qlabel)
+            self.rubberBand.setGeometry(QtCore.QRect(self.regionOrigin, QtCore.QSize()))
+            self.rubberBand.show()
+            return
         if self.panFlag:
             self.pressed = QMouseEvent.pos() # Starting point of drag vector
             self.anchor = self.position      # Save the pan position when panning starts
@@ -345,6 +421,9 @@ class ImageViewer:
     def mouseMoveAction(self, QMouseEvent):
         """Called when mouse is moved"""
         self.mousex, self.mousey = QMouseEvent.pos().x(), QMouseEvent.pos().y()
+        if self.regionOrigin is not None:
+            self.rubberBand.setGeometry(QtCore.QRect(self.regionOrigin, QMouseEvent.pos()).normalized())
+            return
         if self.pressed:
             dx, dy = self.mousex - self.pressed.x(), self.mousey - self.pressed.y() # Calculate the drag vector
             self.position = self.anchor[0] - dx, self.anchor[1] - dy # Update pan position using drag vector
@@ -353,6 +432,73 @@ class ImageViewer:
     def mouseReleaseAction(self, QMouseEvent):
         """Called when mouse is released"""
         self.pressed = None # Clear the starting point of drag vector        
+        if self.regionOrigin is not None:
+            rect = QtCore.QRect(self.regionOrigin, QMouseEvent.pos()).normalized()
+            self.regionOrigin = None
+            self.rubberBand.hide()
+            self.selectRegion(rect)
+
+    def widgetToImage(self, x, y):
+        """
+        Args:
+          x, y: Position on currImageCol.qlabel
+        Returns:
+          (x, y) Position on the current image in pixels
+        """
+        # Images are scaled keeping their aspect ratio. The image on screen may be a downsampled preview, see previewShapes
+        scale = self.qimage_scaled.width() / self.currImage.shape[1]
+        return (x + self.position[0]) / scale, (y + self.position[1]) / scale
+
+    def setRegionMode(self, enabled):
+        """
+        Called when region re-detection is toggled. In region mode a rectangle dragged on the image (or a click on a shape)
+        is detected again on its own. Threshold and radius changes then only apply to that region, not the whole image.
+        Args:
+          enabled: True to start selecting regions, False to go back to detecting whole images
+        """
+        self.regionMode = enabled
+        self.roi = None
+        if enabled:
+            self.window.statusbar.showMessage('Drag a rectangle or click a shape to detect it again.', 5000)
+        elif self.currImage is not None:
+            # Region parameters are local, show the parameters of the whole image again
+            self.window.disableDebounce()
+            self.window.threshold_box.setValue(self.currImage.threshold)
+            self.window.radius_slider.setRange(self.currImage.radiusRange[0], self.currImage.radiusRange[1])
+            self.window.enableDebounce()
+
+    def selectRegion(self, rect):
+        """
+        Selects the region to re-detect and re-detects it.
+        Args:
+          rect: QRect selected on currImageCol.qlabel. A click (tiny rectangle) selects the shape under it instead.
+        """
+        if self.currImage is None or self.isZstack or self.qimage.isNull():
+            return
+        x0, y0 = self.widgetToImage(rect.left(), rect.top())
+        x1, y1 = self.widgetToImage(rect.right(), rect.bottom())
+        if rect.width() < 5 and rect.height() < 5:
+            for shape in self.currImage.shapes:
+                (x, y) = shape[0]
+                r = max(shape[1]) / 2 if len(shape) == 4 else shape[1]
+                if self.currImage.distance((x, y), (x0, y0)) <= r:
+                    r = r * 1.25 # Margin so the shape can grow a bit
+                    x0, y0, x1, y1 = x - r, y - r, x + r, y + r
+                    break
+            else:
+                return
+        self.roi = (x0, y0, x1 - x0, y1 - y0)
+        self.redetectRegion()
+
+    def redetectRegion(self):
+        """Re-detects the selected region with the current threshold and radius range, see Image.redetectRegion"""
+        thresh = self.window.threshold_slider.value()
+        rng = self.window.radius_slider.getRange()
+        ellipse = not self.window.checkBox.isChecked()
+        # Only the region is searched, fast enough to not need a thread
+        removed, added = self.currImage.redetectRegion(self.roi, thresh, rng, ellipse)
+        self.loadImage()
+        self.window.statusbar.showMessage('Region: {} shape(s) replaced by {}.'.format(len(removed), len(added)), 5000)
 
     def zoomPlus(self, scroll=False):
         """
@@ -447,17 +593,20 @@ class ImageViewer:
 
     def changeThreshold(self):
         """Called when either the threshold slider or number box is altered"""
-        if self.currImage is not None and not self.isZstack:
+        if self.currImage is not None and not self.isZstack and self.roi is None: # Region parameters are local
             self.currImage.threshold = self.window.threshold_slider.value()
 
     def changeRadiusRange(self):
         """Called when either the radius range slider or number box is altered"""
-        if self.currImage is not None and not self.isZstack:
+        if self.currImage is not None and not self.isZstack and self.roi is None:
             self.currImage.radiusRange = self.window.radius_slider.getRange()
 
     def changeImage(self):
         """Called when changing image on screen. Handles loading image on GUI and calculating shapes."""
         self.currImage = self.currImageCol.list[self.currImageIdx]
+        self.roi = None # Regions belong to a single image
+        self.bfImages.setGroup(self.currImage.group) # Well and field on screen
+        self.trImages.setGroup(self.currImage.group)
         self.loadImage()
 
         # Disables delay in calculation while changing the image so next image shapes gets calculated immediately
@@ -470,11 +619,14 @@ class ImageViewer:
             self.window.debounce.start()
 
     def setBaseImage(self):
-        """Marks current pair of images (both TR and BF) as their respective base images."""
+        """
+        Marks current pair of images (both TR and BF) as their respective base images.
+        Every other well and field uses its own images of the same day as base images.
+        """
         if self.currImage is None and not self.isZstack:
             return
-        self.trImages.baseImage, self.bfImages.baseImage = self.trImages.map[self.currImage.id], self.bfImages.map[self.currImage.id]
-        self.trImages.baseId, self.bfImages.baseId = self.currImage.id, self.currImage.id
+        self.trImages.setBase(self.currImage.id)
+        self.bfImages.setBase(self.currImage.id)
         # Redraws allows for instant drawing of identification numbers for base shapes
         self.trImages.baseImage.redraw()
         self.bfImages.baseImage.redraw()
@@ -484,25 +636,77 @@ class ImageViewer:
         """Clears current base images in both the TR and BF image collections."""
         if self.currImage is None and not self.isZstack:
             return
-        self.trImages.baseImage = None
-        self.bfImages.baseImage = None
+        self.trImages.setBase(None)
+        self.bfImages.setBase(None)
         self.trImages.map[self.currImage.id].redraw()
         self.bfImages.map[self.currImage.id].redraw()
         self.loadImage()
 
+    def setThresholdPreview(self, enabled):
+        """
+        Called when the threshold preview is toggled. The preview shows the raw image with the pixels above the
+        threshold highlighted, updated on every threshold change (see updateThresholdPreview).
+        Args:
+          enabled: True to show the threshold preview, False to show the detected shapes
+        """
+        self.thresholdPreview = enabled
+        self.loadImage()
+
+    def setCropSensors(self, enabled):
+        """
+        Called when sensor cropping is toggled. While enabled, sensors (TR) are only searched for around the spheroids
+        of the matching BF image once it has spheroids, which skips most of a sparse frame. Sensors outside of the
+        spheroids are left out, the others are the same as searching the whole image.
+        Args:
+          enabled: True to search around spheroids only, False to search whole images
+        """
+        self.trImages.cropSensors = enabled
+
+    def updateThresholdPreview(self, threshold):
+        """
+        Called on every threshold change. Only swaps the 256 entry colour table of the shown Indexed8 images,
+        no pixels are touched, so it keeps up with the slider without a debounce.
+        Args:
+          threshold: New threshold
+        """
+        if not self.thresholdPreview or self.currImage is None or self.qimage.format() != QImage.Format_Indexed8:
+            return
+        table = thresholdColorTable(threshold)
+        self.qimage.setColorTable(table)
+        self.qimage_scaled.setColorTable(table) # Fast scaling keeps the Indexed8 format
+        self.scaleUpdate()
+
+    def previewShapes(self):
+        """
+        Shows shapes detected on a downsampled image while the threshold/radius controls move (see Image.drawPreview).
+        The full resolution detection replaces it once the controls settle.
+        """
+        if self.currImage is None or self.isZstack or self.roi is not None or self.thresholdPreview:
+            return
+        thresh = self.window.threshold_slider.value()
+        rng = self.window.radius_slider.getRange()
+        self.qimage = self.currImage.drawPreview(thresh, rng, not self.window.checkBox.isChecked())
+        self.qimage_scaled = self.qimage.scaled(self.currImageCol.qlabel.width() * self.zoomX, self.currImageCol.qlabel.height() * self.zoomX, QtCore.Qt.KeepAspectRatioByExpanding)
+        self.scaleUpdate()
+
     def drawCircle(self):
         """Detects and draws circles for current image"""
         if self.currImage is None and not self.isZstack:
             return
+        if self.roi is not None: # Parameters changed in region mode only apply to the region
+            return self.redetectRegion()
         thresh = self.window.threshold_slider.value()
         rng = self.window.radius_slider.getRange()
 
+        self.lastParams[self.currImageCol.type] = (thresh, rng, False)
+
         # Calculating and drawing circles is computationally intensive --> New thread
         self.thread = DrawCircleThread(self.currImage, thresh, rng, self.window)
 
         self.thread.startPbar.connect(self.window.startPbar)
         self.thread.incrementPbar.connect(self.window.incrementPbar)
         self.thread.finishPbar.connect(self.window.finishPbar)
+        self.thread.timed.connect(self.window.adaptDebounce)
         self.thread.finished.connect(self.loadImage)
 
         self.thread.start()
@@ -511,14 +715,19 @@ class ImageViewer:
         """Detects and draws ellipses for current image"""
         if self.currImage is None and not self.isZstack:
             return
+        if self.roi is not None: # Parameters changed in region mode only apply to the region
+            return self.redetectRegion()
         thresh = self.window.threshold_slider.value()
         rng = self.window.radius_slider.getRange()
 
+        self.lastParams[self.currImageCol.type] = (thresh, rng, True)
+
         self.thread = DrawEllipseThread(self.currImage, thresh, rng, self.window)
 
         self.thread.startPbar.connect(self.window.startPbar)
         self.thread.incrementPbar.connect(self.window.incrementPbar)
         self.thread.finishPbar.connect(self.window.finishPbar)
+        self.thread.timed.connect(self.window.adaptDebounce)
         self.thread.finished.connect(self.loadImage)
 
         self.thread.start()
@@ -538,11 +747,14 @@ class ImageViewer:
             return
 
         path = str(QtWidgets.QFileDialog.getExistingDirectory(self.window, "Select Directory")) + "/"
-        self.thread = ExportThread(self.bfImages, self.trImages, "all-excel", path)
+        formats = tuple(format_ for format_, action in self.window.tidyFormatActions.items() if action.isChecked())
+        self.liveExports["all-excel"] = {"path": path, "formats": formats}
+        self.thread = ExportThread(self.bfImages, self.trImages, "all-excel", path, formats)
 
         self.thread.startPbar.connect(self.window.startPbar)
         self.thread.incrementPbar.connect(self.window.incrementPbar)
         self.thread.finishPbar.connect(self.window.finishPbar)
+        self.thread.message.connect(lambda message: self.window.statusbar.showMessage(message, 10000))
 
         self.thread.start()
 
@@ -558,6 +770,7 @@ class ImageViewer:
         self.thread.startPbar.connect(self.window.startPbar)
         self.thread.incrementPbar.connect(self.window.incrementPbar)
         self.thread.finishPbar.connect(self.window.finishPbar)
+        self.thread.message.connect(lambda message: self.window.statusbar.showMessage(message, 10000))
 
         self.thread.start()
 
@@ -568,13 +781,15 @@ class ImageViewer:
 
         path = str(QtWidgets.QFileDialog.getExistingDirectory(self.window, "Select Directory")) + "/"
         path = path + "Marked Images/"
-        os.mkdir(path)
+        os.makedirs(path, exist_ok=True)
 
-        self.thread = ExportThread(self.bfImages, self.trImages, "all-images", path)
+        self.liveExports["all-images"] = {"path": path}
+        self.thread = ExportThread(self.bfImages, self.trImages, "all-images", path, imageOptions=self.window.options)
 
         self.thread.startPbar.connect(self.window.startPbar)
         self.thread.incrementPbar.connect(self.window.incrementPbar)
         self.thread.finishPbar.connect(self.window.finishPbar)
+        self.thread.message.connect(lambda message: self.window.statusbar.showMessage(message, 10000))
 
         self.thread.start()
 
@@ -585,22 +800,226 @@ class ImageViewer:
 
         path = str(QtWidgets.QFileDialog.getExistingDirectory(self.window, "Select Directory")) + "/"
         path = path + "Marked Images/"
-        os.mkdir(path)
+        os.makedirs(path, exist_ok=True)
 
         currImg, currImgComplement = self.trImages.map[self.currImage.id], self.bfImages.map[self.currImage.id]
-        self.thread = ExportThread(currImg, currImgComplement, "single-image", path)
+        self.thread = ExportThread(currImg, currImgComplement, "single-image", path, imageOptions=self.window.options)
 
         self.thread.startPbar.connect(self.window.startPbar)
         self.thread.incrementPbar.connect(self.window.incrementPbar)
         self.thread.finishPbar.connect(self.window.finishPbar)
+        self.thread.message.connect(lambda message: self.window.statusbar.showMessage(message, 10000))
 
         self.thread.start()
 
+    def setWatchMode(self, enabled):
+        """
+        Called when live mode is toggled. In live mode new images written to the experiment folder are loaded,
+        detected with the last used parameters and added to the last exports as they arrive.
+        Args:
+          enabled: True to start watching the experiment folder, False to stop
+        """
+        if self.watcher is None:
+            self.watcher = FolderWatcher(parent=self.window)
+            self.watcher.filesReady.connect(self.ingestNewImages)
+        if not enabled:
+            self.watcher.stop()
+            return
+        if self.numImages <= 0:
+            QtWidgets.QMessageBox.warning(self.window, 'No Images', 'Please open an experiment folder before starting live mode.')
+            self.window.menu_watch.setChecked(False)
+            return
+        self.watcher.setFolders(self.getWatchFolders())
+        self.watcher.changed() # Pick up images written since the folder was opened
+
+    def getWatchFolders(self):
+        """Returns the list of folders new images of the current folder structure can appear in"""
+        if self.isZstack:
+            return [self.basePath]
+        if len(self.dayFolders) == 0:
+            return [self.bfImages.path, self.trImages.path]
+        # New day folders appear in the base folder
+        return [self.basePath] + [day_path for _, day_path in self.dayFolders]
+
+    def getLastParams(self, col):
+        """
+        Args:
+          col: ImageCollection
+        Returns:
+          (threshold, radius range, ellipse) last used to detect shapes in the collection.
+          Falls back to the parameters of the latest image with shapes, or the latest image.
+        """
+        if col.type in self.lastParams:
+            return self.lastParams[col.type]
+        latest = sorted(col.list, key=lambda img: img.id, reverse=True)
+        for img in latest:
+            if img.shapes:
+                return img.threshold, img.radiusRange, img.ellipse
+        return latest[0].threshold, latest[0].radiusRange, col.type == "TR"
+
+    def ingestNewImages(self):
+        """Loads and detects only the images that aren't in the collections yet. Called by the watcher in live mode."""
+        if not self.window.menu_watch.isChecked():
+            return
+        if self.isIngesting:
+            self.watcher.changed() # Try again once the current images are done
+            return
+        if self.dayFolders:
+            self.findFolderStructure() # Finds new day folders
+            self.watcher.setFolders(self.getWatchFolders())
+
+        knownPaths = set(img.path for img in self.bfImages.list + self.trImages.list)
+        newFiles = [imageFile for imageFile in self.listImageFiles() if imageFile[0] not in knownPaths]
+        # Files still being written are checked again later
+        newFiles = [imageFile for imageFile in newFiles if self.watcher.isStable(imageFile[0])]
+        # Images are only added in BF/TR pairs of the same well and field, the first of a pair waits for the other
+        types = {}
+        for _, id_, name, type_ in newFiles:
+            types.setdefault(wellField(name) + (id_,), set()).add(type_)
+        for key in types:
+            types[key].update(col.type for col in (self.bfImages, self.trImages) if col.index.get(*key) is not None)
+        pairedFiles = [imageFile for imageFile in newFiles if len(types[wellField(imageFile[2]) + (imageFile[1],)]) == 2]
+        if len(pairedFiles) < len(newFiles):
+            self.watcher.changed()
+        if len(pairedFiles) == 0:
+            return
+
+        params = {col.type: self.getLastParams(col) for col in (self.bfImages, self.trImages)}
+        exports = [(type_, dict(kwargs, imageOptions=self.window.options)) for type_, kwargs in self.liveExports.items()]
+        self.isIngesting = True
+        self.startIngestStep(IngestThread(self, pairedFiles),
+                             lambda newImages, numFailed: self.addNewImages(newImages, numFailed, params, exports))
+
+    def startIngestStep(self, thread, callback):
+        """
+        Starts the next step of live mode once the previous one is done. The steps run one after the other.
+        Args:
+          thread: QThread of the step, with progress bar signals.
+          callback: Connected to the finished signal of the thread.
+        """
+        if self.ingestThread is not None:
+            self.ingestThread.wait() # Already finished, it may still be returning from run()
+        self.ingestThread = thread
+        thread.startPbar.connect(self.window.startPbar)
+        thread.incrementPbar.connect(self.window.incrementPbar)
+        thread.finishPbar.connect(self.window.finishPbar)
+        thread.finished.connect(callback)
+        thread.start()
+
+    def addNewImages(self, newImages, numFailed, params, exports):
+        """
+        Adds the images loaded in live mode to the collections, then detects their shapes.
+        Called on the GUI thread, so the collections never change while they are being read.
+        Args:
+          newImages: List of the new Image objects.
+          numFailed: Number of files that couldn't be read yet, they are tried again later.
+          params: Detection parameters of each collection, {type : (threshold, radius range, ellipse)}
+          exports: List of (export type, ExportThread keyword arguments) to repeat
+        """
+        if numFailed:
+            self.watcher.changed()
+        if len(newImages) == 0:
+            self.isIngesting = False
+            return
+        cols = {"BF": self.bfImages, "TR": self.trImages}
+        for img in newImages:
+            cols[img.type].add(img)
+        self.startIngestStep(DetectNewThread(self, newImages, params), lambda: self.finishedIngesting(newImages, exports))
+
+    def finishedIngesting(self, newImages, exports):
+        """
+        Updates the image list after new images were added and detected in live mode, then repeats the last exports.
+        Args:
+          newImages: List of the new Image objects.
+          exports: List of (export type, ExportThread keyword arguments) to repeat
+        """
+        newIds = sorted(set(img.id for img in newImages))
+        self.numImages = len(self.currImageCol.list)
+        self.changeImageList(self.currImageCol.list)
+        if self.numImages > 1:
+            self.window.next_im.setEnabled(True)
+        self.window.statusbar.showMessage("Live mode: added {}".format(", ".join(newIds)), 10000)
+        self.exportNewImages(exports)
+
+    def exportNewImages(self, exports):
+        """
+        Repeats the last exports one after the other in live mode. Exports only write what's new,
+        see ExportThread.exportAllExcel and exportAllImages
+        Args:
+          exports: List of (export type, ExportThread keyword arguments) still to run
+        """
+        if len(exports) == 0:
+            self.isIngesting = False
+            return
+        type_, kwargs = exports[0]
+        thread = ExportThread(self.bfImages, self.trImages, type_, **kwargs)
+        thread.message.connect(lambda message: self.window.statusbar.showMessage(message, 10000))
+        self.startIngestStep(thread, lambda: self.exportNewImages(exports[1:]))
+
+    def sweepParameters(self):
+        """
+        Asks for a grid of thresholds and radius ranges and a set of images, then detects shapes with every combination
+        in worker processes and shows the results as a heatmap (see Sweep.runSweep). Images are matched against the
+        base image, or the first chosen image if there is none.
+        """
+        if self.currImage is None or self.isZstack:
+            return
+        from SweepDialog import SweepDialog # Imports matplotlib, see Plots
+        col = self.currImageCol
+        dialog = SweepDialog(col.list, self.currImage, self.window.threshold_slider.value(), self.window.radius_slider.getRange(), self.window)
+        if dialog.exec_() != QtWidgets.QDialog.Accepted:
+            return
+        try:
+            thresholds, minRadii, maxRadii, images = dialog.values()
+        except ValueError:
+            QtWidgets.QMessageBox.warning(self.window, 'Invalid Radii', 'Radii must be comma separated whole numbers.')
+            return
+        combos = sweepGrid(thresholds, minRadii, maxRadii)
+        if not images or not combos:
+            QtWidgets.QMessageBox.warning(self.window, 'Nothing to Sweep', 'Please choose at least one image and one radius range.')
+            return
+
+        baseImage = col.baseImage if col.baseImage is not None else images[0]
+        title = "{} Sweep ({} images, matched against {})".format(col.type, len(images), baseImage.name)
+        self.sweepThread = SweepThread(col, images, combos, not self.window.checkBox.isChecked(), baseImage, title)
+        self.sweepThread.startPbar.connect(self.window.startPbar)
+        self.sweepThread.incrementPbar.connect(self.window.incrementPbar)
+        self.sweepThread.finishPbar.connect(self.window.finishPbar)
+        self.sweepThread.finished.connect(self.showSweep)
+        self.sweepThread.start()
+
+    def showSweep(self, rows, title):
+        """Opens a heatmap window for the results of a parameter sweep"""
+        from SweepDialog import SweepWindow
+        window = SweepWindow(rows, title)
+        window.paramsChosen.connect(self.applySweepParams)
+        window.show()
+        self.sweepWindows.append(window)
+
+    def applySweepParams(self, threshold, minRadius, maxRadius):
+        """Sets the threshold and radius range chosen on a sweep heatmap, which recalculates the current image"""
+        self.window.threshold_box.setValue(threshold)
+        self.window.radius_slider.setRange(minRadius, maxRadius)
+
     def drawSharpnessGraphs(self):
         """Plots using popup MatPlotLib windows graphs of the sharpness of the images. This is used for Z-Stack images."""
-        self.thread1, self.thread2 = GetSharpnessThread(self.bfImages.list, "Spheroid Sharpness"), GetSharpnessThread(self.trImages.list, "Sensor Sharpness")
+        from Plots import PlotWindow # matplotlib is only imported once a Z-Stack is opened
+        self.sharpnessCurves = {}
+        self.thread1, self.thread2 = GetSharpnessThread(self.bfImages.list, SHARPNESS_TITLES["BF"]), GetSharpnessThread(self.trImages.list, SHARPNESS_TITLES["TR"])
 
         for thread in (self.thread1, self.thread2):
+            if len(thread.list) == 0:
+                continue
+            # Graphs are shown immediately and filled in as slices are measured
+            plot = PlotWindow(self, width=5, height=4, dpi=100)
+            plot.axes.set_title(thread.title)
+            plot.axes.set_xlabel("Z")
+            plot.axes.set_ylabel("Relative Sharpness")
+            plot.setWindowTitle(thread.title)
+            plot.show()
+            self.sharpnessGraphs.append(plot)
+
+            thread.sharpnessReady.connect(plot.addPoint)
             thread.startPbar.connect(self.window.startPbar)
             thread.incrementPbar.connect(self.window.incrementPbar)
             thread.finishPbar.connect(self.window.finishPbar)
@@ -609,26 +1028,189 @@ class ImageViewer:
 
     def showSharpnessGraphs(self, imageSharpness, title):
         """
-        Shows MatPlotLib graphs in popup windows.
+        Redraws the MatPlotLib graph of a stack once all of its slices are measured.
         Args:
-          imageSharpness: Array of tuples containing the id_ of the image and its sharpness value
+          imageSharpness: Array of tuples containing the id_ of the image and its focus measures (see Sharpness.focusMeasures)
           title: Title of the plot. Either Sensor Sharpness or Spheroid Sharpness.
         """
-        x, y  = [], []
-        for id_, sharpness in imageSharpness:
-            x.append(float(id_))
-            y.append(1 / sharpness)
+        self.sharpnessCurves[title] = imageSharpness
+        for plot in self.sharpnessGraphs:
+            if plot.windowTitle() == title:
+                plot.setCurve(imageSharpness)
+
+    def goToBestFocus(self):
+        """Navigates to the sharpest slice of the current Z-Stack image collection."""
+        curve = self.sharpnessCurves.get(SHARPNESS_TITLES[self.currImageCol.type])
+        if not self.isZstack or not curve:
+            self.window.statusbar.showMessage('Sharpness graphs of a Z-Stack must be calculated first.', 5000)
+            return
+        bestId = bestFocusSlices(curve)[0]
+        ids = [img.id for img in self.currImageCol.list]
+        self.currImageIdx = ids.index(bestId)
+        self.changeImage()
+        self.qImageNameItems[self.currImageIdx].setSelected(True)
 
-        if len(x) == 0 or len(y) == 0:
+    def analyzeFocusStack(self):
+        """
+        Replaces the Z-Stack with a single all-in-focus image per channel, composited from the sharpest slices.
+        Detection and export then run on that single pair of images instead of every slice.
+        """
+        if not self.isZstack or len(self.sharpnessCurves) < 2:
+            self.window.statusbar.showMessage('Sharpness graphs of a Z-Stack must be calculated first.', 5000)
+            return
+        k, ok = QtWidgets.QInputDialog.getInt(self.window, "Focus Stack", "Number of sharpest slices to composite (1 = best slice only):",
+                                              5, 1, max(len(self.bfImages.list), len(self.trImages.list)))
+        if not ok:
             return
 
-        plot = PlotWindow(self, width=5, height=4, dpi=100)
-        plot.axes.plot(x, y)
-        plot.axes.set_xticks(arange(min(x), max(x)+1, 5.0))
-        plot.axes.set_title(title)
-        plot.setWindowTitle(title)
-        plot.show()
-        self.sharpnessGraphs.append(plot)
+        self.thread = FocusStackThread(self, k, self.getFocusStackDir())
+
+        self.thread.startPbar.connect(self.window.startPbar)
+        self.thread.incrementPbar.connect(self.window.incrementPbar)
+        self.thread.finishPbar.connect(self.window.finishPbar)
+        self.thread.finished.connect(self.finishedFocusStack)
+
+        self.thread.start()
+
+    def getFocusStackDir(self):
+        """Returns the temporary folder the focus stack composites are written to, created on first use"""
+        if self.focusStackDir is None:
+            self.focusStackDir = tempfile.TemporaryDirectory(prefix="cmed_focus_")
+        return self.focusStackDir.name
+
+    def removeFocusStacks(self):
+        """Deletes the focus stack composites. Called when other images are opened and when the window closes."""
+        if self.focusStackDir is not None:
+            self.focusStackDir.cleanup()
+            self.focusStackDir = None
+
+    def finishedFocusStack(self, images, message):
+        """
+        Loads the focus stacked images as a single pair of images.
+        Args:
+          images: (BF Image, TR Image) tuple of the focus stacked images
+          message: Summary of the slices used, shown in the status bar
+        """
+        self.isZstack = False
+        self.bfImages.reset()
+        self.trImages.reset()
+        self.bfImages.list, self.trImages.list = [images[0]], [images[1]]
+        self.bfImages.initMap()
+        self.trImages.initMap()
+
+        self.finishedInitializing()
+        self.window.statusbar.showMessage(message)
+
+class FocusStackThread(QtCore.QThread):
+    """Thread object for compositing the sharpest slices of a Z-Stack into a single image per channel"""
+    finished = QtCore.pyqtSignal(object, str)
+    startPbar = QtCore.pyqtSignal(int)
+    incrementPbar = QtCore.pyqtSignal()
+    finishPbar = QtCore.pyqtSignal()
+
+    def __init__(self, viewer, k, folder, parent=None):
+        super(FocusStackThread, self).__init__(parent)
+        self.viewer = viewer
+        self.k = k # Number of sharpest slices to composite
+        self.folder = folder # Folder the composites are written to
+
+    def run(self):
+        images, summary = [], []
+        self.startPbar.emit(2 * self.k)
+        for col in (self.viewer.bfImages, self.viewer.trImages):
+            ids = bestFocusSlices(self.viewer.sharpnessCurves[SHARPNESS_TITLES[col.type]], self.k)
+            slices = [col.map[id_] for id_ in ids]
+            if len(slices) == 1:
+                name, path = slices[0].name, slices[0].path
+                summary.append("{} z{}".format(col.type, ids[0]))
+            else:
+                name, path, tileIds = writeFocusStack(slices, self.folder, pBar=self)
+                summary.append("{} z{} ({} of {} slices used by tiles)".format(col.type, ids[0], len(set(tileIds.flat)), len(ids)))
+            # Both images share an id so they're paired like a single day of a timelapse
+            images.append(Image("p00", name, col.type, path, self.viewer))
+        self.finishPbar.emit()
+        self.finished.emit(tuple(images), "Best focus: " + ", ".join(summary))
+
+class IngestThread(QtCore.QThread):
+    """Thread object for loading new images in live mode. The images are added to the collections by the viewer."""
+    finished = QtCore.pyqtSignal(object, int)
+    startPbar = QtCore.pyqtSignal(int)
+    incrementPbar = QtCore.pyqtSignal()
+    finishPbar = QtCore.pyqtSignal()
+
+    def __init__(self, viewer, newFiles, parent=None):
+        super(IngestThread, self).__init__(parent)
+        self.viewer = viewer
+        self.newFiles = newFiles # List of (path, id_, name, type_) given by ImageViewer.listImageFiles()
+
+    def run(self):
+        newImages, numFailed = [], 0
+        self.startPbar.emit(len(self.newFiles))
+        for im_path, id_, name, type_ in self.newFiles:
+            self.incrementPbar.emit()
+            try:
+                newImages.append(Image(id_, name, type_, im_path, self.viewer))
+            except (cv2.error, TypeError, ValueError):
+                # Unreadable, most likely not fully written yet
+                numFailed = numFailed + 1
+        self.finishPbar.emit()
+        self.finished.emit(newImages, numFailed)
+
+class DetectNewThread(QtCore.QThread):
+    """Thread object for detecting the shapes of the new images of live mode and matching them to the base shapes"""
+    finished = QtCore.pyqtSignal()
+    startPbar = QtCore.pyqtSignal(int)
+    incrementPbar = QtCore.pyqtSignal()
+    finishPbar = QtCore.pyqtSignal()
+
+    def __init__(self, viewer, images, params, parent=None):
+        super(DetectNewThread, self).__init__(parent)
+        self.viewer = viewer
+        self.images = images # New Image objects, already in the collections
+        self.params = params # Detection parameters of each collection, {type : (threshold, radius range, ellipse)}
+
+    def run(self):
+        cols = {"BF": self.viewer.bfImages, "TR": self.viewer.trImages}
+        try:
+            # Sensors are detected first so spheroids without sensors are left out, like when detecting by hand
+            for type_ in ("TR", "BF"):
+                threshold, radiusRange, ellipse = self.params[type_]
+                images = [img for img in self.images if img.type == type_]
+                if not images:
+                    continue
+                cols[type_].detectAll(images, threshold, radiusRange, ellipse, self)
+                for img in images:
+                    img.matchBaseShapes()
+        finally:
+            # Live mode goes on with the next images even if these failed
+            self.finishPbar.emit()
+            self.finished.emit()
+
+class SweepThread(QtCore.QThread):
+    """Thread object for running a parameter sweep, see Sweep.runSweep"""
+    finished = QtCore.pyqtSignal(object, str)
+    startPbar = QtCore.pyqtSignal(int)
+    incrementPbar = QtCore.pyqtSignal()
+    finishPbar = QtCore.pyqtSignal()
+
+    def __init__(self, col, images, combos, ellipse, baseImage, title, parent=None):
+        super(SweepThread, self).__init__(parent)
+        self.col = col
+        self.images = images
+        self.combos = combos
+        self.ellipse = ellipse
+        self.baseImage = baseImage
+        self.title = title
+
+    def run(self):
+        images = set(self.images + [self.baseImage]) - {None}
+        self.startPbar.emit(len(images) * len(set(threshold for threshold, _ in self.combos)))
+        try:
+            rows = runSweep(self.col, self.images, self.combos, self.ellipse, self.baseImage,
+                            lambda image: self.incrementPbar.emit())
+        finally:
+            self.finishPbar.emit() # The progress bar is reset even if the sweep failed
+        self.finished.emit(rows, self.title)
 
 class InitializeImagesThread(QtCore.QThread):
     """Thread object for loading images in"""
@@ -650,6 +1232,7 @@ class InitializeImagesThread(QtCore.QThread):
 class DrawCircleThread(QtCore.QThread):
     """Thread object for calculating and drawing circles on image"""
     finished = QtCore.pyqtSignal()
+    timed = QtCore.pyqtSignal(float) # Seconds the detection took
     startPbar = QtCore.pyqtSignal(int)
     incrementPbar = QtCore.pyqtSignal()
     finishPbar = QtCore.pyqtSignal()
@@ -661,13 +1244,16 @@ class DrawCircleThread(QtCore.QThread):
         self.range = rng
 
     def run(self):
+        start = time.perf_counter()
         self.img.drawCircle(self.thresh, self.range, self)
+        self.timed.emit(time.perf_counter() - start)
         self.finishPbar.emit()
         self.finished.emit()
 
 class DrawEllipseThread(QtCore.QThread):
     """Thread object for calculating and drawing ellipses on image"""
     finished = QtCore.pyqtSignal()
+    timed = QtCore.pyqtSignal(float) # Seconds the detection took
     startPbar = QtCore.pyqtSignal(int)
     incrementPbar = QtCore.pyqtSignal()
     finishPbar = QtCore.pyqtSignal()
@@ -679,35 +1265,31 @@ class DrawEllipseThread(QtCore.QThread):
         self.range = rng
 
     def run(self):
+        start = time.perf_counter()
         self.img.drawEllipse(self.thresh, self.range, self)
+        self.timed.emit(time.perf_counter() - start)
         self.finishPbar.emit()
         self.finished.emit()
 
 class GetSharpnessThread(QtCore.QThread):
     """Thread object for calculating and plotting sharpness graphs for Z-Stack images"""
     finished = QtCore.pyqtSignal(object, str)
+    sharpnessReady = QtCore.pyqtSignal(float, object) # Emitted for every slice as it is measured --> (z, measures)
     startPbar = QtCore.pyqtSignal(int)
     incrementPbar = QtCore.pyqtSignal()
     finishPbar = QtCore.pyqtSignal()
 
-    def __init__(self, image_list, title, parent=None):
+    def __init__(self, image_list, title, downsample=2, parent=None):
         super(GetSharpnessThread, self).__init__(parent)
         self.list = image_list
         self.title = title
+        self.engine = SharpnessEngine(downsample)
 
     def run(self):
-        imageSharpness = []
         self.startPbar.emit(len(self.list))
-        for num, image in enumerate(self.list):
+        def sliceDone(image, measures):
             self.incrementPbar.emit()
-            sharpness = image.getSharpness()
-            imageSharpness.append((image.id, sharpness))
+            self.sharpnessReady.emit(float(image.id), measures)
+        imageSharpness = self.engine.curve(self.list, sliceDone)
         self.finishPbar.emit()
         self.finished.emit(imageSharpness, self.title)
-
-class PlotWindow(FigureCanvasQTAgg):
-    """Object for separate plot windows for sharpness graphs"""
-    def __init__(self, parent=None, width=5, height=4, dpi=100):
-        fig = Figure(figsize=(width, height), dpi=dpi)
-        self.axes = fig.add_subplot(111)
-        super(PlotWindow, self).__init__(fig)
\ No newline at end of file
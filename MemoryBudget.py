@@ -0,0 +1,124 @@
+from collections import OrderedDict
+import threading
+import weakref
+
+EVICTION_ORDER = ("zoom", "overlay", "pixels") # Kinds of buffers, evicted in this order when over budget
+DEFAULT_LIMIT_MB = 4096
+
+
+class MemoryBudget:
+    """
+    Process wide budget for pixel buffers. Every buffer is registered with its owner, a name, a kind from
+    EVICTION_ORDER and a callback that drops it. When the registered buffers go over the limit, buffers are
+    evicted by kind in EVICTION_ORDER and least recently used first within a kind. Buffers of pinned owners
+    (Ex. the image on screen) are only evicted if they are zoom caches. Owners rebuild evicted buffers when next used.
+    Buffers of owners that are garbage collected without releasing them are unregistered automatically.
+    """
+    def __init__(self, limitMb=DEFAULT_LIMIT_MB):
+        self.limit = int(limitMb * 2**20) # Limit in bytes
+        self.entries = OrderedDict() # {(owner id, name) : (kind, bytes, weak evict callback)}, least recently used first
+        self.used = 0 # Bytes of all registered buffers
+        self.pinned = set() # Ids of owners whose overlays and pixels aren't evicted
+        self.finalizers = {} # {owner id : weakref.finalize}, unregisters the buffers of an owner when it's garbage collected
+        self.lock = threading.RLock() # Buffers are registered from loading, drawing and export threads
+
+    def setLimit(self, limitMb):
+        """Changes the limit, evicting buffers right away if needed"""
+        self.limit = int(limitMb * 2**20)
+        self.enforce()
+
+    def register(self, owner, name, kind, nbytes, evict):
+        """
+        Registers a new buffer, replacing the previous buffer of the same owner and name.
+        Args:
+          owner: Object holding the buffer. Ex. Image
+          name: Name of the buffer, unique per owner. Ex. "imgQt"
+          kind: One of EVICTION_ORDER
+          nbytes: Size of the buffer in bytes
+          evict: Bound method of owner, called as evict(name) to drop the buffer. Must not call back into the budget.
+        """
+        key = (id(owner), name)
+        with self.lock:
+            self.release(owner, name)
+            if key[0] not in self.finalizers:
+                self.finalizers[key[0]] = weakref.finalize(owner, self.forget, key[0])
+            self.entries[key] = (kind, nbytes, weakref.WeakMethod(evict))
+            self.used = self.used + nbytes
+            self.enforce(keep=key) # Evicting the buffer that is about to be used would only waste the work of making it
+
+    def release(self, owner, name):
+        """Unregisters a buffer without evicting it. Ex. when the owner drops or replaces it itself"""
+        with self.lock:
+            entry = self.entries.pop((id(owner), name), None)
+            if entry is not None:
+                self.used = self.used - entry[1]
+
+    def releaseOwner(self, owner):
+        """Unregisters every buffer of an owner. Ex. when an image collection is reset"""
+        finalizer = self.finalizers.get(id(owner))
+        if finalizer is not None:
+            finalizer.detach()
+        self.forget(id(owner))
+
+    def forget(self, ownerId):
+        """Unregisters every buffer of an owner by its id. Called directly when the owner is garbage collected"""
+        with self.lock:
+            for key in [key for key in self.entries if key[0] == ownerId]:
+                self.used = self.used - self.entries.pop(key)[1]
+            self.pinned.discard(ownerId)
+            self.finalizers.pop(ownerId, None)
+
+    def touch(self, owner, name):
+        """Marks a buffer as just used, so it's evicted last within its kind"""
+        with self.lock:
+            key = (id(owner), name)
+            if key in self.entries:
+                self.entries.move_to_end(key)
+
+    def pin(self, owners):
+        """Replaces the set of pinned owners. Ex. with the images currently on screen"""
+        with self.lock:
+            self.pinned = set(id(owner) for owner in owners)
+
+    def enforce(self, keep=None):
+        """
+        Evicts buffers until the registered buffers fit within the limit, or nothing else can be evicted.
+        Args:
+          keep: (Optional) (owner id, name) of a buffer that must not be evicted.
+        """
+        with self.lock:
+            for kind in EVICTION_ORDER:
+                for key, (entryKind, nbytes, evict) in list(self.entries.items()):
+                    if self.used <= self.limit:
+                        return
+                    if entryKind != kind or key == keep or (kind != "zoom" and key[0] in self.pinned):
+                        continue
+                    if self.entries.pop(key, None) is None: # Owner was garbage collected while evicting
+                        continue
+                    self.used = self.used - nbytes
+                    callback = evict()
+                    if callback is not None: # Owner may have been garbage collected already
+                        callback(key[1])
+
+    def usage(self):
+        """
+        Returns:
+          (bytes used, limit in bytes, {kind : bytes used}) of all registered buffers.
+        """
+        with self.lock:
+            byKind = dict.fromkeys(EVICTION_ORDER, 0)
+            for kind, nbytes, _ in self.entries.values():
+                byKind[kind] = byKind[kind] + nbytes
+            return self.used, self.limit, byKind
+
+    def describe(self):
+        """Returns a short description of the usage, used in the status bar. Ex. 'Memory: 812 / 4096 MB'"""
+        used, limit, _ = self.usage()
+        return "Memory: {:.0f} / {:.0f} MB".format(used / 2**20, limit / 2**20)
+
+budget = MemoryBudget() # Shared by everything in the process
+
+
+def qimageBytes(qimage):
+    """Returns the size of a QImage buffer in bytes"""
+    return qimage.sizeInBytes() if hasattr(qimage, "sizeInBytes") else qimage.byteCount()
@@ -0,0 +1,58 @@
+from PyQt5 import QtWidgets
+
+from Detection import BACKENDS
+
+# Options shown in the dialog in order: (key, label, choices or (minimum, maximum))
+OPTION_FIELDS = [
+    ("format", "Image Export Format", ("png", "jpeg", "webp")),
+    ("pngCompression", "PNG Compression", (0, 9)),
+    ("jpegQuality", "JPEG Quality", (0, 100)),
+    ("webpQuality", "WebP Quality", (1, 101)),
+    ("scale", "Image Export Scale", (0.05, 1.0)),
+    ("workers", "Worker Threads", (1, 256)),
+    ("memoryBudget", "Memory Budget (MB)", (256, 1048576)),
+    ("bfBackend", "Spheroid Detection (BF)", tuple(BACKENDS)),
+    ("trBackend", "Sensor Detection (TR)", tuple(BACKENDS)),
+]
+
+class OptionsDialog(QtWidgets.QDialog):
+    """Dialog for editing the application options. Widgets are built from OPTION_FIELDS."""
+    def __init__(self, options, parent=None):
+        super(OptionsDialog, self).__init__(parent)
+        self.setWindowTitle("Options")
+        self.fields = {} # Map of {option key : input widget}
+
+        layout = QtWidgets.QFormLayout(self)
+        for key, label, limits in OPTION_FIELDS:
+            if key not in options:
+                continue
+            if isinstance(limits[0], str):
+                widget = QtWidgets.QComboBox()
+                widget.addItems(limits)
+                widget.setCurrentText(options[key])
+            elif isinstance(limits[0], float):
+                widget = QtWidgets.QDoubleSpinBox()
+                widget.setSingleStep(0.05)
+                widget.setRange(*limits)
+                widget.setValue(options[key])
+            else:
+                widget = QtWidgets.QSpinBox()
+                widget.setRange(*limits)
+                widget.setValue(options[key])
+            layout.addRow(label, widget)
+            self.fields[key] = widget
+
+        buttons = QtWidgets.QDialogButtonBox(QtWidgets.QDialogButtonBox.Ok | QtWidgets.QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addRow(buttons)
+
+    def values(self):
+        """Returns a dictionary of {option key : value} of every option in the dialog"""
+        values = {}
+        for key, widget in self.fields.items():
+            if isinstance(widget, QtWidgets.QComboBox):
+                values[key] = widget.currentText()
+            else:
+                values[key] = widget.value()
+        return values
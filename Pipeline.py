@@ -0,0 +1,333 @@
+import os
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen") # Qt objects are created but never shown --> no display needed
+
+import argparse
+import csv
+import json
+import multiprocessing
+import multiprocessing.connection
+import time
+import traceback
+
+from ImageCollection import ImageCollection
+from ImageViewer import ImageViewer
+from Export import ExportThread
+
+STAGES = ("getImages", "detect", "match", "exportExcel", "exportImages") # Pipeline stages timed for every job
+DEFAULT_PARAMS = {"BF": (120, (40, 500), False), "TR": (120, (10, 100), True)} # (threshold, radius range, ellipse), defaults of Image
+
+
+class NullSignal:
+    """Stand-in for a pyqtSignal that ignores every emit."""
+    def emit(self, *args):
+        pass
+
+class NullProgress:
+    """Stand-in for the thread objects that Image and ImageViewer methods emit progress bar signals to."""
+    def __init__(self):
+        self.startPbar = NullSignal()
+        self.incrementPbar = NullSignal()
+        self.finishPbar = NullSignal()
+
+class HeadlessViewer:
+    """
+    Minimal ImageViewer replacement holding everything that Image and ExportThread need from the viewer.
+    Folder structure detection and image loading reuse the ImageViewer code unchanged.
+    """
+    findFolderStructure = ImageViewer.findFolderStructure
+    getImages = ImageViewer.getImages
+    listImageFiles = ImageViewer.listImageFiles
+    classifyFile = ImageViewer.classifyFile
+
+    def __init__(self, basePath):
+        self.bfImages = ImageCollection("BF", None)
+        self.trImages = ImageCollection("TR", None)
+        self.basePath = basePath
+        self.dayFolders = []
+        self.isZstack = False
+        self.folderIndex = None
+
+        error = self.findFolderStructure()
+        if error is not None:
+            raise ValueError("{}: {}".format(*error))
+
+    def setBaseImage(self, id_):
+        """Marks the pair of images with the given id as the base images."""
+        self.trImages.setBase(id_)
+        self.bfImages.setBase(id_)
+
+
+def makeJob(path, outPath=None, bfParams=None, trParams=None, baseId=None, formats=(), exportImages=False):
+    """
+    Creates the description of a single experiment to analyse. Jobs are plain dictionaries so they can be sent
+    to worker processes and read from/written to JSON.
+    Args:
+      path: Experiment folder in any of the supported folder structures.
+      outPath: (Optional) Export folder. Defaults to a "<experiment> - Analysis" folder beside the experiment.
+      bfParams: (Optional) (threshold, (min radius, max radius), ellipse) for spheroid detection.
+      trParams: (Optional) (threshold, (min radius, max radius), ellipse) for sensor detection.
+      baseId: (Optional) ID of the base day. Defaults to the first day.
+      formats: (Optional) Columnar formats to write the tidy shape data in. Ex. ("csv", "parquet")
+      exportImages: (Default value = False) Also export all marked images.
+    Returns:
+      Job dictionary.
+    """
+    path = os.path.join(os.path.abspath(path), "").replace("\\", "/")
+    if outPath is None:
+        outPath = path.rstrip("/") + " - Analysis/"
+    return {"path": path, "out": os.path.join(os.path.abspath(outPath), "").replace("\\", "/"),
+            "bf": list(bfParams or DEFAULT_PARAMS["BF"]), "tr": list(trParams or DEFAULT_PARAMS["TR"]),
+            "baseId": baseId, "formats": list(formats), "images": bool(exportImages)}
+
+def detect(img, params):
+    """Detects shapes in an image with (threshold, radius range, ellipse) parameters"""
+    threshold, radiusRange, ellipse = params
+    if ellipse:
+        img.drawEllipse(threshold, tuple(radiusRange), NullProgress())
+    else:
+        img.drawCircle(threshold, tuple(radiusRange), NullProgress())
+
+def runJob(job, progress=None):
+    """
+    Runs the whole analysis of one experiment: loading, detection, base shape matching and export.
+    Never raises, failures are reported in the result so one bad folder can't stop a batch.
+    Args:
+      job: Job dictionary given by makeJob()
+      progress: (Optional) Called as progress(stage) when each stage starts.
+    Returns:
+      Result dictionary with the status ("done" or "failed"), the time of every stage in seconds, the number of
+      images, the exported files, the formats that were skipped and, on failure, the error and its traceback.
+    """
+    result = {"path": job["path"], "out": job["out"], "status": "done", "stages": {}, "images": 0, "files": [],
+              "skippedFormats": {}, "error": None, "traceback": None}
+    start = time.perf_counter()
+    stage, stageStart = None, start
+    def startStage(name):
+        """Ends the timing of the current stage and starts the next, None to only end the current one"""
+        nonlocal stage, stageStart
+        if stage is not None:
+            result["stages"][stage] = time.perf_counter() - stageStart
+        stage, stageStart = name, time.perf_counter()
+        if progress is not None and name is not None:
+            progress(name)
+    viewer = None
+    try:
+        startStage("getImages")
+        viewer = HeadlessViewer(job["path"])
+        viewer.getImages(NullProgress())
+        result["images"] = len(viewer.bfImages.list) + len(viewer.trImages.list)
+        if len(viewer.bfImages.list) == 0 or len(viewer.trImages.list) == 0:
+            raise ValueError("No images found in {}".format(job["path"]))
+
+        # Sensors are detected first, spheroids without sensors in them are dropped when detecting spheroids
+        startStage("detect")
+        for img in viewer.trImages.list:
+            detect(img, job["tr"])
+        for img in viewer.bfImages.list:
+            detect(img, job["bf"])
+
+        startStage("match")
+        baseId = job["baseId"] or sorted(viewer.bfImages.map.keys())[0]
+        if baseId not in viewer.bfImages.map or baseId not in viewer.trImages.map:
+            raise ValueError("Base day '{}' has no BF/TR image pair".format(baseId))
+        viewer.setBaseImage(baseId)
+        for img in viewer.bfImages.list + viewer.trImages.list:
+            img.matchBaseShapes()
+
+        # Every worker process exports on a single thread, the processes already use all cores
+        startStage("exportExcel")
+        os.makedirs(job["out"], exist_ok=True)
+        exporter = ExportThread(viewer.bfImages, viewer.trImages, "all-excel", job["out"], job["formats"])
+        exporter.exportAllExcel()
+        result["skippedFormats"] = exporter.skippedFormats # Formats whose library is missing, {format : error}
+        if job["images"]:
+            startStage("exportImages")
+            imagePath = job["out"] + "Marked Images/"
+            os.makedirs(imagePath, exist_ok=True)
+            ExportThread(viewer.bfImages, viewer.trImages, "all-images", imagePath, imageOptions={"workers": 1}).exportAllImages()
+        startStage(None)
+        result["files"] = sorted(file for file in os.listdir(job["out"]) if not file.startswith("."))
+    except Exception as error: # Includes MemoryError when the worker's memory limit is reached
+        startStage(None)
+        result["status"] = "failed"
+        result["error"] = "{}: {}".format(type(error).__name__, error)
+        result["traceback"] = traceback.format_exc()
+    finally:
+        if viewer is not None: # Workers of the server run many jobs, the budget must not keep the images of old ones
+            viewer.bfImages.reset()
+            viewer.trImages.reset()
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+def limitMemory(memoryLimit):
+    """
+    Limits the address space of the current process, so a runaway folder fails with MemoryError instead of
+    taking the whole machine down. Only supported on POSIX systems, ignored elsewhere.
+    Args:
+      memoryLimit: Limit in MB, None for no limit.
+    """
+    if not memoryLimit:
+        return
+    try:
+        import resource
+    except ImportError:
+        return
+    limit = int(memoryLimit * 2**20)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, resource.getrlimit(resource.RLIMIT_AS)[1]))
+
+def workerMain(job, memoryLimit, conn):
+    """Entry point of a worker process. Runs a single job, sending ("progress", stage) and ("result", result) messages through conn."""
+    import cv2
+    cv2.setNumThreads(1) # One core per worker process
+    limitMemory(memoryLimit)
+    result = runJob(job, lambda stage: conn.send(("progress", stage)))
+    conn.send(("result", result))
+    conn.close()
+
+class WorkerPool:
+    """
+    Runs jobs in worker processes, at most a fixed number at a time. Every job gets a fresh process (like maxtasksperchild=1),
+    so memory is returned to the system after every folder and a crashing worker only fails its own job.
+    Not thread safe, submit() and poll() must be called from the same thread.
+    """
+    def __init__(self, workers=None, memoryLimit=None):
+        self.workers = workers or os.cpu_count() or 1 # Number of jobs run at the same time
+        self.memoryLimit = memoryLimit # Memory limit of every worker process in MB
+        self.context = multiprocessing.get_context("spawn") # Forking a process that imported Qt isn't safe
+        self.pending = [] # List of (key, job) waiting for a worker
+        self.running = {} # {message connection : (key, job, process, start time)}
+
+    def submit(self, key, job):
+        """
+        Queues a job.
+        Args:
+          key: Any hashable value identifying the job in the events given by poll()
+          job: Job dictionary given by makeJob()
+        """
+        self.pending.append((key, job))
+        self.startWorkers()
+
+    def startWorkers(self):
+        """Starts queued jobs while there are free workers"""
+        while self.pending and len(self.running) < self.workers:
+            key, job = self.pending.pop(0)
+            recvConn, sendConn = self.context.Pipe(duplex=False)
+            process = self.context.Process(target=workerMain, args=(job, self.memoryLimit, sendConn), daemon=True)
+            process.start()
+            sendConn.close() # Only the worker holds the sending end, so its exit closes the pipe
+            self.running[recvConn] = (key, job, process, time.perf_counter())
+
+    def isIdle(self):
+        """Returns True if no jobs are queued or running"""
+        return not self.pending and not self.running
+
+    def poll(self, timeout=None):
+        """
+        Waits for messages from the workers.
+        Args:
+          timeout: (Optional) Maximum time to wait in seconds, None to wait until there is a message.
+        Returns:
+          List of (key, "progress", stage) and (key, "result", result) events. Every job gets exactly one result event.
+        """
+        events = []
+        for conn in multiprocessing.connection.wait(list(self.running), timeout):
+            key, job, process, start = self.running[conn]
+            try:
+                kind, value = conn.recv()
+            except EOFError:
+                # Worker died without sending a result (Ex. killed for running out of memory)
+                process.join()
+                kind, value = "result", {"path": job["path"], "out": job["out"], "status": "failed", "stages": {}, "images": 0,
+                                         "files": [], "error": "Worker exited with code {}".format(process.exitcode),
+                                         "traceback": None, "seconds": time.perf_counter() - start}
+            if kind == "result":
+                del self.running[conn]
+                conn.close()
+                process.join()
+            events.append((key, kind, value))
+        self.startWorkers()
+        return events
+
+def runBatch(jobs, workers=None, memoryLimit=None, callback=None):
+    """
+    Runs many jobs across a pool of worker processes, see WorkerPool.
+    Args:
+      jobs: List of job dictionaries given by makeJob()
+      workers: (Optional) Number of jobs run at the same time. Defaults to the number of cores.
+      memoryLimit: (Optional) Memory limit of every worker process in MB.
+      callback: (Optional) Called as callback(index, result) in the main process as soon as each job finishes.
+    Returns:
+      List of result dictionaries given by runJob(), in the same order as jobs.
+    """
+    pool = WorkerPool(workers, memoryLimit)
+    for i, job in enumerate(jobs):
+        pool.submit(i, job)
+    results = [None] * len(jobs)
+    while not pool.isIdle():
+        for i, kind, value in pool.poll():
+            if kind != "result":
+                continue
+            results[i] = value
+            if callback is not None:
+                callback(i, value)
+    return results
+
+def writeSummary(results, path):
+    """
+    Writes the summary of a batch as JSON (everything) and CSV (one row of timings per folder).
+    Args:
+      results: List of result dictionaries given by runBatch()
+      path: Path of the summary files without extension. Ex. r"C:/User/Rahul/Export/Batch Summary"
+    """
+    with open(path + ".json", "w") as f:
+        json.dump(results, f, indent=2)
+    with open(path + ".csv", "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["path", "status", "images", "total_s"] + ["{}_s".format(stage) for stage in STAGES] + ["error"])
+        for result in results:
+            writer.writerow([result["path"], result["status"], result["images"], round(result["seconds"], 3)]
+                            + [round(result["stages"][stage], 3) if stage in result["stages"] else "" for stage in STAGES]
+                            + [result["error"] or ""])
+
+def main():
+    """Command line entry point. Run with --help for arguments."""
+    parser = argparse.ArgumentParser(description="Analyse many experiment folders in parallel.")
+    parser.add_argument("folders", nargs="*", help="Experiment folders, analysed with the parameters given below")
+    parser.add_argument("--jobs", help="JSON file with a list of jobs, each with its own parameters (see makeJob)")
+    parser.add_argument("--bf-threshold", type=int, default=DEFAULT_PARAMS["BF"][0])
+    parser.add_argument("--bf-radius", type=int, nargs=2, default=DEFAULT_PARAMS["BF"][1])
+    parser.add_argument("--tr-threshold", type=int, default=DEFAULT_PARAMS["TR"][0])
+    parser.add_argument("--tr-radius", type=int, nargs=2, default=DEFAULT_PARAMS["TR"][1])
+    parser.add_argument("--base", help="Base day id. Ex. p00 (Default: first day)")
+    parser.add_argument("--formats", default="", help="Comma separated tidy data formats. Ex. csv,parquet")
+    parser.add_argument("--images", action="store_true", help="Also export marked images")
+    parser.add_argument("--workers", type=int, help="Number of folders analysed at once (Default: number of cores)")
+    parser.add_argument("--memory", type=float, help="Memory limit of every worker in MB")
+    parser.add_argument("--summary", default="Batch Summary", help="Summary file path without extension")
+    args = parser.parse_args()
+
+    jobs = []
+    if args.jobs:
+        with open(args.jobs) as f:
+            for job in json.load(f):
+                jobs.append(makeJob(job["path"], job.get("out"), job.get("bf"), job.get("tr"), job.get("baseId"),
+                                    job.get("formats", ()), job.get("images", False)))
+    formats = [format_ for format_ in args.formats.split(",") if format_]
+    for folder in args.folders:
+        jobs.append(makeJob(folder, None, (args.bf_threshold, args.bf_radius, False), (args.tr_threshold, args.tr_radius, True),
+                            args.base, formats, args.images))
+    if not jobs:
+        parser.error("No folders or jobs given")
+
+    def report(i, result):
+        print("[{}/{}] {} {} ({:.1f} s){}".format(sum(1 for r in results if r is not None) + 1, len(jobs), result["status"].upper(),
+                                                   result["path"], result["seconds"], " - " + result["error"] if result["error"] else ""))
+        results[i] = result
+    results = [None] * len(jobs)
+    runBatch(jobs, args.workers, args.memory, report)
+    writeSummary(results, args.summary)
+    numFailed = sum(1 for result in results if result["status"] == "failed")
+    print("{} of {} folders done, summary written to {}.json/.csv".format(len(jobs) - numFailed, len(jobs), args.summary))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
+from matplotlib.figure import Figure
+from numpy import arange
+
+from Sharpness import METRICS
+
+# matplotlib takes about as long to import as the rest of the application, so this module is only
+# imported once a graph is first shown. See ImageViewer.drawSharpnessGraphs
+
+
+class PlotWindow(FigureCanvasQTAgg):
+    """Object for separate plot windows for sharpness graphs"""
+    def __init__(self, parent=None, width=5, height=4, dpi=100):
+        fig = Figure(figsize=(width, height), dpi=dpi)
+        self.axes = fig.add_subplot(111)
+        super(PlotWindow, self).__init__(fig)
+
+        self.points = {} # Focus measures of every slice plotted so far. {z : measures}
+        self.lines = {}  # Line for each focus measure. {metric : Line2D}
+
+    def addPoint(self, z, measures):
+        """
+        Adds a single slice to the focus curves. Every metric is scaled by its maximum so they share an axis.
+        Args:
+          z: Slice number
+          measures: Dictionary of {metric : value}, see Sharpness.focusMeasures
+        """
+        self.points[z] = measures
+        zs = sorted(self.points)
+        for metric in METRICS:
+            values = [self.points[z_][metric] for z_ in zs]
+            peak = max(values)
+            values = [value / peak if peak > 0 else 0 for value in values]
+            if metric in self.lines:
+                self.lines[metric].set_data(zs, values)
+            else:
+                self.lines[metric], = self.axes.plot(zs, values, label=metric)
+                self.axes.legend(loc="upper right")
+        self.axes.relim()
+        self.axes.autoscale_view()
+        self.draw_idle()
+
+    def setCurve(self, curve):
+        """
+        Plots full focus curves.
+        Args:
+          curve: List of (id_, measures) tuples, see Sharpness.SharpnessEngine.curve
+        """
+        self.points = {}
+        for id_, measures in curve:
+            self.points[float(id_)] = measures
+        if len(self.points) == 0:
+            return
+        z, measures = curve[-1]
+        self.addPoint(float(z), measures)
+        self.axes.set_xticks(arange(min(self.points), max(self.points)+1, 5.0))
+        self.draw_idle()
@@ -0,0 +1,41 @@
+import cv2
+import numpy as np
+
+# Translation between an image and its base image (Ex. stage drift between days), so shapes can be matched
+# on corrected coordinates. Only numpy and OpenCV are used, like Detection.
+
+MIN_RESPONSE = 0.1 # Phase correlation peaks weaker than this are treated as unreliable, Ex. nearly empty frames
+
+
+def estimateShift(img, baseImg):
+    """
+    Estimates the translation of an image relative to a base image by phase correlation.
+    Both images should be downsampled the same way first (Ex. Image.preview), only the shift is scaled back.
+    Args:
+      img: Numpy array of 8-bit grayscale image.
+      baseImg: Numpy array of 8-bit grayscale base image, same size as img.
+    Returns:
+      (dx, dy, response) A point at (x, y) in baseImg is at (x + dx, y + dy) in img. The response is the height of
+      the correlation peak, from 0 (no match) to 1 (exact translation).
+    """
+    if img.shape != baseImg.shape or min(img.shape[:2]) < 2:
+        return 0.0, 0.0, 0.0
+    window = cv2.createHanningWindow(img.shape[1::-1], cv2.CV_32F) # Fades the borders, which don't wrap around
+    base = baseImg.astype(np.float32)
+    moving = img.astype(np.float32)
+    (dx, dy), response = cv2.phaseCorrelate(base - base.mean(), moving - moving.mean(), window)
+    return float(dx), float(dy), float(response)
+
+def registerPreviews(preview, basePreview):
+    """
+    Args:
+      preview: (Downsampled 8-bit image, scale factor) of an image, see Image.preview
+      basePreview: (Downsampled 8-bit image, scale factor) of its base image
+    Returns:
+      (dx, dy, response) Translation in full resolution pixels, see estimateShift(). (0, 0, 0) if the scales differ.
+    """
+    (small, scale), (baseSmall, baseScale) = preview, basePreview
+    if scale != baseScale:
+        return 0.0, 0.0, 0.0
+    dx, dy, response = estimateShift(small, baseSmall)
+    return dx / scale, dy / scale, response
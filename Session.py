@@ -0,0 +1,127 @@
+import json
+import os
+
+import numpy as np
+
+SESSION_NAME = ".cmed_session.npz" # Written in the experiment folder
+SESSION_VERSION = 1
+SHAPE_COLUMNS = 5 # x, y, r, nan, nan for circles and x, y, w, h, angle for ellipses
+
+
+def shapeRows(shapes):
+    """
+    Args:
+      shapes: List of shape data. (Ellipse: [(x,y),(w,h),ang,id] ; Circle: [(x,y),r,id])
+    Returns:
+      Numpy float array of shape (len(shapes), SHAPE_COLUMNS) and the list of shape ids.
+    """
+    rows = np.full((len(shapes), SHAPE_COLUMNS), np.nan)
+    for i, shape in enumerate(shapes):
+        if len(shape) == 4:
+            (x, y), (w, h), ang, _ = shape
+            rows[i] = x, y, w, h, ang
+        else:
+            (x, y), r, _ = shape
+            rows[i, :3] = x, y, r
+    return rows, [shape[-1] for shape in shapes]
+
+def shapesFromRows(rows, ids, isEllipse):
+    """Inverse of shapeRows(). Returns a list of shape data in the format used by Image.shapes"""
+    if isEllipse:
+        return [[(x, y), (w, h), ang, id_] for (x, y, w, h, ang), id_ in zip(rows.tolist(), ids)]
+    return [[(x, y), r, id_] for (x, y, r, _, _), id_ in zip(rows.tolist(), ids)]
+
+def fileStamp(path):
+    """Returns [size, mtime] of a file, used to tell if an image changed on disk since the session was saved"""
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+def isInside(path, folder):
+    """Returns True if path is in folder or any of its subfolders. Ex. "/data/exp10/a.tif" isn't in "/data/exp1" """
+    path, folder = os.path.abspath(path), os.path.abspath(folder)
+    try:
+        return os.path.commonpath([path, folder]) == folder
+    except ValueError: # Different drives on Windows
+        return False
+
+def saveSession(basePath, images, baseId):
+    """
+    Saves the detection state of every image to the session file of an experiment folder.
+    Args:
+      basePath: Experiment folder. Ex. r"C:/User/Rahul/Data/Experiment/"
+      images: List of Image objects. Images outside of basePath (Ex. focus stacks) aren't saved.
+      baseId: ID of the base images, None if there isn't one.
+    Returns:
+      Number of images saved. The session file is left untouched if it's 0.
+    """
+    header = {"version": SESSION_VERSION, "baseId": baseId, "images": []}
+    shapeArrs, baseArrs = [], []
+    numShapes, numBase = 0, 0
+    for img in images:
+        if not isInside(img.path, basePath):
+            continue
+        rows, ids = shapeRows(img.shapes)
+        baseItems = sorted(img.base_shapes.items())
+        baseRows, _ = shapeRows([shape for _, (shape, _) in baseItems])
+        dists = np.array([[dist] for _, (_, dist) in baseItems], dtype=float).reshape(len(baseItems), 1)
+        header["images"].append({
+            "type": img.type, "name": img.name, "file": fileStamp(img.path),
+            "threshold": img.threshold, "radiusRange": list(img.radiusRange), "ellipse": img.ellipse,
+            "shapes": [numShapes, numShapes + len(rows)], "shapeIds": ids,
+            "base": [numBase, numBase + len(baseRows)], "baseIds": [id_ for id_, _ in baseItems],
+            "registration": img.registration})
+        shapeArrs.append(rows)
+        baseArrs.append(np.hstack((baseRows, dists)))
+        numShapes, numBase = numShapes + len(rows), numBase + len(baseRows)
+    if not header["images"]:
+        return 0
+
+    # Written to a temporary file first so a failed save never corrupts the previous session
+    path = os.path.join(basePath, SESSION_NAME)
+    tempPath = path + ".tmp.npz"
+    np.savez_compressed(tempPath,
+                        header=np.frombuffer(json.dumps(header).encode(), dtype=np.uint8),
+                        shapes=np.vstack(shapeArrs) if shapeArrs else np.empty((0, SHAPE_COLUMNS)),
+                        base=np.vstack(baseArrs) if baseArrs else np.empty((0, SHAPE_COLUMNS + 1)))
+    os.replace(tempPath, path)
+    return len(header["images"])
+
+def loadSession(basePath, images):
+    """
+    Restores the detection state saved by saveSession(). Parameters are restored right away, shapes are
+    only handed to the images (see Image.restoreState) and built when first used. Nothing is detected.
+    Images that changed on disk since the session was saved are left as they are.
+    Args:
+      basePath: Experiment folder. Ex. r"C:/User/Rahul/Data/Experiment/"
+      images: List of Image objects of the experiment.
+    Returns:
+      (baseId, number of images restored). (None, 0) if there is no session or it can't be read.
+    """
+    path = os.path.join(basePath, SESSION_NAME)
+    if not os.path.exists(path):
+        return None, 0
+    try:
+        with np.load(path) as session:
+            header = json.loads(session["header"].tobytes().decode())
+            shapes, base = session["shapes"], session["base"]
+    except (OSError, ValueError, KeyError):
+        return None, 0
+    if header.get("version") != SESSION_VERSION:
+        return None, 0
+
+    byName = {(img.type, img.name): img for img in images}
+    numRestored = 0
+    for entry in header["images"]:
+        img = byName.get((entry["type"], entry["name"]))
+        if img is None or fileStamp(img.path) != entry["file"]:
+            continue
+        img.threshold = entry["threshold"]
+        img.radiusRange = tuple(entry["radiusRange"])
+        img.ellipse = entry["ellipse"]
+        if entry.get("registration") is not None: # Sessions saved before drift correction have none
+            img.registration = tuple(entry["registration"])
+        shapeStart, shapeEnd = entry["shapes"]
+        baseStart, baseEnd = entry["base"]
+        img.restoreState(shapes[shapeStart:shapeEnd], entry["shapeIds"], base[baseStart:baseEnd], entry["baseIds"])
+        numRestored = numRestored + 1
+    return header["baseId"], numRestored
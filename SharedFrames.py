@@ -0,0 +1,204 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+import atexit
+import multiprocessing
+import os
+import threading
+import weakref
+
+import numpy as np
+
+from Detection import detectShapes
+
+# Every FrameStore that still holds blocks, so they're unlinked when the interpreter exits
+_stores = weakref.WeakSet()
+
+
+class FrameStore:
+    """
+    Decoded frames of an ImageCollection placed in shared memory blocks, so worker processes can read them
+    without pickling the pixels. Workers only receive a handle (block name, shape, dtype) and send back shape tables.
+
+    Blocks are unlinked by release(), when the collection is reset and when the interpreter exits. If the process
+    is killed, the multiprocessing resource tracker unlinks the blocks it created instead.
+    """
+    def __init__(self):
+        self.blocks = {} # {image path : (SharedMemory, handle)}
+        self.lock = threading.Lock()
+        _stores.add(self)
+
+    def share(self, image):
+        """
+        Copies the raw pixels of an image to a shared memory block, unless they're already there.
+        Args:
+          image: Image object.
+        Returns:
+          Handle of the frame, (block name, shape, dtype string). See attach().
+        """
+        with self.lock:
+            if image.path in self.blocks:
+                return self.blocks[image.path][1]
+        img = image.originalImg
+        block = shared_memory.SharedMemory(create=True, size=max(img.nbytes, 1))
+        np.ndarray(img.shape, img.dtype, buffer=block.buf)[...] = img
+        handle = (block.name, img.shape, img.dtype.str)
+        with self.lock:
+            self.blocks[image.path] = (block, handle)
+        return handle
+
+    def release(self, images=None):
+        """
+        Unlinks the blocks of some images.
+        Args:
+          images: (Optional) List of Image objects. Defaults to every image in the store.
+        """
+        with self.lock:
+            paths = list(self.blocks) if images is None else [image.path for image in images if image.path in self.blocks]
+            blocks = [self.blocks.pop(path)[0] for path in paths]
+        for block in blocks:
+            block.close()
+            try:
+                block.unlink()
+            except FileNotFoundError:
+                pass
+
+    def nbytes(self):
+        """Returns the total size of the shared blocks in bytes"""
+        with self.lock:
+            return sum(block.size for block, _ in self.blocks.values())
+
+def releaseAll():
+    """Unlinks the blocks of every FrameStore. Registered to run when the interpreter exits."""
+    for store in list(_stores):
+        store.release()
+
+atexit.register(releaseAll)
+
+
+def attach(handle):
+    """
+    Opens a frame shared by FrameStore.share(). Used in worker processes.
+    Args:
+      handle: (block name, shape, dtype string)
+    Returns:
+      (SharedMemory, numpy array) The array is a view of the block, close the block once the array isn't needed.
+    """
+    name, shape, dtype = handle
+    try:
+        block = shared_memory.SharedMemory(name=name, track=False) # Python 3.13+, only the owner tracks the block
+    except TypeError:
+        # Older versions register the block again, which is harmless as spawned workers share the owner's resource tracker
+        block = shared_memory.SharedMemory(name=name)
+    return block, np.ndarray(shape, np.dtype(dtype), buffer=block.buf)
+
+def detectShared(handle, threshold, radiusRange, ellipse, backend="contour", params=None, circles=None):
+    """
+    Worker process entry point. Detects shapes in a shared frame, see Detection.detectShapes().
+    Returns:
+      List of shape data, the only thing sent back to the owner.
+    """
+    block, img = attach(handle)
+    try:
+        return detectShapes(img, threshold, radiusRange, ellipse, circles, backend=backend, params=params)
+    finally:
+        del img # The view must go before the block can be closed
+        block.close()
+
+def initWorker():
+    """Initializer of worker processes"""
+    import cv2
+    cv2.setNumThreads(1) # One core per worker process
+
+class DetectionPool:
+    """
+    Pool of worker processes for detecting shapes in frames shared by a FrameStore. Started when first used.
+    If a worker crashes the pool is restarted on the next call and the images it didn't finish are detected in this process.
+    """
+    def __init__(self, workers=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = None
+        self.lock = threading.Lock()
+
+    def run(self, store, images, func, args, callback=None, imageArgs=None):
+        """
+        Runs a function on the shared frames of many images.
+        Args:
+          store: FrameStore holding (or given) the frames of the images.
+          images: List of Image objects.
+          func: Module level function called as func(handle, *args) in a worker process, see detectShared().
+          args: Tuple of extra picklable arguments of func.
+          callback: (Optional) Called as callback(image, result) in this process as every image finishes.
+          imageArgs: (Optional) Called as imageArgs(image), returns a tuple of picklable arguments of func for that
+            image only, passed after args.
+        Returns:
+          Dictionary of {image path : result of func}
+        """
+        extra = imageArgs or (lambda image: ())
+        tasks = [(image.path, image, tuple(args) + tuple(extra(image))) for image in images]
+        imageDone = None
+        if callback is not None:
+            imageDone = lambda key, image, result: callback(image, result)
+        return self.runTasks(store, tasks, func, imageDone)
+
+    def runTasks(self, store, tasks, func, callback=None):
+        """
+        Runs a function on the shared frames of images, any number of times per image. Ex. a part of a parameter grid each time
+        Args:
+          store: FrameStore holding (or given) the frames of the images.
+          tasks: List of (key, Image object, tuple of picklable arguments). Every frame is shared once however many tasks use it.
+          func: Module level function called as func(handle, *arguments) in a worker process.
+          callback: (Optional) Called as callback(key, image, result) in this process as every task finishes.
+        Returns:
+          Dictionary of {key : result of func}
+        """
+        results = {}
+        def done(key, image, result):
+            results[key] = result
+            if callback is not None:
+                callback(key, image, result)
+
+        with self.lock:
+            if self.executor is None:
+                # Forking a process that imported Qt isn't safe
+                self.executor = ProcessPoolExecutor(self.workers, multiprocessing.get_context("spawn"), initWorker)
+            executor = self.executor
+        try:
+            futures = {executor.submit(func, store.share(image), *args): (key, image) for key, image, args in tasks}
+            for future in as_completed(futures):
+                done(*futures[future], future.result())
+        except BrokenProcessPool:
+            self.shutdown()
+            # The owner can attach its own blocks, so the rest runs here the same way
+            for key, image, args in tasks:
+                if key not in results:
+                    done(key, image, func(store.share(image), *args))
+        return results
+
+    def detect(self, store, images, threshold, radiusRange, ellipse, callback=None, circles=None, backend="contour", params=None):
+        """
+        Detects shapes in many images, see Detection.detectShapes().
+        Args:
+          store: FrameStore holding (or given) the frames of the images.
+          images: List of Image objects.
+          threshold: Integer value to run binary thresholding on.
+          radiusRange: (int, int) Minimum and maximum radius range to consider in pixels.
+          ellipse: True to fit ellipses, False to fit circles.
+          callback: (Optional) Called as callback(image, shapes) in this process as every image finishes.
+          circles: (Optional) Dictionary of {image path : list of circles}, only shapes inside them are kept.
+          backend: (Default value = "contour") Name of the detection backend, see Detection.BACKENDS
+          params: (Optional) Dictionary of backend parameters.
+        Returns:
+          Dictionary of {image path : list of shape data}
+        """
+        imageArgs = (lambda image: (circles.get(image.path),)) if circles else None
+        return self.run(store, images, detectShared, (threshold, tuple(radiusRange), ellipse, backend, params), callback, imageArgs)
+
+    def shutdown(self):
+        """Stops the worker processes"""
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+pool = DetectionPool() # Shared by every ImageCollection in the process
@@ -0,0 +1,93 @@
+import numpy as np
+
+# Column indices of the shape data given by ExportThread.getShapeData()
+AREA, X, Y, MAJOR, MINOR, ANGLE = range(6)
+
+
+def getSpheroidNum(sensorId):
+    """
+    Args:
+      sensorId: Sensor id. Ex. "1a", "12b"
+    Returns:
+      Number of the spheroid the sensor is in (string), accounting for both double and single digits. Ex. "1", "12"
+    """
+    return sensorId[0:2] if sensorId[0:2].isdigit() else sensorId[0]
+
+def shapeArray(shapeMap, ids):
+    """
+    Args:
+      shapeMap: Map of {shape id : [area,x,y,major,minor,adjusted angle]} for a single day.
+      ids: List of shape ids, defines the row order.
+    Returns:
+      Numpy float array of shape (len(ids), 6), rows of missing shapes are NaN.
+    """
+    arr = np.full((len(ids), 6), np.nan)
+    for i, id_ in enumerate(ids):
+        shapeData = shapeMap.get(id_)
+        if shapeData is not None:
+            arr[i] = shapeData
+    return arr
+
+def spheroidIndex(spheroidIds, sensorIds):
+    """
+    Args:
+      spheroidIds: List of spheroid ids. Ex. ["1", "2", "3"]
+      sensorIds: List of sensor ids. Ex. ["1a", "1b", "2a"]
+    Returns:
+      Numpy int array with the index into spheroidIds of the spheroid each sensor is in, -1 if it isn't in any.
+    """
+    spheroidIdx = {int(spheroidId): i for i, spheroidId in enumerate(spheroidIds)}
+    return np.array([spheroidIdx.get(int(getSpheroidNum(sensorId)), -1) for sensorId in sensorIds], dtype=int)
+
+def computeStrains(spheroids, sensors, sensorSpheroid):
+    """
+    Computes the strains of every sensor on every day relative to the first day, in one vectorized step.
+    Args:
+      spheroids: Numpy array of shape (days, spheroids, 6) of spheroid data, NaN where missing.
+      sensors: Numpy array of shape (days, sensors, 6) of sensor data, NaN where missing.
+      sensorSpheroid: Numpy int array of the spheroid index of each sensor, given by spheroidIndex()
+    Returns:
+      Numpy array of shape (days, sensors, 3) of (spheroid area strain, radial strain, circumferential strain).
+      Strains are NaN where the shapes they depend on are missing. Strains of the first day are 0.
+    """
+    numDays, numSensors = sensors.shape[:2]
+    if numDays == 0 or spheroids.shape[1] == 0 or numSensors == 0:
+        return np.full((numDays, numSensors, 3), np.nan)
+
+    # Spheroid data of the spheroid each sensor is in. Sensors outside of all spheroids get a row of NaNs
+    padded = np.concatenate((spheroids, np.full((numDays, 1, 6), np.nan)), axis=1)
+    spheroid = padded[:, np.where(sensorSpheroid < 0, spheroids.shape[1], sensorSpheroid)]
+    day0Spheroid, day0Sensor = spheroid[0], sensors[0]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # (currSpheroidArea - day0SpheroidArea) / day0SpheroidArea
+        areaStrain = (spheroid[..., AREA] - day0Spheroid[:, AREA]) / day0Spheroid[:, AREA]
+        # (sensorMinor - day0SensorMajor) / (day0SensorMajor) and (sensorMajor - day0SensorMinor) / (day0SensorMinor)
+        minorStrain = (sensors[..., MINOR] - day0Sensor[:, MAJOR]) / day0Sensor[:, MAJOR]
+        majorStrain = (sensors[..., MAJOR] - day0Sensor[:, MINOR]) / day0Sensor[:, MINOR]
+
+    # Sensors within 45 degrees of their spheroid's adjusted angle are compressed along their minor axis
+    aligned = sensors[..., ANGLE] - spheroid[..., ANGLE] < 45
+    radialStrain = np.where(aligned, minorStrain, majorStrain)
+    circStrain = np.where(aligned, majorStrain, minorStrain)
+
+    # Sensor strains are undefined without the spheroid they're in
+    missing = np.isnan(areaStrain)
+    radialStrain[missing] = np.nan
+    circStrain[missing] = np.nan
+    return np.stack((areaStrain, radialStrain, circStrain), axis=-1)
+
+def strainTable(data, spheroidIds, sensorIds, dayIds):
+    """
+    Computes the strains of every sensor on every day in dayIds relative to dayIds[0].
+    Args:
+      data: Dictionary containing all shape data sorted by days and spheroid/sensor. Format given in ExportThread.getBaseData().
+      spheroidIds: List of spheroid ids. Ex. ["1", "2", "3"]
+      sensorIds: List of sensor ids. Ex. ["1a", "1b", "2a"]
+      dayIds: List of day ids, all must be in data. Ex. ["p00", "p01", "p02"]
+    Returns:
+      Numpy array of shape (len(dayIds), len(sensorIds), 3), see computeStrains()
+    """
+    spheroids = np.stack([shapeArray(data[dayId][0], spheroidIds) for dayId in dayIds]) if dayIds else np.empty((0, len(spheroidIds), 6))
+    sensors = np.stack([shapeArray(data[dayId][1], sensorIds) for dayId in dayIds]) if dayIds else np.empty((0, len(sensorIds), 6))
+    return computeStrains(spheroids, sensors, spheroidIndex(spheroidIds, sensorIds))
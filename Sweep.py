@@ -0,0 +1,158 @@
+import cv2
+import numpy as np
+
+from Detection import significantContours
+from SharedFrames import attach, pool
+
+MATCH_DISTANCE = 150 # Shapes further than this from a base shape don't match it, same as Image.MATCH_DISTANCE
+SWEEP_METRICS = { # Values summarized for every parameter combination, {key : label}
+    "count": "Shapes per Image",
+    "countStd": "Std. Dev. of Shapes per Image",
+    "medianSize": "Median Radius (px)",
+    "sizeIqr": "Radius IQR (px)",
+    "stability": "Base Shapes Matched",
+}
+
+
+def sweepGrid(thresholds, minRadii, maxRadii):
+    """
+    Args:
+      thresholds: List of thresholds.
+      minRadii: List of minimum radii in pixels.
+      maxRadii: List of maximum radii in pixels.
+    Returns:
+      List of (threshold, (min radius, max radius)) for every combination with min radius < max radius.
+    """
+    return [(threshold, (minRadius, maxRadius)) for threshold in thresholds for minRadius in minRadii
+            for maxRadius in maxRadii if minRadius < maxRadius]
+
+def sweepFrame(img, combos, ellipse):
+    """
+    Detects shapes in one frame with every parameter combination. Thresholding, contours and fitting are done once per
+    threshold and shared by all of its radius ranges, the results are the same as Detection.detectShapes().
+    Args:
+      img: Numpy array of 8-bit grayscale image.
+      combos: List of (threshold, (min radius, max radius)), see sweepGrid()
+      ellipse: True to fit ellipses, False to fit circles.
+    Returns:
+      List with a float32 array of (x, y, radius) rows for every combination. The radius of an ellipse is half its longest axis.
+    """
+    byThreshold = {}
+    for i, (threshold, _) in enumerate(combos):
+        byThreshold.setdefault(threshold, []).append(i)
+
+    tables = [None] * len(combos)
+    for threshold, indices in byThreshold.items():
+        contours = significantContours(img, threshold, min(combos[i][1][0] for i in indices))
+        rows = np.zeros((len(contours), 4), np.float32) # x, y, radius, area
+        for j, contour in enumerate(contours):
+            if ellipse:
+                (x, y), (w, h), _ = cv2.fitEllipse(contour)
+                rows[j] = x, y, max(w, h) / 2, cv2.contourArea(contour)
+            else:
+                (x, y), r = cv2.minEnclosingCircle(contour)
+                rows[j] = x, y, r, cv2.contourArea(contour)
+        sizes = rows[:, 2] * 2 if ellipse else rows[:, 2] # Ellipses are limited by their longest axis
+        for i in indices:
+            minRadius, maxRadius = combos[i][1]
+            keep = (rows[:, 3] >= np.pi * minRadius ** 2) & (sizes <= maxRadius)
+            tables[i] = rows[keep, :3]
+    return tables
+
+def sweepShared(handle, combos, ellipse):
+    """Worker process entry point. Runs sweepFrame() on a frame shared by SharedFrames.FrameStore."""
+    block, img = attach(handle)
+    try:
+        return sweepFrame(img, combos, ellipse)
+    finally:
+        del img # The view must go before the block can be closed
+        block.close()
+
+def matchRate(base, table):
+    """
+    Args:
+      base: Array of (x, y, radius) rows of the base image.
+      table: Array of (x, y, radius) rows of another image.
+    Returns:
+      Fraction of base shapes that have a shape within MATCH_DISTANCE in the other image, NaN if there are no base shapes.
+    """
+    if len(base) == 0:
+        return np.nan
+    if len(table) == 0:
+        return 0.0
+    dists = np.hypot(base[:, None, 0] - table[None, :, 0], base[:, None, 1] - table[None, :, 1])
+    return float(np.mean(dists.min(axis=1) <= MATCH_DISTANCE))
+
+def summarize(tables, combos, basePath=None):
+    """
+    Summarizes the shapes found with every parameter combination across images.
+    Args:
+      tables: Dictionary of {image path : list of arrays given by sweepFrame()}
+      combos: List of (threshold, (min radius, max radius)) the tables were made with.
+      basePath: (Optional) Path of the base image that the other images are matched against.
+    Returns:
+      List of dictionaries, one per combination, with the threshold, minRadius, maxRadius and every key of SWEEP_METRICS.
+      Metrics that can't be computed (Ex. stability without a base image) are NaN.
+    """
+    rows = []
+    others = [path for path in tables if path != basePath]
+    for i, (threshold, (minRadius, maxRadius)) in enumerate(combos):
+        counts = [len(tables[path][i]) for path in tables]
+        sizes = np.concatenate([tables[path][i][:, 2] for path in tables])
+        row = {"threshold": threshold, "minRadius": minRadius, "maxRadius": maxRadius,
+               "count": float(np.mean(counts)), "countStd": float(np.std(counts)),
+               "medianSize": float(np.median(sizes)) if len(sizes) else np.nan,
+               "sizeIqr": float(np.subtract(*np.percentile(sizes, [75, 25]))) if len(sizes) else np.nan,
+               "stability": np.nan}
+        if basePath in tables and others:
+            rates = [matchRate(tables[basePath][i], tables[path][i]) for path in others]
+            row["stability"] = float(np.mean(rates)) if not np.all(np.isnan(rates)) else np.nan
+        rows.append(row)
+    return rows
+
+def sweepTasks(images, combos, ellipse):
+    """
+    Splits a sweep into one task per image and threshold, so the grid of a single image is also spread over the
+    workers. Every task keeps the radius ranges of its threshold together, see sweepFrame().
+    Args:
+      images: List of Image objects to sweep.
+      combos: List of (threshold, (min radius, max radius)), see sweepGrid()
+      ellipse: True to fit ellipses, False to fit circles.
+    Returns:
+      List of ((image path, tuple of indices in combos), Image object, (combos of the task, ellipse)), see DetectionPool.runTasks
+    """
+    byThreshold = {}
+    for i, (threshold, _) in enumerate(combos):
+        byThreshold.setdefault(threshold, []).append(i)
+    return [((image.path, tuple(indices)), image, ([combos[i] for i in indices], ellipse))
+            for image in images for indices in byThreshold.values()]
+
+def runSweep(collection, images, combos, ellipse, baseImage=None, callback=None):
+    """
+    Evaluates every parameter combination on a set of images in worker processes, one task per image and threshold
+    (see sweepTasks). Every frame is shared with the workers once (see SharedFrames).
+    Args:
+      collection: ImageCollection the images belong to.
+      images: List of Image objects to sweep.
+      combos: List of (threshold, (min radius, max radius)), see sweepGrid()
+      ellipse: True to fit ellipses, False to fit circles.
+      baseImage: (Optional) Image the others are matched against for the stability metric. Added to the sweep if needed.
+      callback: (Optional) Called as callback(image) as every threshold of every image finishes.
+    Returns:
+      List of summary rows, see summarize()
+    """
+    if baseImage is not None and baseImage not in images:
+        images = images + [baseImage]
+    taskDone = None
+    if callback is not None:
+        taskDone = lambda key, image, tables: callback(image)
+    try:
+        results = pool.runTasks(collection.frames, sweepTasks(images, combos, ellipse), sweepShared, taskDone)
+    finally:
+        collection.frames.release(images)
+    # Tables of every image in the order of combos
+    tables = {image.path: [None] * len(combos) for image in images}
+    for (path, indices), parts in results.items():
+        for i, table in zip(indices, parts):
+            tables[path][i] = table
+    return summarize(tables, combos, baseImage.path if baseImage is not None else None)
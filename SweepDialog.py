@@ -0,0 +1,127 @@
+from PyQt5 import QtCore, QtWidgets
+from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
+from matplotlib.figure import Figure
+import numpy as np
+
+from Sweep import SWEEP_METRICS
+
+
+def parseNumbers(text):
+    """Returns the sorted list of distinct integers in a comma separated string. Ex. "10, 20,40" --> [10, 20, 40]"""
+    return sorted(set(int(part) for part in text.replace(" ", "").split(",") if part))
+
+class SweepDialog(QtWidgets.QDialog):
+    """Dialog for choosing the parameter grid and the images of a parameter sweep."""
+    def __init__(self, images, currImage, threshold, radiusRange, parent=None):
+        super(SweepDialog, self).__init__(parent)
+        self.setWindowTitle("Parameter Sweep")
+
+        layout = QtWidgets.QFormLayout(self)
+        self.thresholdRange = []
+        for label, value in (("Threshold From", max(threshold - 60, 0)), ("Threshold To", min(threshold + 60, 255)), ("Threshold Step", 20)):
+            widget = QtWidgets.QSpinBox()
+            widget.setRange(1 if label == "Threshold Step" else 0, 255)
+            widget.setValue(value)
+            layout.addRow(label, widget)
+            self.thresholdRange.append(widget)
+
+        minRadius, maxRadius = radiusRange
+        self.minRadii = QtWidgets.QLineEdit(", ".join(str(r) for r in sorted(set([max(minRadius // 2, 1), minRadius, minRadius * 2]))))
+        self.maxRadii = QtWidgets.QLineEdit(", ".join(str(r) for r in sorted(set([max(maxRadius // 2, 1), maxRadius, maxRadius * 2]))))
+        layout.addRow("Min Radii (px)", self.minRadii)
+        layout.addRow("Max Radii (px)", self.maxRadii)
+
+        # Images to sweep, the current one is checked by default
+        self.images = images
+        self.imageList = QtWidgets.QListWidget()
+        for img in images:
+            item = QtWidgets.QListWidgetItem(img.name)
+            item.setFlags(item.flags() | QtCore.Qt.ItemIsUserCheckable)
+            item.setCheckState(QtCore.Qt.Checked if img is currImage else QtCore.Qt.Unchecked)
+            self.imageList.addItem(item)
+        layout.addRow("Images", self.imageList)
+
+        buttons = QtWidgets.QDialogButtonBox(QtWidgets.QDialogButtonBox.Ok | QtWidgets.QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addRow(buttons)
+
+    def values(self):
+        """
+        Returns:
+          (list of thresholds, list of min radii, list of max radii, list of checked Image objects)
+        Raises:
+          ValueError: If a list of radii isn't a comma separated list of integers.
+        """
+        start, stop, step = [widget.value() for widget in self.thresholdRange]
+        thresholds = list(range(start, max(stop, start) + 1, step))
+        images = [img for i, img in enumerate(self.images) if self.imageList.item(i).checkState() == QtCore.Qt.Checked]
+        return thresholds, parseNumbers(self.minRadii.text()), parseNumbers(self.maxRadii.text()), images
+
+class SweepWindow(QtWidgets.QWidget):
+    """
+    Window showing a parameter sweep as a heatmap of thresholds x radius ranges, one metric at a time.
+    Clicking a cell emits its parameters, so they can be applied to the current image.
+    """
+    paramsChosen = QtCore.pyqtSignal(int, int, int) # (threshold, min radius, max radius)
+
+    def __init__(self, rows, title, parent=None):
+        super(SweepWindow, self).__init__(parent)
+        self.setWindowTitle(title)
+        self.rows = rows # Summary rows, see Sweep.summarize
+        self.thresholds = sorted(set(row["threshold"] for row in rows))
+        self.ranges = sorted(set((row["minRadius"], row["maxRadius"]) for row in rows))
+
+        self.metric = QtWidgets.QComboBox()
+        for key, label in SWEEP_METRICS.items():
+            self.metric.addItem(label, key)
+        self.metric.currentIndexChanged.connect(self.plot)
+
+        fig = Figure(figsize=(7, 5), dpi=100)
+        self.axes = fig.add_subplot(111)
+        self.colorbar = None
+        self.canvas = FigureCanvasQTAgg(fig)
+        self.canvas.mpl_connect("button_press_event", self.cellClicked)
+
+        layout = QtWidgets.QVBoxLayout(self)
+        layout.addWidget(self.metric)
+        layout.addWidget(self.canvas)
+        layout.addWidget(QtWidgets.QLabel("Click a cell to use its parameters on the current image."))
+        self.plot()
+
+    def grid(self, key):
+        """Returns a 2D array of a metric, rows are radius ranges and columns are thresholds. Missing combinations are NaN."""
+        values = np.full((len(self.ranges), len(self.thresholds)), np.nan)
+        for row in self.rows:
+            values[self.ranges.index((row["minRadius"], row["maxRadius"])), self.thresholds.index(row["threshold"])] = row[key]
+        return values
+
+    def plot(self):
+        """Draws the heatmap of the selected metric, with the value written in every cell"""
+        key = self.metric.currentData()
+        values = self.grid(key)
+        self.axes.clear()
+        image = self.axes.imshow(np.ma.masked_invalid(values), aspect="auto", cmap="viridis", origin="lower")
+        if self.colorbar is None:
+            self.colorbar = self.axes.figure.colorbar(image, ax=self.axes)
+        else:
+            self.colorbar.update_normal(image)
+        for (i, j), value in np.ndenumerate(values):
+            if not np.isnan(value):
+                self.axes.text(j, i, "{:.2g}".format(value), ha="center", va="center", fontsize=7, color="w")
+        self.axes.set_xticks(range(len(self.thresholds)))
+        self.axes.set_xticklabels(self.thresholds)
+        self.axes.set_yticks(range(len(self.ranges)))
+        self.axes.set_yticklabels(["{}-{}".format(*radii) for radii in self.ranges])
+        self.axes.set_xlabel("Threshold")
+        self.axes.set_ylabel("Radius Range (px)")
+        self.axes.set_title(SWEEP_METRICS[key])
+        self.canvas.draw_idle()
+
+    def cellClicked(self, event):
+        """Called when the heatmap is clicked. Emits the parameters of the clicked cell."""
+        if event.inaxes is not self.axes or event.xdata is None:
+            return
+        j, i = int(round(event.xdata)), int(round(event.ydata))
+        if 0 <= i < len(self.ranges) and 0 <= j < len(self.thresholds):
+            self.paramsChosen.emit(self.thresholds[j], *self.ranges[i])
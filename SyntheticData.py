@@ -0,0 +1,195 @@
+import argparse
+import os
+
+import cv2
+import numpy as np
+
+LAYOUTS = ("timelapse", "days", "zstack") # Folder structures supported by ImageViewer.selectDir
+
+MAX_BIT = 4095 # Microscope images are 12-bit values stored in 16-bit TIFFs (see Image.preprocessImg)
+
+
+def makePlate(rng, size, numSpheroids, sensorsPerSpheroid):
+    """
+    Randomly places spheroids and the sensors inside of them on a plate.
+    Args:
+      rng: numpy Generator used for all random values.
+      size: (width, height) of the images in pixels.
+      numSpheroids: Number of spheroids on the plate.
+      sensorsPerSpheroid: Number of sensors inside every spheroid.
+    Returns:
+      spheroids: List of dicts. Ex. {"center": (x, y), "radius": r, "sensors": [((dx, dy), (w, h), ang), ...]}
+    """
+    width, height = size
+    radiusLimits = (max(12, min(size) // 24), max(16, min(size) // 10))
+    spheroids = []
+    attempts = 0
+    while len(spheroids) < numSpheroids and attempts < numSpheroids * 200:
+        attempts = attempts + 1
+        r = rng.uniform(*radiusLimits)
+        margin = 1.6 * r
+        if width <= 2 * margin or height <= 2 * margin:
+            continue
+        x, y = rng.uniform(margin, width - margin), rng.uniform(margin, height - margin)
+        # Spheroids can't overlap, leave room for them to grow and drift
+        if any(np.hypot(x - s["center"][0], y - s["center"][1]) < 1.5 * (r + s["radius"]) for s in spheroids):
+            continue
+
+        sensors = []
+        for _ in range(sensorsPerSpheroid):
+            dist, theta = rng.uniform(0, 0.55 * r), rng.uniform(0, 2 * np.pi)
+            major = rng.uniform(0.22, 0.3) * r
+            minor = major * rng.uniform(0.8, 1.0)
+            sensors.append(((dist * np.cos(theta), dist * np.sin(theta)), (major, minor), rng.uniform(0, 180)))
+        spheroids.append({"center": (x, y), "radius": r, "sensors": sensors})
+    return spheroids
+
+def renderPair(rng, size, spheroids, offset, growth, noise, blur=0.0):
+    """
+    Renders a Bright Field and Texas Red image of the plate.
+    Args:
+      rng: numpy Generator used for noise.
+      size: (width, height) of the images in pixels.
+      spheroids: Plate generated by makePlate().
+      offset: (dx, dy) translation of the entire plate (stage drift).
+      growth: Scale factor applied to the spheroid radii. Sensors are compressed by the inverse.
+      noise: Standard deviation of the gaussian noise in 12-bit units.
+      blur: (Default value = 0.0) Extra gaussian blur sigma, used to simulate defocus in z-stacks.
+    Returns:
+      (bf, tr): 16-bit numpy arrays of the Bright Field and Texas Red images.
+    """
+    width, height = size
+    dx, dy = offset
+
+    # Bright field --> brownish spheroids on a lighter, unevenly lit background
+    bf = np.empty((height, width), np.float32)
+    bf[:] = np.linspace(2300, 2600, width, dtype=np.float32)
+    # Texas Red --> bright sensors on a black background
+    tr = np.full((height, width), 180, np.float32)
+
+    for spheroid in spheroids:
+        x, y = spheroid["center"]
+        r = spheroid["radius"] * growth
+        center = (int(round(x + dx)), int(round(y + dy)))
+        cv2.circle(bf, center, int(round(r)), 1100, -1, cv2.LINE_AA)
+        # Spheroids are stiffer than the sensors they contain, so sensors get compressed as they grow
+        for (sx, sy), (major, minor), ang in spheroid["sensors"]:
+            sensorCenter = (int(round(x + dx + sx * growth)), int(round(y + dy + sy * growth)))
+            axes = (max(1, int(round(major / growth ** 0.5))), max(1, int(round(minor * growth ** 0.25))))
+            cv2.ellipse(tr, sensorCenter, axes, ang, 0, 360, 3400, -1, cv2.LINE_AA)
+
+    frames = []
+    for frame, sigma in ((bf, 2.0), (tr, 1.5)):
+        frame = cv2.GaussianBlur(frame, (0, 0), sigma + blur)
+        frame += rng.normal(0, noise, frame.shape).astype(np.float32)
+        frames.append(np.clip(frame, 0, MAX_BIT).astype(np.uint16))
+    return tuple(frames)
+
+def plateShapes(spheroids, offset, growth):
+    """
+    Args:
+      spheroids: Plate generated by makePlate().
+      offset: (dx, dy) translation of the entire plate.
+      growth: Scale factor applied to the spheroid radii.
+    Returns:
+      (circles, ellipses) Spheroids [[(x, y), r], ...] and sensors [[(x, y), (w, h), ang], ...] as drawn by renderPair(),
+      in the format of Image shapes without ids. Ellipse axes are full lengths, like cv2.fitEllipse.
+    """
+    dx, dy = offset
+    circles, ellipses = [], []
+    for spheroid in spheroids:
+        x, y = spheroid["center"]
+        circles.append([(int(round(x + dx)), int(round(y + dy))), int(round(spheroid["radius"] * growth))])
+        for (sx, sy), (major, minor), ang in spheroid["sensors"]:
+            axes = (max(1, int(round(major / growth ** 0.5))), max(1, int(round(minor * growth ** 0.25))))
+            ellipses.append([(int(round(x + dx + sx * growth)), int(round(y + dy + sy * growth))), (2 * axes[0], 2 * axes[1]), ang])
+    return circles, ellipses
+
+def generateDataset(path, layout="timelapse", numImages=5, size=(1024, 1024), numSpheroids=4,
+                    sensorsPerSpheroid=2, noise=25.0, drift=6.0, growth=0.03, seed=0, truth=None):
+    """
+    Writes a synthetic experiment of 16-bit BF and Texas Red TIFF pairs in one of the supported folder structures.
+    Args:
+      path: Folder to write the experiment to. Created if it doesn't exist.
+      layout: (Default value = "timelapse") One of LAYOUTS.
+          timelapse: "BF" and "Texas Red" folders, one image per day with a p## id.
+          days: One "DAY#" folder per day, each with a BF (d4) and Texas Red (d3) image.
+          zstack: All slices in a single folder with z## ids, BF (d4) and Texas Red (d2).
+      numImages: (Default value = 5) Number of days (or z slices for z-stacks).
+      size: (Default value = (1024, 1024)) (width, height) of every image in pixels.
+      numSpheroids: (Default value = 4) Number of spheroids on the plate.
+      sensorsPerSpheroid: (Default value = 2) Number of sensors inside each spheroid.
+      noise: (Default value = 25.0) Standard deviation of the gaussian noise in 12-bit units.
+      drift: (Default value = 6.0) Standard deviation of the day to day plate translation in pixels.
+      growth: (Default value = 0.03) Fractional day to day growth of the spheroids.
+      seed: (Default value = 0) Random seed, the same arguments always produce the same images.
+      truth: (Optional) List that the true shapes of every pair are appended to, in day/slice order. See plateShapes()
+    Returns:
+      paths: List of (bf_path, tr_path) tuples in day/slice order.
+    """
+    if layout not in LAYOUTS:
+        raise ValueError("Unknown layout '{}'. Expected one of {}".format(layout, LAYOUTS))
+
+    rng = np.random.default_rng(seed)
+    spheroids = makePlate(rng, size, numSpheroids, sensorsPerSpheroid)
+
+    if layout == "timelapse":
+        bfDir, trDir = os.path.join(path, "BF"), os.path.join(path, "Texas Red")
+        os.makedirs(bfDir, exist_ok=True)
+        os.makedirs(trDir, exist_ok=True)
+    else:
+        os.makedirs(path, exist_ok=True)
+
+    paths = []
+    offset = np.zeros(2)
+    focus = (numImages - 1) / 2
+    for i in range(numImages):
+        if layout == "zstack":
+            # Slices share a position, sharpness falls off away from the focal plane
+            bf, tr = renderPair(rng, size, spheroids, (0, 0), 1.0, noise, blur=0.6 * abs(i - focus))
+            shapes = plateShapes(spheroids, (0, 0), 1.0)
+            bfPath = os.path.join(path, "EGFP_1mm_Plate_R_p00_z{0:0=2d}_0_A02f00d4.TIF".format(i))
+            trPath = os.path.join(path, "EGFP_1mm_Plate_R_p00_z{0:0=2d}_0_A02f00d2.TIF".format(i))
+        else:
+            if i > 0:
+                offset = offset + rng.normal(0, drift, 2)
+            bf, tr = renderPair(rng, size, spheroids, offset, (1 + growth) ** i, noise)
+            shapes = plateShapes(spheroids, offset, (1 + growth) ** i)
+            if layout == "timelapse":
+                bfPath = os.path.join(bfDir, "scan_Plate_R_p{0:0=2d}_0_A02f00d4.TIF".format(i))
+                trPath = os.path.join(trDir, "scan_Plate_R_p{0:0=2d}_0_A02f00d3.TIF".format(i))
+            else:
+                # Every day folder names its images p00, ImageViewer renames them by day
+                dayDir = os.path.join(path, "DAY{}".format(i))
+                os.makedirs(dayDir, exist_ok=True)
+                bfPath = os.path.join(dayDir, "scan_Plate_R_p00_0_A02f00d4.TIF")
+                trPath = os.path.join(dayDir, "scan_Plate_R_p00_0_A02f00d3.TIF")
+        cv2.imwrite(bfPath, bf)
+        cv2.imwrite(trPath, tr)
+        paths.append((bfPath, trPath))
+        if truth is not None:
+            truth.append(shapes)
+    return paths
+
+def main():
+    """Command line entry point. Run with --help for arguments."""
+    parser = argparse.ArgumentParser(description="Generate synthetic spheroid/sensor TIFF experiments.")
+    parser.add_argument("path", help="Output folder")
+    parser.add_argument("--layout", choices=LAYOUTS, default="timelapse")
+    parser.add_argument("--images", type=int, default=5, help="Number of days or z slices")
+    parser.add_argument("--width", type=int, default=1024)
+    parser.add_argument("--height", type=int, default=1024)
+    parser.add_argument("--spheroids", type=int, default=4)
+    parser.add_argument("--sensors", type=int, default=2, help="Sensors per spheroid")
+    parser.add_argument("--noise", type=float, default=25.0)
+    parser.add_argument("--drift", type=float, default=6.0)
+    parser.add_argument("--growth", type=float, default=0.03)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    paths = generateDataset(args.path, args.layout, args.images, (args.width, args.height), args.spheroids,
+                            args.sensors, args.noise, args.drift, args.growth, args.seed)
+    print("Wrote {} image pairs to {}".format(len(paths), args.path))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import numpy as np
+
+# Links the shapes of consecutive days into tracks, starting from the shapes of the base day. Every track keeps the id
+# of its base shape, so the linked shapes become the base shapes of each day. Only numpy is used, like Detection.
+
+MAX_MISSED = 2 # Tracks that aren't found for more days in a row than this aren't extended any further
+SIZE_WEIGHT = 0.5 # Weight of the size difference in the assignment cost, relative to the distance in pixels
+MOTION_GAIN = 0.5 # Fraction of the prediction error added to the velocity and growth of a track when it's found
+
+
+def shapePoints(shapes, shift=(0.0, 0.0)):
+    """
+    Args:
+      shapes: List of shape data. (Ellipse: [(x,y),(w,h),ang,id] ; Circle: [(x,y),r,id])
+      shift: (Default value = (0, 0)) (dx, dy) subtracted from every position. Ex. drift to the base image
+    Returns:
+      Numpy float array of (x, y, size) rows, the size is the radius of a circle or half the longest axis of an ellipse.
+    """
+    points = np.zeros((len(shapes), 3))
+    for i, shape in enumerate(shapes):
+        (x, y), size = shape[0], shape[1]
+        points[i] = x - shift[0], y - shift[1], max(size) / 2 if len(shape) == 4 else size
+    return points
+
+def assign(cost):
+    """
+    Assigns rows to columns by lowest cost first, same as sorting every pair by cost and taking each pair whose row and
+    column are both free. Every round assigns all mutually closest pairs at once, so it's vectorized.
+    Args:
+      cost: 2D numpy float array. Infinite costs are never assigned.
+    Returns:
+      (rows, columns) Numpy index arrays of the assigned pairs.
+    """
+    cost = np.array(cost, dtype=float)
+    rows, cols = [], []
+    while cost.size:
+        bestCol = np.argmin(cost, axis=1)
+        bestRow = np.argmin(cost, axis=0)
+        r = np.arange(cost.shape[0])
+        mutual = (bestRow[bestCol] == r) & np.isfinite(cost[r, bestCol])
+        if not mutual.any():
+            break
+        rows.append(r[mutual])
+        cols.append(bestCol[mutual])
+        cost[rows[-1], :] = np.inf
+        cost[:, cols[-1]] = np.inf
+    if not rows:
+        return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+    return np.concatenate(rows), np.concatenate(cols)
+
+class TrackState:
+    """Tracks after some day. Positions and sizes are in base image coordinates, velocities are per day."""
+    def __init__(self, ids, points):
+        self.ids = list(ids) # Track ids, the ids of the base shapes
+        self.pos = points[:, :2].copy() # Last (x, y) of every track
+        self.size = points[:, 2].copy()
+        self.vel = np.zeros_like(self.pos) # Last change of position per day
+        self.growth = np.zeros_like(self.size) # Last change of size per day
+        self.missed = np.zeros(len(self.ids), dtype=int) # Days in a row the track wasn't found
+
+    def predict(self):
+        """Returns (positions, sizes) expected on the next day, assuming the motion and growth of the last days continue"""
+        return self.pos + self.vel, np.maximum(self.size + self.growth, 0)
+
+    def link(self, points, gate):
+        """
+        Links the shapes of the next day to the tracks.
+        Args:
+          points: Numpy array of (x, y, size) rows of the next day, see shapePoints()
+          gate: Maximum distance in pixels between a predicted position and a shape linked to it.
+        Returns:
+          (new TrackState, {track id : (row of points, distance to the predicted position)})
+        """
+        pos, size = self.predict()
+        alive = self.missed <= MAX_MISSED
+        dists = np.hypot(pos[:, None, 0] - points[None, :, 0], pos[:, None, 1] - points[None, :, 1])
+        if len(points) and alive.any():
+            # Motion shared by all tracks (Ex. drift the registration missed) is the median offset to the nearest shapes
+            shift = np.median(points[dists.argmin(axis=1), :2][alive] - pos[alive], axis=0)
+            pos = pos + shift
+            dists = np.hypot(pos[:, None, 0] - points[None, :, 0], pos[:, None, 1] - points[None, :, 1])
+        cost = dists + SIZE_WEIGHT * np.abs(size[:, None] - points[None, :, 2])
+        cost[(dists > gate) | ~alive[:, None]] = np.inf
+        rows, cols = assign(cost)
+
+        state = TrackState.__new__(TrackState)
+        state.ids = self.ids
+        state.pos, state.size = pos, size # Tracks that weren't found coast on their prediction
+        state.vel, state.growth = self.vel.copy(), self.growth.copy()
+        state.missed = self.missed + 1
+        # Found tracks move to their shape and correct their motion by part of the prediction error
+        state.vel[rows] += MOTION_GAIN * (points[cols, :2] - pos[rows])
+        state.growth[rows] += MOTION_GAIN * (points[cols, 2] - size[rows])
+        state.pos[rows], state.size[rows] = points[cols, :2], points[cols, 2]
+        state.missed[rows] = 0
+        return state, {self.ids[r]: (int(c), float(dists[r, c])) for r, c in zip(rows, cols)}
+
+class TrackChain:
+    """
+    Tracks from the base day in one direction in time. The state after every day is kept, so when days are added
+    (Ex. in live mode) or a day changes, only the days from the first new or changed one on are linked again.
+    """
+    def __init__(self):
+        self.keys = [] # Key of the base day followed by the key of every linked day
+        self.states = [] # TrackState after every day in keys
+        self.links = [] # Links of every day in keys, None for the base day
+
+    def update(self, seed, days):
+        """
+        Args:
+          seed: (key, track ids, points) of the base day, see shapePoints()
+          days: List of (key, points, gate) of the days to link, in the order they're linked. Keys must change whenever
+            the points or gate do.
+        Returns:
+          List of the links of every day, see TrackState.link()
+        """
+        keys = [seed[0]] + [key for key, _, _ in days]
+        same = 0
+        while same < min(len(keys), len(self.keys)) and keys[same] == self.keys[same]:
+            same = same + 1
+        if same == len(keys):
+            return self.links[1:same] # Already linked, Ex. days after these were linked before
+        if same == 0:
+            self.keys, self.states, self.links = [seed[0]], [TrackState(seed[1], seed[2])], [None]
+            same = 1
+        del self.keys[same:], self.states[same:], self.links[same:]
+        for key, points, gate in days[same - 1:]:
+            state, links = self.states[-1].link(points, gate)
+            self.keys.append(key)
+            self.states.append(state)
+            self.links.append(links)
+        return self.links[1:len(keys)]
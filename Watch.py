@@ -0,0 +1,62 @@
+from PyQt5 import QtCore
+
+import os
+
+
+class FolderWatcher(QtCore.QObject):
+    """
+    Watches experiment folders for new images. Changes are debounced, as microscopes write several files at once,
+    and files are only reported once their size stops changing between two checks.
+    """
+    filesReady = QtCore.pyqtSignal() # Emitted when new files may be ready to be loaded
+
+    def __init__(self, msDelay=2000, parent=None):
+        super(FolderWatcher, self).__init__(parent)
+        self.watcher = QtCore.QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self.changed)
+
+        self.debounce = QtCore.QTimer(self)
+        self.debounce.setInterval(msDelay)
+        self.debounce.setSingleShot(True)
+        self.debounce.timeout.connect(self.filesReady.emit)
+
+        self.sizes = {} # Map of {file path : size at the last check} of files that weren't ready yet
+
+    def setFolders(self, folders):
+        """Watches exactly the given folders, new day folders are added by calling this again"""
+        current = set(self.watcher.directories())
+        folders = set(folder for folder in folders if os.path.isdir(folder))
+        if current - folders:
+            self.watcher.removePaths(list(current - folders))
+        if folders - current:
+            self.watcher.addPaths(list(folders - current))
+
+    def changed(self, _path=None):
+        """Called when a watched folder changes. Restarts the delay before new files are checked."""
+        self.debounce.start()
+
+    def isStable(self, path):
+        """
+        Args:
+          path: Path of a new file.
+        Returns:
+          True if the file size didn't change since the last check. Otherwise another check is scheduled.
+        """
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return False
+        previous = self.sizes.get(path)
+        self.sizes[path] = size
+        if previous == size and size > 0:
+            del self.sizes[path]
+            return True
+        self.debounce.start()
+        return False
+
+    def stop(self):
+        """Stops watching all folders"""
+        self.debounce.stop()
+        if self.watcher.directories():
+            self.watcher.removePaths(self.watcher.directories())
+        self.sizes = {}
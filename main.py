@@ -1,3 +1,8 @@
+import time
+STARTUP = [("start", time.perf_counter())] # (stage, time stage ended), printed once the window is shown
+
+import hashlib
+import io
 import os
 import re
 import sys
@@ -8,8 +13,61 @@ from PyQt5.QtWidgets import QApplication
 
 from ImageViewer import ImageViewer
 from qrangeslider import QRangeSlider
+from OptionsDialog import OptionsDialog
+from ColumnarExport import LIBRARIES, isAvailable
+from Export import IMAGE_OPTIONS
+from MemoryBudget import budget, DEFAULT_LIMIT_MB
+STARTUP.append(("imports", time.perf_counter()))
+
+UI_FILE = "main.ui" # Designed in Qt Designer
+UI_MODULE = "main_ui.py" # UI_FILE compiled to Python, so the XML isn't parsed on every launch
+
+def uiHash(path=UI_FILE):
+    """Returns the SHA-1 hex digest of a UI file, or None if it doesn't exist"""
+    try:
+        with open(path, "rb") as file:
+            return hashlib.sha1(file.read()).hexdigest()
+    except OSError:
+        return None
+
+def compileUi(path=UI_FILE, module=UI_MODULE):
+    """
+    Compiles a UI file to a Python module, with the hash of the UI file written at the top as UI_HASH.
+    Args:
+      path: (Default value = UI_FILE) Path of the UI file.
+      module: (Default value = UI_MODULE) Path of the Python module to write.
+    """
+    code = io.StringIO()
+    uic.compileUi(path, code)
+    with open(module, "w") as file:
+        file.write("UI_HASH = {!r} # SHA-1 of {}, regenerated by main.compileUi() when it changes\n".format(uiHash(path), os.path.basename(path)))
+        file.write(code.getvalue())
+
+def loadUi():
+    """
+    Returns:
+      (UI class, source) The class of the compiled UI module, or of the UI file if the module is missing or older than it.
+      A stale module is regenerated for the next launch when the folder is writable.
+    """
+    current = uiHash()
+    try:
+        import main_ui
+        if current is None or main_ui.UI_HASH == current:
+            return main_ui.Ui_MainWindow, UI_MODULE
+    except (ImportError, AttributeError):
+        pass
+    ui = uic.loadUiType(UI_FILE)[0]
+    try:
+        compileUi()
+    except OSError:
+        pass # Read only install, keep parsing the UI file
+    return ui, UI_FILE
 
-gui = uic.loadUiType("main.ui")[0] # Load UI file designed in Qt Designer
+gui, uiSource = loadUi()
+STARTUP.append(("UI from " + uiSource, time.perf_counter()))
+
+PREVIEW_DELAY_MS = 30 # Delay of the low resolution preview, merges the many value changes of a slider drag
+MIN_DEBOUNCE_MS, MAX_DEBOUNCE_MS = 150, 1500 # Limits of the adaptive delay before full resolution detection
 
 class MainWindow(QtWidgets.QMainWindow, gui):
     """Main window and thread."""
@@ -18,12 +76,16 @@ class MainWindow(QtWidgets.QMainWindow, gui):
         self.setupUi(self)
         self.setTaskbarIcon()
 
+        self.options = dict(IMAGE_OPTIONS, memoryBudget=DEFAULT_LIMIT_MB, # Application options, edited through Tools > Options
+                            bfBackend="contour", trBackend="contour") # Detection backends, see Detection.BACKENDS
+
         imageLabels = (self.qlabel_img_bf, self.qlabel_img_tr)
         self.imageViewer = ImageViewer(imageLabels, self)
 
         self.__connectEvents()
         self.initDrawDebounce()
         self.showMaximized()
+        QTimer.singleShot(0, self.initMemoryStatus) # Not needed for the first paint
 
     def __connectEvents(self):
         """Connects all UI objects to appropriate functions in code"""
@@ -43,6 +105,7 @@ class MainWindow(QtWidgets.QMainWindow, gui):
         # Checkbox for Fitting Circles and threshold box
         self.checkBox.stateChanged.connect(self.checkBoxTick)
         self.threshold_box.valueChanged.connect(self.imageViewer.changeThreshold)
+        self.threshold_slider.valueChanged.connect(self.imageViewer.updateThresholdPreview) # Not debounced, see updateThresholdPreview
 
         # Radius sliders and boxes
         self.radius_slider.startValueChanged.connect(self.minRadius_box.setValue)
@@ -62,11 +125,28 @@ class MainWindow(QtWidgets.QMainWindow, gui):
         self.menu_all_excel.triggered.connect(self.imageViewer.exportAllExcel)
         self.menu_single_excel.triggered.connect(self.imageViewer.exportSingleExcel)
         self.menu_all_img.triggered.connect(self.imageViewer.exportAllImages)
+        self.menu_save_session.triggered.connect(self.imageViewer.saveSession)
         self.menu_single_img.triggered.connect(self.imageViewer.exportSingleImage)
 
         self.menu_redraw.triggered.connect(self.imageViewer.loadImage)
         self.menu_recalculate.triggered.connect(self.imageViewer.recalculate)
         self.menu_reset_pan.triggered.connect(self.imageViewer.resetZoom)
+        self.menu_redetect_region.toggled.connect(self.imageViewer.setRegionMode)
+        self.menu_threshold_preview.toggled.connect(self.imageViewer.setThresholdPreview)
+        self.menu_crop_sensors.toggled.connect(self.imageViewer.setCropSensors)
+        self.menu_options.triggered.connect(self.openOptions)
+        self.menu_best_focus.triggered.connect(self.imageViewer.goToBestFocus)
+        self.menu_focus_stack.triggered.connect(self.imageViewer.analyzeFocusStack)
+        self.menu_watch.toggled.connect(self.imageViewer.setWatchMode)
+        self.menu_sweep.triggered.connect(self.imageViewer.sweepParameters)
+
+        # Columnar formats written beside the Excel workbook when exporting all data
+        self.tidyFormatActions = {"csv": self.menu_tidy_csv, "parquet": self.menu_tidy_parquet,
+                                  "feather": self.menu_tidy_feather, "hdf5": self.menu_tidy_hdf5}
+        for format_, action in self.tidyFormatActions.items():
+            if not isAvailable(format_):
+                action.setEnabled(False)
+                action.setText("{} - requires {}".format(action.text(), LIBRARIES[format_]))
 
     def startPbar(self, max_):
         """
@@ -94,11 +174,18 @@ class MainWindow(QtWidgets.QMainWindow, gui):
         Initializes the draw debounce objects and attributes, i.e. the delay between changing a 
         threshold/range value and the program recalculating the image shapes.
         Args:
-          msDelay: (Default value = 1000) Delay in milliseconds
+          msDelay: (Default value = 1000) Initial delay in milliseconds, adapted to the detection time afterwards
         """
         self.debounce = QTimer()
         self.debounce.setInterval(msDelay)
         self.debounce.setSingleShot(True)
+        self.detectSeconds = None # Moving average of the full resolution detection time, see adaptDebounce
+
+        # While a control moves, shapes are previewed on a downsampled image
+        self.previewTimer = QTimer()
+        self.previewTimer.setInterval(PREVIEW_DELAY_MS)
+        self.previewTimer.setSingleShot(True)
+        self.previewTimer.timeout.connect(self.imageViewer.previewShapes)
 
         self.enableDebounce()
 
@@ -109,12 +196,30 @@ class MainWindow(QtWidgets.QMainWindow, gui):
         self.threshold_box.valueChanged.disconnect(self.debounce.start) 
         self.minRadius_box.valueChanged.disconnect(self.debounce.start)
         self.maxRadius_box.valueChanged.disconnect(self.debounce.start)
+        for box in (self.threshold_box, self.minRadius_box, self.maxRadius_box):
+            box.valueChanged.disconnect(self.previewTimer.start)
 
     def enableDebounce(self):
         """Enables changing threshold/radius values calculating new shapes of image"""
         self.threshold_box.valueChanged.connect(self.debounce.start) 
         self.minRadius_box.valueChanged.connect(self.debounce.start)
         self.maxRadius_box.valueChanged.connect(self.debounce.start)
+        for box in (self.threshold_box, self.minRadius_box, self.maxRadius_box):
+            box.valueChanged.connect(self.previewTimer.start)
+
+    def adaptDebounce(self, seconds):
+        """
+        Sets the debounce delay from the measured time of full resolution detection. Fast images are recalculated soon
+        after the controls settle, slow ones wait longer so a moving control doesn't queue up detections.
+        The low resolution preview is shown in the meantime.
+        Args:
+          seconds: Time the last full resolution detection took
+        """
+        if self.detectSeconds is None:
+            self.detectSeconds = seconds
+        else:
+            self.detectSeconds = 0.7 * self.detectSeconds + 0.3 * seconds
+        self.debounce.setInterval(int(min(max(3000 * self.detectSeconds, MIN_DEBOUNCE_MS), MAX_DEBOUNCE_MS)))
 
     def checkBoxTick(self, isChecked):
         """
@@ -134,6 +239,23 @@ class MainWindow(QtWidgets.QMainWindow, gui):
         except:
             pass
 
+    def initMemoryStatus(self):
+        """Shows the memory budget usage in the status bar, updated every second"""
+        self.memoryLabel = QtWidgets.QLabel(budget.describe())
+        self.statusbar.addPermanentWidget(self.memoryLabel)
+        self.memoryTimer = QTimer(self)
+        self.memoryTimer.timeout.connect(lambda: self.memoryLabel.setText(budget.describe()))
+        self.memoryTimer.start(1000)
+
+    def openOptions(self):
+        """Opens the options dialog and saves the options if accepted"""
+        dialog = OptionsDialog(self.options, self)
+        if dialog.exec_() == QtWidgets.QDialog.Accepted:
+            self.options.update(dialog.values())
+            budget.setLimit(self.options["memoryBudget"])
+            self.imageViewer.bfImages.backend = self.options["bfBackend"]
+            self.imageViewer.trImages.backend = self.options["trBackend"]
+
     def setTaskbarIcon(self):
         """Sets taskbar icon to camera"""
         if sys.platform == "win32":
@@ -141,6 +263,12 @@ class MainWindow(QtWidgets.QMainWindow, gui):
             appid = 'cmed Image Analysis.1.00' # arbitrary string
             ctypes.windll.shell32.SetCurrentProcessExplicitAppUserModelID(appid)
 
+    def closeEvent(self, event):
+        """Called when the window is closed. Saves the session so detection doesn't need to be rerun."""
+        self.imageViewer.saveSession()
+        self.imageViewer.removeFocusStacks()
+        event.accept()
+
     def wheelEvent(self, event):
         """Called when scrollwheel is used. Used for zooming in and out with wheel."""
         modifiers = QtWidgets.QApplication.keyboardModifiers()
@@ -167,8 +295,17 @@ def main():
     app = QtWidgets.QApplication(sys.argv)
     app.setStyle(QtWidgets.QStyleFactory.create("Cleanlooks"))
     app.setPalette(QtWidgets.QApplication.style().standardPalette())
+    STARTUP.append(("application", time.perf_counter()))
     parentWindow = MainWindow(None)
+    STARTUP.append(("main window", time.perf_counter()))
+    QTimer.singleShot(0, printStartup) # Runs once the window is first shown
     sys.exit(app.exec_())
 
+def printStartup():
+    """Prints the time taken by every startup stage and in total"""
+    STARTUP.append(("first paint", time.perf_counter()))
+    stages = ", ".join("{} {:.0f} ms".format(stage, 1000 * (end - start)) for (_, start), (stage, end) in zip(STARTUP, STARTUP[1:]))
+    print("Startup: {} (total {:.0f} ms)".format(stages, 1000 * (STARTUP[-1][1] - STARTUP[0][1])))
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,539 @@
+UI_HASH = '3e3db6073b45d200259e8d6db11c33bd2b90ad6d' # SHA-1 of main.ui, regenerated by main.compileUi() when it changes
+# -*- coding: utf-8 -*-
+
+# Form implementation generated from reading ui file 'main.ui'
+#
+# Created by: PyQt5 UI code generator 5.15.11
+#
+# WARNING: Any manual changes made to this file will be lost when pyuic5 is
+# run again.  Do not edit this file unless you know what you are doing.
+
+
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+
+class Ui_MainWindow(object):
+    def setupUi(self, MainWindow):
+        MainWindow.setObjectName("MainWindow")
+        MainWindow.resize(1167, 742)
+        icon = QtGui.QIcon()
+        icon.addPixmap(QtGui.QPixmap("assets/icons/app_icon.png"), QtGui.QIcon.Normal, QtGui.QIcon.Off)
+        MainWindow.setWindowIcon(icon)
+        MainWindow.setStyleSheet("")
+        self.centralwidget = QtWidgets.QWidget(MainWindow)
+        sizePolicy = QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Expanding)
+        sizePolicy.setHorizontalStretch(0)
+        sizePolicy.setVerticalStretch(0)
+        sizePolicy.setHeightForWidth(self.centralwidget.sizePolicy().hasHeightForWidth())
+        self.centralwidget.setSizePolicy(sizePolicy)
+        self.centralwidget.setObjectName("centralwidget")
+        self.gridLayout = QtWidgets.QGridLayout(self.centralwidget)
+        self.gridLayout.setObjectName("gridLayout")
+        self.horizontalLayout_3 = QtWidgets.QHBoxLayout()
+        self.horizontalLayout_3.setSpacing(1)
+        self.horizontalLayout_3.setObjectName("horizontalLayout_3")
+        self.toggle_move = QtWidgets.QToolButton(self.centralwidget)
+        self.toggle_move.setCursor(QtGui.QCursor(QtCore.Qt.PointingHandCursor))
+        self.toggle_move.setAutoFillBackground(False)
+        self.toggle_move.setStyleSheet("")
+        icon1 = QtGui.QIcon()
+        icon1.addPixmap(QtGui.QPixmap("assets/icons/move.png"), QtGui.QIcon.Normal, QtGui.QIcon.Off)
+        self.toggle_move.setIcon(icon1)
+        self.toggle_move.setIconSize(QtCore.QSize(20, 20))
+        self.toggle_move.setCheckable(True)
+        self.toggle_move.setChecked(True)
+        self.toggle_move.setToolButtonStyle(QtCore.Qt.ToolButtonIconOnly)
+        self.toggle_move.setAutoRaise(False)
+        self.toggle_move.setObjectName("toggle_move")
+        self.buttonGroup = QtWidgets.QButtonGroup(MainWindow)
+        self.buttonGroup.setObjectName("buttonGroup")
+        self.buttonGroup.addButton(self.toggle_move)
+        self.horizontalLayout_3.addWidget(self.toggle_move)
+        self.line_4 = QtWidgets.QFrame(self.centralwidget)
+        self.line_4.setFrameShadow(QtWidgets.QFrame.Plain)
+        self.line_4.setFrameShape(QtWidgets.QFrame.VLine)
+        self.line_4.setObjectName("line_4")
+        self.horizontalLayout_3.addWidget(self.line_4)
+        self.prev_im = QtWidgets.QToolButton(self.centralwidget)
+        self.prev_im.setCursor(QtGui.QCursor(QtCore.Qt.PointingHandCursor))
+        icon2 = QtGui.QIcon()
+        icon2.addPixmap(QtGui.QPixmap("assets/icons/arrow-left.png"), QtGui.QIcon.Normal, QtGui.QIcon.Off)
+        self.prev_im.setIcon(icon2)
+        self.prev_im.setIconSize(QtCore.QSize(20, 20))
+        self.prev_im.setObjectName("prev_im")
+        self.horizontalLayout_3.addWidget(self.prev_im)
+        self.next_im = QtWidgets.QToolButton(self.centralwidget)
+        self.next_im.setCursor(QtGui.QCursor(QtCore.Qt.PointingHandCursor))
+        icon3 = QtGui.QIcon()
+        icon3.addPixmap(QtGui.QPixmap("assets/icons/arrow-right.png"), QtGui.QIcon.Normal, QtGui.QIcon.Off)
+        self.next_im.setIcon(icon3)
+        self.next_im.setIconSize(QtCore.QSize(20, 20))
+        self.next_im.setObjectName("next_im")
+        self.horizontalLayout_3.addWidget(self.next_im)
+        self.line_5 = QtWidgets.QFrame(self.centralwidget)
+        self.line_5.setFrameShadow(QtWidgets.QFrame.Plain)
+        self.line_5.setFrameShape(QtWidgets.QFrame.VLine)
+        self.line_5.setObjectName("line_5")
+        self.horizontalLayout_3.addWidget(self.line_5)
+        self.zoom_plus = QtWidgets.QToolButton(self.centralwidget)
+        self.zoom_plus.setCursor(QtGui.QCursor(QtCore.Qt.PointingHandCursor))
+        icon4 = QtGui.QIcon()
+        icon4.addPixmap(QtGui.QPixmap("assets/icons/zoom-in.png"), QtGui.QIcon.Normal, QtGui.QIcon.Off)
+        self.zoom_plus.setIcon(icon4)
+        self.zoom_plus.setIconSize(QtCore.QSize(20, 20))
+        self.zoom_plus.setObjectName("zoom_plus")
+        self.horizontalLayout_3.addWidget(self.zoom_plus)
+        self.reset_zoom = QtWidgets.QToolButton(self.centralwidget)
+        self.reset_zoom.setCursor(QtGui.QCursor(QtCore.Qt.PointingHandCursor))
+        icon5 = QtGui.QIcon()
+        icon5.addPixmap(QtGui.QPixmap("assets/icons/enlarge2.png"), QtGui.QIcon.Normal, QtGui.QIcon.Off)
+        self.reset_zoom.setIcon(icon5)
+        self.reset_zoom.setIconSize(QtCore.QSize(20, 20))
+        self.reset_zoom.setObjectName("reset_zoom")
+        self.horizontalLayout_3.addWidget(self.reset_zoom)
+        self.zoom_minus = QtWidgets.QToolButton(self.centralwidget)
+        self.zoom_minus.setCursor(QtGui.QCursor(QtCore.Qt.PointingHandCursor))
+        icon6 = QtGui.QIcon()
+        icon6.addPixmap(QtGui.QPixmap("assets/icons/zoom-out.png"), QtGui.QIcon.Normal, QtGui.QIcon.Off)
+        self.zoom_minus.setIcon(icon6)
+        self.zoom_minus.setIconSize(QtCore.QSize(20, 20))
+        self.zoom_minus.setObjectName("zoom_minus")
+        self.horizontalLayout_3.addWidget(self.zoom_minus)
+        self.line_6 = QtWidgets.QFrame(self.centralwidget)
+        self.line_6.setFrameShadow(QtWidgets.QFrame.Plain)
+        self.line_6.setFrameShape(QtWidgets.QFrame.VLine)
+        self.line_6.setObjectName("line_6")
+        self.horizontalLayout_3.addWidget(self.line_6)
+        self.calculate = QtWidgets.QToolButton(self.centralwidget)
+        self.calculate.setCursor(QtGui.QCursor(QtCore.Qt.PointingHandCursor))
+        icon7 = QtGui.QIcon()
+        icon7.addPixmap(QtGui.QPixmap("assets/icons/calculate.png"), QtGui.QIcon.Normal, QtGui.QIcon.Off)
+        self.calculate.setIcon(icon7)
+        self.calculate.setIconSize(QtCore.QSize(20, 20))
+        self.calculate.setObjectName("calculate")
+        self.horizontalLayout_3.addWidget(self.calculate)
+        self.draw = QtWidgets.QToolButton(self.centralwidget)
+        self.draw.setCursor(QtGui.QCursor(QtCore.Qt.PointingHandCursor))
+        icon8 = QtGui.QIcon()
+        icon8.addPixmap(QtGui.QPixmap("assets/icons/draw.png"), QtGui.QIcon.Normal, QtGui.QIcon.Off)
+        self.draw.setIcon(icon8)
+        self.draw.setIconSize(QtCore.QSize(20, 20))
+        self.draw.setObjectName("draw")
+        self.horizontalLayout_3.addWidget(self.draw)
+        self.set_base = QtWidgets.QToolButton(self.centralwidget)
+        self.set_base.setCursor(QtGui.QCursor(QtCore.Qt.PointingHandCursor))
+        icon9 = QtGui.QIcon()
+        icon9.addPixmap(QtGui.QPixmap("assets/icons/set_base.png"), QtGui.QIcon.Normal, QtGui.QIcon.Off)
+        self.set_base.setIcon(icon9)
+        self.set_base.setIconSize(QtCore.QSize(20, 20))
+        self.set_base.setObjectName("set_base")
+        self.horizontalLayout_3.addWidget(self.set_base)
+        self.clear_base = QtWidgets.QToolButton(self.centralwidget)
+        self.clear_base.setCursor(QtGui.QCursor(QtCore.Qt.PointingHandCursor))
+        self.clear_base.setToolTip("Clear Base Image")
+        icon10 = QtGui.QIcon()
+        icon10.addPixmap(QtGui.QPixmap("assets/icons/clear_base.png"), QtGui.QIcon.Normal, QtGui.QIcon.Off)
+        self.clear_base.setIcon(icon10)
+        self.clear_base.setIconSize(QtCore.QSize(20, 20))
+        self.clear_base.setObjectName("clear_base")
+        self.horizontalLayout_3.addWidget(self.clear_base)
+        self.gridLayout.addLayout(self.horizontalLayout_3, 2, 0, 1, 1)
+        self.checkBox = QtWidgets.QCheckBox(self.centralwidget)
+        self.checkBox.setToolTip("")
+        self.checkBox.setToolTipDuration(3)
+        self.checkBox.setObjectName("checkBox")
+        self.gridLayout.addWidget(self.checkBox, 2, 1, 1, 1)
+        self.tabWidget = QtWidgets.QTabWidget(self.centralwidget)
+        sizePolicy = QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Expanding)
+        sizePolicy.setHorizontalStretch(1)
+        sizePolicy.setVerticalStretch(0)
+        sizePolicy.setHeightForWidth(self.tabWidget.sizePolicy().hasHeightForWidth())
+        self.tabWidget.setSizePolicy(sizePolicy)
+        self.tabWidget.setObjectName("tabWidget")
+        self.bf = QtWidgets.QWidget()
+        sizePolicy = QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Preferred, QtWidgets.QSizePolicy.Preferred)
+        sizePolicy.setHorizontalStretch(0)
+        sizePolicy.setVerticalStretch(0)
+        sizePolicy.setHeightForWidth(self.bf.sizePolicy().hasHeightForWidth())
+        self.bf.setSizePolicy(sizePolicy)
+        self.bf.setObjectName("bf")
+        self.horizontalLayout = QtWidgets.QHBoxLayout(self.bf)
+        self.horizontalLayout.setObjectName("horizontalLayout")
+        self.qlabel_img_bf = QtWidgets.QLabel(self.bf)
+        sizePolicy = QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Expanding)
+        sizePolicy.setHorizontalStretch(0)
+        sizePolicy.setVerticalStretch(0)
+        sizePolicy.setHeightForWidth(self.qlabel_img_bf.sizePolicy().hasHeightForWidth())
+        self.qlabel_img_bf.setSizePolicy(sizePolicy)
+        self.qlabel_img_bf.setStyleSheet("background-color:white\n"
+"")
+        self.qlabel_img_bf.setFrameShape(QtWidgets.QFrame.Box)
+        self.qlabel_img_bf.setFrameShadow(QtWidgets.QFrame.Plain)
+        self.qlabel_img_bf.setLineWidth(1)
+        self.qlabel_img_bf.setMidLineWidth(0)
+        self.qlabel_img_bf.setText("")
+        self.qlabel_img_bf.setObjectName("qlabel_img_bf")
+        self.horizontalLayout.addWidget(self.qlabel_img_bf)
+        self.tabWidget.addTab(self.bf, "")
+        self.tr = QtWidgets.QWidget()
+        self.tr.setObjectName("tr")
+        self.horizontalLayout_2 = QtWidgets.QHBoxLayout(self.tr)
+        self.horizontalLayout_2.setObjectName("horizontalLayout_2")
+        self.qlabel_img_tr = QtWidgets.QLabel(self.tr)
+        sizePolicy = QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Expanding)
+        sizePolicy.setHorizontalStretch(0)
+        sizePolicy.setVerticalStretch(0)
+        sizePolicy.setHeightForWidth(self.qlabel_img_tr.sizePolicy().hasHeightForWidth())
+        self.qlabel_img_tr.setSizePolicy(sizePolicy)
+        self.qlabel_img_tr.setStyleSheet("background-color:white\n"
+"")
+        self.qlabel_img_tr.setFrameShape(QtWidgets.QFrame.Box)
+        self.qlabel_img_tr.setFrameShadow(QtWidgets.QFrame.Plain)
+        self.qlabel_img_tr.setLineWidth(1)
+        self.qlabel_img_tr.setMidLineWidth(0)
+        self.qlabel_img_tr.setText("")
+        self.qlabel_img_tr.setObjectName("qlabel_img_tr")
+        self.horizontalLayout_2.addWidget(self.qlabel_img_tr)
+        self.tabWidget.addTab(self.tr, "")
+        self.gridLayout.addWidget(self.tabWidget, 0, 0, 1, 1)
+        self.gridLayout_2 = QtWidgets.QGridLayout()
+        self.gridLayout_2.setSizeConstraint(QtWidgets.QLayout.SetDefaultConstraint)
+        self.gridLayout_2.setObjectName("gridLayout_2")
+        self.open_folder = QtWidgets.QPushButton(self.centralwidget)
+        sizePolicy = QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Preferred, QtWidgets.QSizePolicy.Fixed)
+        sizePolicy.setHorizontalStretch(0)
+        sizePolicy.setVerticalStretch(0)
+        sizePolicy.setHeightForWidth(self.open_folder.sizePolicy().hasHeightForWidth())
+        self.open_folder.setSizePolicy(sizePolicy)
+        font = QtGui.QFont()
+        font.setPointSize(9)
+        self.open_folder.setFont(font)
+        self.open_folder.setCursor(QtGui.QCursor(QtCore.Qt.PointingHandCursor))
+        self.open_folder.setFocusPolicy(QtCore.Qt.StrongFocus)
+        self.open_folder.setAutoFillBackground(False)
+        self.open_folder.setStyleSheet("background-color: black; /* Blue */\n"
+"padding:10px;\n"
+"color:white;")
+        self.open_folder.setAutoDefault(False)
+        self.open_folder.setDefault(False)
+        self.open_folder.setFlat(False)
+        self.open_folder.setObjectName("open_folder")
+        self.gridLayout_2.addWidget(self.open_folder, 0, 0, 1, 1)
+        self.list_items_label = QtWidgets.QLabel(self.centralwidget)
+        font = QtGui.QFont()
+        font.setFamily("Sans Serif")
+        font.setPointSize(10)
+        font.setBold(False)
+        font.setWeight(50)
+        font.setKerning(True)
+        self.list_items_label.setFont(font)
+        self.list_items_label.setLayoutDirection(QtCore.Qt.LeftToRight)
+        self.list_items_label.setStyleSheet("background-color:white")
+        self.list_items_label.setFrameShape(QtWidgets.QFrame.Box)
+        self.list_items_label.setFrameShadow(QtWidgets.QFrame.Sunken)
+        self.list_items_label.setLineWidth(1)
+        self.list_items_label.setTextFormat(QtCore.Qt.AutoText)
+        self.list_items_label.setAlignment(QtCore.Qt.AlignCenter)
+        self.list_items_label.setIndent(-1)
+        self.list_items_label.setObjectName("list_items_label")
+        self.gridLayout_2.addWidget(self.list_items_label, 1, 0, 1, 1)
+        self.qlist_images = QtWidgets.QListWidget(self.centralwidget)
+        self.qlist_images.setEnabled(True)
+        sizePolicy = QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Expanding)
+        sizePolicy.setHorizontalStretch(0)
+        sizePolicy.setVerticalStretch(0)
+        sizePolicy.setHeightForWidth(self.qlist_images.sizePolicy().hasHeightForWidth())
+        self.qlist_images.setSizePolicy(sizePolicy)
+        self.qlist_images.setStyleSheet("background-color:white")
+        self.qlist_images.setFrameShape(QtWidgets.QFrame.Box)
+        self.qlist_images.setFrameShadow(QtWidgets.QFrame.Plain)
+        self.qlist_images.setLayoutMode(QtWidgets.QListView.Batched)
+        self.qlist_images.setBatchSize(20)
+        self.qlist_images.setObjectName("qlist_images")
+        self.gridLayout_2.addWidget(self.qlist_images, 2, 0, 1, 1)
+        self.horizontalLayout_8 = QtWidgets.QHBoxLayout()
+        self.horizontalLayout_8.setObjectName("horizontalLayout_8")
+        self.threshold_label = QtWidgets.QLabel(self.centralwidget)
+        sizePolicy = QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Preferred, QtWidgets.QSizePolicy.Preferred)
+        sizePolicy.setHorizontalStretch(0)
+        sizePolicy.setVerticalStretch(0)
+        sizePolicy.setHeightForWidth(self.threshold_label.sizePolicy().hasHeightForWidth())
+        self.threshold_label.setSizePolicy(sizePolicy)
+        self.threshold_label.setObjectName("threshold_label")
+        self.horizontalLayout_8.addWidget(self.threshold_label)
+        self.threshold_box = QtWidgets.QSpinBox(self.centralwidget)
+        self.threshold_box.setMaximum(250)
+        self.threshold_box.setSingleStep(5)
+        self.threshold_box.setProperty("value", 50)
+        self.threshold_box.setObjectName("threshold_box")
+        self.horizontalLayout_8.addWidget(self.threshold_box)
+        self.gridLayout_2.addLayout(self.horizontalLayout_8, 3, 0, 1, 1)
+        self.horizontalLayout_7 = QtWidgets.QHBoxLayout()
+        self.horizontalLayout_7.setObjectName("horizontalLayout_7")
+        self.minThreshold_label = QtWidgets.QLabel(self.centralwidget)
+        sizePolicy = QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Fixed, QtWidgets.QSizePolicy.Preferred)
+        sizePolicy.setHorizontalStretch(0)
+        sizePolicy.setVerticalStretch(0)
+        sizePolicy.setHeightForWidth(self.minThreshold_label.sizePolicy().hasHeightForWidth())
+        self.minThreshold_label.setSizePolicy(sizePolicy)
+        self.minThreshold_label.setObjectName("minThreshold_label")
+        self.horizontalLayout_7.addWidget(self.minThreshold_label)
+        self.threshold_slider = QtWidgets.QSlider(self.centralwidget)
+        sizePolicy = QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Fixed)
+        sizePolicy.setHorizontalStretch(0)
+        sizePolicy.setVerticalStretch(0)
+        sizePolicy.setHeightForWidth(self.threshold_slider.sizePolicy().hasHeightForWidth())
+        self.threshold_slider.setSizePolicy(sizePolicy)
+        self.threshold_slider.setMaximum(200)
+        self.threshold_slider.setProperty("value", 50)
+        self.threshold_slider.setOrientation(QtCore.Qt.Horizontal)
+        self.threshold_slider.setObjectName("threshold_slider")
+        self.horizontalLayout_7.addWidget(self.threshold_slider)
+        self.maxThreshold_label = QtWidgets.QLabel(self.centralwidget)
+        self.maxThreshold_label.setObjectName("maxThreshold_label")
+        self.horizontalLayout_7.addWidget(self.maxThreshold_label)
+        self.gridLayout_2.addLayout(self.horizontalLayout_7, 4, 0, 1, 1)
+        self.horizontalLayout_6 = QtWidgets.QHBoxLayout()
+        self.horizontalLayout_6.setObjectName("horizontalLayout_6")
+        self.radius_label = QtWidgets.QLabel(self.centralwidget)
+        sizePolicy = QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Fixed, QtWidgets.QSizePolicy.Preferred)
+        sizePolicy.setHorizontalStretch(0)
+        sizePolicy.setVerticalStretch(0)
+        sizePolicy.setHeightForWidth(self.radius_label.sizePolicy().hasHeightForWidth())
+        self.radius_label.setSizePolicy(sizePolicy)
+        self.radius_label.setObjectName("radius_label")
+        self.horizontalLayout_6.addWidget(self.radius_label)
+        self.minRadius_box = QtWidgets.QSpinBox(self.centralwidget)
+        self.minRadius_box.setMaximum(1000)
+        self.minRadius_box.setSingleStep(5)
+        self.minRadius_box.setProperty("value", 0)
+        self.minRadius_box.setObjectName("minRadius_box")
+        self.horizontalLayout_6.addWidget(self.minRadius_box)
+        self.to_label = QtWidgets.QLabel(self.centralwidget)
+        sizePolicy = QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Fixed, QtWidgets.QSizePolicy.Preferred)
+        sizePolicy.setHorizontalStretch(0)
+        sizePolicy.setVerticalStretch(0)
+        sizePolicy.setHeightForWidth(self.to_label.sizePolicy().hasHeightForWidth())
+        self.to_label.setSizePolicy(sizePolicy)
+        self.to_label.setObjectName("to_label")
+        self.horizontalLayout_6.addWidget(self.to_label)
+        self.maxRadius_box = QtWidgets.QSpinBox(self.centralwidget)
+        self.maxRadius_box.setMaximum(1000)
+        self.maxRadius_box.setSingleStep(5)
+        self.maxRadius_box.setProperty("value", 1000)
+        self.maxRadius_box.setObjectName("maxRadius_box")
+        self.horizontalLayout_6.addWidget(self.maxRadius_box)
+        self.gridLayout_2.addLayout(self.horizontalLayout_6, 5, 0, 1, 1)
+        self.horizontalLayout_5 = QtWidgets.QHBoxLayout()
+        self.horizontalLayout_5.setObjectName("horizontalLayout_5")
+        self.minRadius_label = QtWidgets.QLabel(self.centralwidget)
+        sizePolicy = QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Fixed, QtWidgets.QSizePolicy.Preferred)
+        sizePolicy.setHorizontalStretch(0)
+        sizePolicy.setVerticalStretch(0)
+        sizePolicy.setHeightForWidth(self.minRadius_label.sizePolicy().hasHeightForWidth())
+        self.minRadius_label.setSizePolicy(sizePolicy)
+        self.minRadius_label.setObjectName("minRadius_label")
+        self.horizontalLayout_5.addWidget(self.minRadius_label)
+        self.radius_slider = QRangeSlider(self.centralwidget)
+        sizePolicy = QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Fixed)
+        sizePolicy.setHorizontalStretch(0)
+        sizePolicy.setVerticalStretch(0)
+        sizePolicy.setHeightForWidth(self.radius_slider.sizePolicy().hasHeightForWidth())
+        self.radius_slider.setSizePolicy(sizePolicy)
+        self.radius_slider.setMaximum(1000)
+        self.radius_slider.setSingleStep(5)
+        self.radius_slider.setOrientation(QtCore.Qt.Horizontal)
+        self.radius_slider.setObjectName("radius_slider")
+        self.horizontalLayout_5.addWidget(self.radius_slider)
+        self.maxRadius_label = QtWidgets.QLabel(self.centralwidget)
+        self.maxRadius_label.setObjectName("maxRadius_label")
+        self.horizontalLayout_5.addWidget(self.maxRadius_label)
+        self.gridLayout_2.addLayout(self.horizontalLayout_5, 6, 0, 1, 1)
+        self.gridLayout.addLayout(self.gridLayout_2, 0, 1, 1, 1)
+        self.progressBar = QtWidgets.QProgressBar(self.centralwidget)
+        self.progressBar.setProperty("value", 0)
+        self.progressBar.setTextVisible(False)
+        self.progressBar.setObjectName("progressBar")
+        self.gridLayout.addWidget(self.progressBar, 3, 0, 1, 1)
+        MainWindow.setCentralWidget(self.centralwidget)
+        self.statusbar = QtWidgets.QStatusBar(MainWindow)
+        self.statusbar.setObjectName("statusbar")
+        MainWindow.setStatusBar(self.statusbar)
+        self.menuBar = QtWidgets.QMenuBar(MainWindow)
+        self.menuBar.setGeometry(QtCore.QRect(0, 0, 1167, 21))
+        self.menuBar.setStyleSheet("")
+        self.menuBar.setObjectName("menuBar")
+        self.menuFile = QtWidgets.QMenu(self.menuBar)
+        self.menuFile.setStyleSheet("QMenuBar::item:selected {    \n"
+"    background-color: rgb(244,164,96);\n"
+"}")
+        self.menuFile.setObjectName("menuFile")
+        self.menuExport_as = QtWidgets.QMenu(self.menuFile)
+        self.menuExport_as.setObjectName("menuExport_as")
+        self.menuSingle = QtWidgets.QMenu(self.menuExport_as)
+        self.menuSingle.setObjectName("menuSingle")
+        self.menuAll = QtWidgets.QMenu(self.menuExport_as)
+        self.menuAll.setObjectName("menuAll")
+        self.menuEdit = QtWidgets.QMenu(self.menuBar)
+        self.menuEdit.setAutoFillBackground(False)
+        self.menuEdit.setStyleSheet("QMenuBar::item:selected {    \n"
+"    background-color: rgb(244,164,96);\n"
+"}")
+        self.menuEdit.setObjectName("menuEdit")
+        self.menuTools = QtWidgets.QMenu(self.menuBar)
+        self.menuTools.setStyleSheet("QMenuBar::item:selected {    \n"
+"    background-color: rgb(244,164,96);\n"
+"}")
+        self.menuTools.setObjectName("menuTools")
+        self.menuZstack = QtWidgets.QMenu(self.menuTools)
+        self.menuZstack.setObjectName("menuZstack")
+        self.menuTidy = QtWidgets.QMenu(self.menuTools)
+        self.menuTidy.setObjectName("menuTidy")
+        MainWindow.setMenuBar(self.menuBar)
+        self.menu_options = QtWidgets.QAction(MainWindow)
+        self.menu_options.setObjectName("menu_options")
+        self.menu_sweep = QtWidgets.QAction(MainWindow)
+        self.menu_sweep.setObjectName("menu_sweep")
+        self.menu_watch = QtWidgets.QAction(MainWindow)
+        self.menu_watch.setCheckable(True)
+        self.menu_watch.setObjectName("menu_watch")
+        self.menu_best_focus = QtWidgets.QAction(MainWindow)
+        self.menu_best_focus.setObjectName("menu_best_focus")
+        self.menu_focus_stack = QtWidgets.QAction(MainWindow)
+        self.menu_focus_stack.setObjectName("menu_focus_stack")
+        self.menu_tidy_csv = QtWidgets.QAction(MainWindow)
+        self.menu_tidy_csv.setCheckable(True)
+        self.menu_tidy_csv.setObjectName("menu_tidy_csv")
+        self.menu_tidy_parquet = QtWidgets.QAction(MainWindow)
+        self.menu_tidy_parquet.setCheckable(True)
+        self.menu_tidy_parquet.setObjectName("menu_tidy_parquet")
+        self.menu_tidy_feather = QtWidgets.QAction(MainWindow)
+        self.menu_tidy_feather.setCheckable(True)
+        self.menu_tidy_feather.setObjectName("menu_tidy_feather")
+        self.menu_tidy_hdf5 = QtWidgets.QAction(MainWindow)
+        self.menu_tidy_hdf5.setCheckable(True)
+        self.menu_tidy_hdf5.setObjectName("menu_tidy_hdf5")
+        self.menu_save_session = QtWidgets.QAction(MainWindow)
+        self.menu_save_session.setObjectName("menu_save_session")
+        self.menu_redraw = QtWidgets.QAction(MainWindow)
+        self.menu_redraw.setObjectName("menu_redraw")
+        self.menu_recalculate = QtWidgets.QAction(MainWindow)
+        self.menu_recalculate.setObjectName("menu_recalculate")
+        self.menu_redetect_region = QtWidgets.QAction(MainWindow)
+        self.menu_redetect_region.setCheckable(True)
+        self.menu_redetect_region.setObjectName("menu_redetect_region")
+        self.menu_threshold_preview = QtWidgets.QAction(MainWindow)
+        self.menu_threshold_preview.setCheckable(True)
+        self.menu_threshold_preview.setObjectName("menu_threshold_preview")
+        self.menu_crop_sensors = QtWidgets.QAction(MainWindow)
+        self.menu_crop_sensors.setCheckable(True)
+        self.menu_crop_sensors.setObjectName("menu_crop_sensors")
+        self.menu_reset_pan = QtWidgets.QAction(MainWindow)
+        self.menu_reset_pan.setObjectName("menu_reset_pan")
+        self.menu_single_excel = QtWidgets.QAction(MainWindow)
+        self.menu_single_excel.setObjectName("menu_single_excel")
+        self.menu_single_img = QtWidgets.QAction(MainWindow)
+        self.menu_single_img.setObjectName("menu_single_img")
+        self.menu_all_excel = QtWidgets.QAction(MainWindow)
+        self.menu_all_excel.setObjectName("menu_all_excel")
+        self.menu_all_img = QtWidgets.QAction(MainWindow)
+        self.menu_all_img.setObjectName("menu_all_img")
+        self.menuSingle.addAction(self.menu_single_excel)
+        self.menuSingle.addAction(self.menu_single_img)
+        self.menuAll.addAction(self.menu_all_excel)
+        self.menuAll.addAction(self.menu_all_img)
+        self.menuExport_as.addAction(self.menuSingle.menuAction())
+        self.menuExport_as.addAction(self.menuAll.menuAction())
+        self.menuFile.addAction(self.menuExport_as.menuAction())
+        self.menuFile.addAction(self.menu_save_session)
+        self.menuEdit.addAction(self.menu_redraw)
+        self.menuEdit.addAction(self.menu_recalculate)
+        self.menuEdit.addAction(self.menu_redetect_region)
+        self.menuEdit.addAction(self.menu_threshold_preview)
+        self.menuEdit.addAction(self.menu_crop_sensors)
+        self.menuEdit.addAction(self.menu_reset_pan)
+        self.menuZstack.addAction(self.menu_best_focus)
+        self.menuZstack.addAction(self.menu_focus_stack)
+        self.menuTidy.addAction(self.menu_tidy_csv)
+        self.menuTidy.addAction(self.menu_tidy_parquet)
+        self.menuTidy.addAction(self.menu_tidy_feather)
+        self.menuTidy.addAction(self.menu_tidy_hdf5)
+        self.menuTools.addAction(self.menu_options)
+        self.menuTools.addAction(self.menu_watch)
+        self.menuTools.addAction(self.menu_sweep)
+        self.menuTools.addAction(self.menuZstack.menuAction())
+        self.menuTools.addAction(self.menuTidy.menuAction())
+        self.menuBar.addAction(self.menuFile.menuAction())
+        self.menuBar.addAction(self.menuEdit.menuAction())
+        self.menuBar.addAction(self.menuTools.menuAction())
+
+        self.retranslateUi(MainWindow)
+        self.tabWidget.setCurrentIndex(0)
+        self.threshold_box.valueChanged['int'].connect(self.threshold_slider.setValue) # type: ignore
+        self.threshold_slider.valueChanged['int'].connect(self.threshold_box.setValue) # type: ignore
+        QtCore.QMetaObject.connectSlotsByName(MainWindow)
+
+    def retranslateUi(self, MainWindow):
+        _translate = QtCore.QCoreApplication.translate
+        MainWindow.setWindowTitle(_translate("MainWindow", "CMED Image Analysis"))
+        self.toggle_move.setToolTip(_translate("MainWindow", "Move Image"))
+        self.toggle_move.setText(_translate("MainWindow", "..."))
+        self.prev_im.setToolTip(_translate("MainWindow", "Load Previous Image"))
+        self.prev_im.setText(_translate("MainWindow", "..."))
+        self.next_im.setToolTip(_translate("MainWindow", "Load Next Image"))
+        self.next_im.setText(_translate("MainWindow", "..."))
+        self.zoom_plus.setText(_translate("MainWindow", "+"))
+        self.reset_zoom.setToolTip(_translate("MainWindow", "Fit Image to Canvas"))
+        self.reset_zoom.setText(_translate("MainWindow", "..."))
+        self.zoom_minus.setText(_translate("MainWindow", "-"))
+        self.calculate.setToolTip(_translate("MainWindow", "Calculate"))
+        self.calculate.setText(_translate("MainWindow", "..."))
+        self.draw.setToolTip(_translate("MainWindow", "Redraw"))
+        self.draw.setText(_translate("MainWindow", "..."))
+        self.set_base.setToolTip(_translate("MainWindow", "Set Base Image"))
+        self.set_base.setText(_translate("MainWindow", "..."))
+        self.clear_base.setText(_translate("MainWindow", "..."))
+        self.checkBox.setText(_translate("MainWindow", "Enable Circle Fit"))
+        self.tabWidget.setTabText(self.tabWidget.indexOf(self.bf), _translate("MainWindow", "Bright-field"))
+        self.tabWidget.setTabText(self.tabWidget.indexOf(self.tr), _translate("MainWindow", "Red Channel"))
+        self.open_folder.setText(_translate("MainWindow", "Open Folder"))
+        self.list_items_label.setText(_translate("MainWindow", "List of Images"))
+        self.threshold_label.setText(_translate("MainWindow", "Threshold:"))
+        self.minThreshold_label.setText(_translate("MainWindow", "0"))
+        self.maxThreshold_label.setText(_translate("MainWindow", "200"))
+        self.radius_label.setText(_translate("MainWindow", "Radius Range:"))
+        self.to_label.setText(_translate("MainWindow", "to"))
+        self.minRadius_label.setText(_translate("MainWindow", "0"))
+        self.maxRadius_label.setText(_translate("MainWindow", "1000"))
+        self.menuFile.setTitle(_translate("MainWindow", "File"))
+        self.menuExport_as.setTitle(_translate("MainWindow", "Export as"))
+        self.menuSingle.setTitle(_translate("MainWindow", "Single"))
+        self.menuAll.setTitle(_translate("MainWindow", "All"))
+        self.menuEdit.setTitle(_translate("MainWindow", "Edit"))
+        self.menuTools.setTitle(_translate("MainWindow", "Tools"))
+        self.menuZstack.setTitle(_translate("MainWindow", "Z-Stack"))
+        self.menuTidy.setTitle(_translate("MainWindow", "Also Export Tidy Data"))
+        self.menu_options.setText(_translate("MainWindow", "Options"))
+        self.menu_sweep.setText(_translate("MainWindow", "Parameter Sweep..."))
+        self.menu_watch.setText(_translate("MainWindow", "Live Mode (Watch Folder)"))
+        self.menu_best_focus.setText(_translate("MainWindow", "Go to Best Focus Slice"))
+        self.menu_focus_stack.setText(_translate("MainWindow", "Analyze Focus Stack"))
+        self.menu_tidy_csv.setText(_translate("MainWindow", "CSV (.csv)"))
+        self.menu_tidy_parquet.setText(_translate("MainWindow", "Parquet (.parquet)"))
+        self.menu_tidy_feather.setText(_translate("MainWindow", "Feather (.feather)"))
+        self.menu_tidy_hdf5.setText(_translate("MainWindow", "HDF5 (.h5)"))
+        self.menu_save_session.setText(_translate("MainWindow", "Save Session"))
+        self.menu_save_session.setShortcut(_translate("MainWindow", "Ctrl+S"))
+        self.menu_redraw.setText(_translate("MainWindow", "Recalculate"))
+        self.menu_recalculate.setText(_translate("MainWindow", "Redraw"))
+        self.menu_redetect_region.setText(_translate("MainWindow", "Re-detect Region"))
+        self.menu_redetect_region.setShortcut(_translate("MainWindow", "Ctrl+R"))
+        self.menu_threshold_preview.setText(_translate("MainWindow", "Threshold Preview"))
+        self.menu_threshold_preview.setShortcut(_translate("MainWindow", "Ctrl+T"))
+        self.menu_crop_sensors.setText(_translate("MainWindow", "Detect Sensors in Spheroids Only"))
+        self.menu_reset_pan.setText(_translate("MainWindow", "Reset Pan and Zoom"))
+        self.menu_single_excel.setText(_translate("MainWindow", "Excel (.xlsx)"))
+        self.menu_single_img.setText(_translate("MainWindow", "Image (.png)"))
+        self.menu_all_excel.setText(_translate("MainWindow", "Excel (.xlsx)"))
+        self.menu_all_img.setText(_translate("MainWindow", "Images (.png)"))
+from qrangeslider import QRangeSlider
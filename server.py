@@ -0,0 +1,246 @@
+import os
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen") # Qt objects are created but never shown --> no display needed
+
+import argparse
+import itertools
+import json
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlparse
+
+from Pipeline import STAGES, WorkerPool, makeJob
+
+HOST = "127.0.0.1" # Only reachable from this machine
+HOST_NAMES = ("127.0.0.1", "localhost") # Accepted Host headers, anything else is a page on another origin (DNS rebinding)
+DEFAULT_PORT = 8765
+DEFAULT_EXPORT_ROOT = os.path.join(os.path.expanduser("~"), "CMED Exports") # All jobs export under this folder
+
+
+class JobQueue:
+    """
+    Queue of analysis jobs run on a WorkerPool. Requests are handled on many threads, so they only touch the
+    job records (under a lock) and the submission queue. A single dispatcher thread owns the pool.
+    """
+    def __init__(self, workers=None, memoryLimit=None):
+        self.pool = WorkerPool(workers, memoryLimit)
+        self.submissions = queue.Queue() # Jobs waiting to be handed to the pool by the dispatcher
+        self.records = {} # {job id : record dictionary}, see submit()
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+        self.running = True
+        self.dispatcher = threading.Thread(target=self.dispatch, daemon=True)
+        self.dispatcher.start()
+
+    def submit(self, job):
+        """
+        Queues a job.
+        Args:
+          job: Job dictionary given by Pipeline.makeJob()
+        Returns:
+          Record of the new job.
+        """
+        with self.lock:
+            id_ = str(next(self.ids))
+            self.records[id_] = {"id": id_, "job": job, "status": "queued", "stage": None, "progress": 0.0,
+                                 "submitted": time.time(), "finished": None, "result": None}
+            record = dict(self.records[id_])
+        self.submissions.put((id_, job))
+        return record
+
+    def get(self, id_):
+        """Returns a copy of the record of a job, None if there is no such job"""
+        with self.lock:
+            record = self.records.get(id_)
+            return dict(record) if record is not None else None
+
+    def list(self):
+        """Returns copies of the records of all jobs, oldest first"""
+        with self.lock:
+            return [dict(record) for record in self.records.values()]
+
+    def dispatch(self):
+        """Dispatcher thread. Hands submitted jobs to the pool and applies worker messages to the job records."""
+        while self.running:
+            while True:
+                try:
+                    id_, job = self.submissions.get_nowait()
+                except queue.Empty:
+                    break
+                self.pool.submit(id_, job)
+            if self.pool.isIdle():
+                time.sleep(0.1)
+                continue
+            for id_, kind, value in self.pool.poll(timeout=0.1):
+                with self.lock:
+                    record = self.records[id_]
+                    if kind == "progress":
+                        record["status"], record["stage"] = "running", value
+                        record["progress"] = STAGES.index(value) / len(STAGES)
+                    else:
+                        record["status"], record["result"] = value["status"], value
+                        record["progress"], record["finished"] = 1.0, time.time()
+
+    def stop(self):
+        """Stops dispatching. Running workers are daemons and end with the server."""
+        self.running = False
+        self.dispatcher.join()
+
+def exportFolder(root, out, path):
+    """
+    Resolves the export folder of a job inside the export root of the server.
+    Args:
+      root: Real path of the export root.
+      out: Export folder requested by the client relative to the root, None for "<experiment> - Analysis".
+      path: Experiment folder of the job.
+    Returns:
+      Real path of the export folder.
+    Raises:
+      ValueError: If the folder is not inside the export root. Ex. "../other" or an absolute path elsewhere.
+    """
+    if out is None:
+        out = os.path.basename(os.path.normpath(path)) + " - Analysis"
+    outPath = os.path.realpath(os.path.join(root, out))
+    if outPath == root or os.path.commonpath([outPath, root]) != root:
+        raise ValueError("Export folder {} is not inside the export root {}".format(out, root))
+    return outPath
+
+def resultFiles(outPath):
+    """Returns the paths of all exported files in an export folder, relative to it"""
+    files = []
+    for folder, _, names in os.walk(outPath):
+        for name in names:
+            if not name.startswith("."):
+                files.append(os.path.relpath(os.path.join(folder, name), outPath).replace("\\", "/"))
+    return sorted(files)
+
+
+class JobHandler(BaseHTTPRequestHandler):
+    """
+    JSON API of the job server.
+      POST /jobs                      Submit a job. Body: {"path", "out", "bf", "tr", "baseId", "formats", "images"}, only path is required.
+                                      "out" is relative to the export root of the server. Content-Type must be application/json.
+      GET  /jobs                      Status of all jobs.
+      GET  /jobs/<id>                 Status, progress and result of a job.
+      GET  /jobs/<id>/files           List of the files exported by a job that is done.
+      GET  /jobs/<id>/files/<path>    Download an exported file.
+    Requests with a Host header other than localhost are refused, so web pages can't reach the API.
+    """
+    jobs = None # JobQueue, set by serve()
+    exportRoot = None # Real path of the folder all jobs export under, set by serve()
+
+    def checkHost(self):
+        """Returns True if the request is addressed to localhost, otherwise sends an error and returns False"""
+        host = urlparse("//" + self.headers.get("Host", "")).hostname
+        if host in HOST_NAMES:
+            return True
+        self.sendJson(403, {"error": "Forbidden host"})
+        return False
+
+    def do_GET(self):
+        if not self.checkHost():
+            return
+        parts = [unquote(part) for part in urlparse(self.path).path.strip("/").split("/")]
+        if parts == ["jobs"]:
+            return self.sendJson(200, self.jobs.list())
+        if len(parts) < 2 or parts[0] != "jobs":
+            return self.sendJson(404, {"error": "Not found"})
+        record = self.jobs.get(parts[1])
+        if record is None:
+            return self.sendJson(404, {"error": "No job {}".format(parts[1])})
+        if len(parts) == 2:
+            return self.sendJson(200, record)
+        if parts[2] != "files":
+            return self.sendJson(404, {"error": "Not found"})
+        if record["status"] != "done":
+            return self.sendJson(409, {"error": "Job {} is {}".format(parts[1], record["status"])})
+        outPath = os.path.realpath(record["job"]["out"])
+        if len(parts) == 3:
+            return self.sendJson(200, resultFiles(outPath))
+
+        # Only files inside the job's export folder can be downloaded
+        path = os.path.realpath(os.path.join(outPath, *parts[3:]))
+        if os.path.commonpath([path, outPath]) != outPath or not os.path.isfile(path):
+            return self.sendJson(404, {"error": "No file {}".format("/".join(parts[3:]))})
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(os.path.getsize(path)))
+        self.end_headers()
+        with open(path, "rb") as f:
+            while True:
+                chunk = f.read(2**16)
+                if not chunk:
+                    break
+                self.wfile.write(chunk)
+
+    def do_POST(self):
+        if not self.checkHost():
+            return
+        if urlparse(self.path).path.strip("/") != "jobs":
+            return self.sendJson(404, {"error": "Not found"})
+        # Forms can't send JSON without a CORS preflight, so other origins can't submit jobs
+        if self.headers.get_content_type() != "application/json":
+            return self.sendJson(415, {"error": "Content-Type must be application/json"})
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if not os.path.isdir(body["path"]):
+                return self.sendJson(400, {"error": "Folder {} does not exist".format(body["path"])})
+            out = exportFolder(self.exportRoot, body.get("out"), body["path"])
+            job = makeJob(body["path"], out, body.get("bf"), body.get("tr"), body.get("baseId"),
+                          body.get("formats", ()), body.get("images", False))
+        except (ValueError, KeyError, TypeError) as error:
+            return self.sendJson(400, {"error": "Invalid job: {}".format(error)})
+        self.sendJson(201, self.jobs.submit(job))
+
+    def sendJson(self, code, data):
+        """Sends a JSON response"""
+        body = json.dumps(data).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass # Keep the console for job messages
+
+def serve(port=DEFAULT_PORT, workers=None, memoryLimit=None, exportRoot=DEFAULT_EXPORT_ROOT):
+    """
+    Creates the job server, bound to localhost only. Call serve_forever() on the result to run it.
+    Args:
+      port: (Default value = 8765) Port to listen on, 0 for any free port.
+      workers: (Optional) Number of jobs run at the same time. Defaults to the number of cores.
+      memoryLimit: (Optional) Memory limit of every worker process in MB.
+      exportRoot: (Default value = DEFAULT_EXPORT_ROOT) Folder all jobs export under. Created if it doesn't exist.
+    Returns:
+      ThreadingHTTPServer with a jobs attribute holding its JobQueue.
+    """
+    os.makedirs(exportRoot, exist_ok=True)
+    jobs = JobQueue(workers, memoryLimit)
+    handler = type("Handler", (JobHandler,), {"jobs": jobs, "exportRoot": os.path.realpath(exportRoot)})
+    server = ThreadingHTTPServer((HOST, port), handler)
+    server.jobs = jobs
+    return server
+
+def main():
+    """Command line entry point. Run with --help for arguments."""
+    parser = argparse.ArgumentParser(description="Local job server for analysing experiment folders.")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, help="Number of folders analysed at once (Default: number of cores)")
+    parser.add_argument("--memory", type=float, help="Memory limit of every worker in MB")
+    parser.add_argument("--export-root", default=DEFAULT_EXPORT_ROOT, help="Folder all jobs export under (Default: %(default)s)")
+    args = parser.parse_args()
+
+    server = serve(args.port, args.workers, args.memory, args.export_root)
+    print("Job server listening on http://{}:{}/jobs".format(HOST, server.server_address[1]))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.jobs.stop()
+
+if __name__ == "__main__":
+    main()
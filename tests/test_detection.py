@@ -0,0 +1,34 @@
+import cv2
+import numpy as np
+
+import SyntheticData
+from Detection import detectInCircles, detectShapes, shapesInCircles
+
+
+def randomFrame(rng):
+    """Returns (8-bit TR frame, spheroid circles) of a random synthetic plate, normalized like Image.preprocessImg"""
+    size = tuple(int(n) for n in rng.integers(128, 512, 2))
+    spheroids = SyntheticData.makePlate(rng, size, int(rng.integers(1, 8)), int(rng.integers(1, 4)))
+    offset, growth = rng.normal(0, 20, 2), rng.uniform(0.8, 1.3)
+    _, tr = SyntheticData.renderPair(rng, size, spheroids, offset, growth, rng.uniform(5, 300))
+    circles, _ = SyntheticData.plateShapes(spheroids, offset, growth)
+    img = cv2.normalize(tr, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
+    # Circles don't always fit the spheroids, Ex. detected with other parameters, and may reach past the edges
+    circles = [[(x + int(rng.integers(-15, 16)), y + int(rng.integers(-15, 16))), max(r + int(rng.integers(-10, 30)), 1)]
+               for (x, y), r in circles]
+    circles.append([tuple(int(n) for n in rng.integers(-20, min(size) + 20, 2)), int(rng.integers(5, 80))])
+    return img, [circle + [str(i)] for i, circle in enumerate(circles, 1)]
+
+def test_cropped_detection_matches_full_frame():
+    rng = np.random.default_rng(0)
+    numCropped = 0
+    for _ in range(300):
+        img, circles = randomFrame(rng)
+        threshold, ellipse = int(rng.integers(40, 200)), bool(rng.integers(0, 2))
+        radiusRange = (int(rng.integers(1, 6)), int(rng.integers(10, 120)))
+        cropped = detectInCircles(img, threshold, radiusRange, ellipse, circles, workers=int(rng.integers(1, 3)))
+        if cropped is not None:
+            assert cropped == shapesInCircles(detectShapes(img, threshold, radiusRange, ellipse), circles)
+            numCropped = numCropped + 1
+    # None falls back to the full frame, it must stay the exception
+    assert numCropped > 200
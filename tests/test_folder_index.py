@@ -0,0 +1,51 @@
+import os
+
+from FolderIndex import INDEX_NAME, FolderIndex
+
+
+def makeFolder(path, names, age=60):
+    """Creates a folder with empty files, modified age seconds ago so its listing can be trusted, see RACY_SECONDS"""
+    path.mkdir()
+    for name in names:
+        (path / name).write_bytes(b"")
+    ageFolder(path, age)
+    return str(path)
+
+def ageFolder(path, age=60):
+    """Moves the modification time of a folder age seconds into the past"""
+    mtime = os.stat(path).st_mtime_ns - age * 10**9
+    os.utime(path, ns=(mtime, mtime))
+
+def test_saved_listing_is_reused(tmp_path):
+    folder = makeFolder(tmp_path / "E", ["a_z01_d2.tif", "b_z02_d2.tif"])
+    index = FolderIndex(folder)
+    index.listing(folder)
+    assert index.changed and index.save()
+    assert os.path.exists(os.path.join(folder, INDEX_NAME))
+
+    # Saving the index doesn't make the listing of its own folder look outdated
+    for reopened in (index, FolderIndex(folder)):
+        dirs, files = reopened.listing(folder)
+        assert dirs == [] and sorted(files) == ["a_z01_d2.tif", "b_z02_d2.tif"]
+        assert not reopened.changed and not reopened.save()
+
+    # Files added later are still found
+    (tmp_path / "E" / "c_z03_d2.tif").write_bytes(b"")
+    index = FolderIndex(folder)
+    assert sorted(index.listing(folder)[1]) == ["a_z01_d2.tif", "b_z02_d2.tif", "c_z03_d2.tif"]
+    assert index.changed
+
+def test_recent_listing_is_trusted_later(tmp_path):
+    folder = makeFolder(tmp_path / "E", ["a_z01_d2.tif"], age=0)
+    index = FolderIndex(folder)
+    index.listing(folder)
+    index.save()
+    assert index.folders[index.key(folder)]["mtime"] is None # Too recent, see RACY_SECONDS
+
+    ageFolder(folder)
+    index = FolderIndex(folder)
+    index.listing(folder)
+    assert index.changed and index.save() # The unchanged listing is now trusted and saved once
+    index = FolderIndex(folder)
+    index.listing(folder)
+    assert not index.changed
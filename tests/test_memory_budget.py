@@ -0,0 +1,41 @@
+import gc
+
+import SyntheticData
+from MemoryBudget import MemoryBudget, budget
+from Pipeline import makeJob, runJob
+
+
+class Owner:
+    """Stand-in for an image holding buffers"""
+    def __init__(self):
+        self.evicted = []
+
+    def evictBuffer(self, name):
+        self.evicted.append(name)
+
+def test_collected_owner_is_forgotten():
+    memory = MemoryBudget(limitMb=4)
+    kept, dropped = Owner(), Owner()
+    memory.register(kept, "pixels", "pixels", 2**19, kept.evictBuffer)
+    memory.register(dropped, "pixels", "pixels", 2**19, dropped.evictBuffer)
+    memory.register(dropped, "overlay", "overlay", 2**10, dropped.evictBuffer)
+    memory.pin([dropped])
+    del dropped
+    gc.collect()
+    assert memory.usage()[0] == 2**19 and not memory.pinned and list(memory.finalizers) == [id(kept)]
+
+    # Released owners can register again, and are still forgotten when collected
+    memory.releaseOwner(kept)
+    assert memory.usage()[0] == 0 and not memory.finalizers
+    memory.register(kept, "pixels", "pixels", 2**19, kept.evictBuffer)
+    del kept
+    gc.collect()
+    assert memory.usage()[0] == 0 and not memory.entries
+
+def test_job_releases_its_images(tmp_path):
+    path = str(tmp_path / "Plate")
+    SyntheticData.generateDataset(path, "days", numImages=2, size=(512, 512), numSpheroids=2)
+    before = budget.usage()[0]
+    result = runJob(makeJob(path, str(tmp_path / "out")))
+    assert result["status"] == "done", result["error"]
+    assert budget.usage()[0] == before
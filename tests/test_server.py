@@ -0,0 +1,88 @@
+import http.client
+import json
+import threading
+import time
+from urllib.parse import quote
+
+import pytest
+
+import SyntheticData
+from server import serve
+
+
+@pytest.fixture
+def server(tmp_path):
+    """Job server on a free localhost port, exporting under tmp_path/exports"""
+    server = serve(0, workers=1, exportRoot=str(tmp_path / "exports"))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    server.jobs.stop()
+
+def request(server, method, path, body=None, headers=None):
+    """Returns (status, body bytes) of a request to the server"""
+    conn = http.client.HTTPConnection("127.0.0.1", server.server_address[1], timeout=30)
+    try:
+        conn.request(method, path, body, headers or {})
+        response = conn.getresponse()
+        return response.status, response.read()
+    finally:
+        conn.close()
+
+def submit(server, job, contentType="application/json"):
+    return request(server, "POST", "/jobs", json.dumps(job), {"Content-Type": contentType})
+
+def test_job_round_trip(server, tmp_path):
+    path = str(tmp_path / "Plate")
+    SyntheticData.generateDataset(path, "days", numImages=2, size=(512, 512), numSpheroids=2)
+    status, body = submit(server, {"path": path, "out": "Plate Analysis", "formats": ["csv"]})
+    assert status == 201
+    id_ = json.loads(body)["id"]
+
+    deadline = time.time() + 120
+    while True:
+        record = json.loads(request(server, "GET", "/jobs/" + id_)[1])
+        if record["status"] in ("done", "failed") or time.time() > deadline:
+            break
+        time.sleep(0.2)
+    assert record["status"] == "done", record["result"]
+
+    status, body = request(server, "GET", "/jobs/{}/files".format(id_))
+    files = json.loads(body)
+    assert status == 200 and any(file.endswith(".xlsx") for file in files)
+    status, body = request(server, "GET", "/jobs/{}/files/{}".format(id_, quote(files[0])))
+    assert status == 200
+    assert body == (tmp_path / "exports" / "Plate Analysis" / files[0]).read_bytes()
+
+    # Downloads can't leave the export folder of the job
+    (tmp_path / "exports" / "secret.txt").write_text("secret")
+    for name in ("../secret.txt", "%2E%2E/secret.txt", "%2E%2E%2Fsecret.txt"):
+        assert request(server, "GET", "/jobs/{}/files/{}".format(id_, name))[0] == 404
+
+def test_refused_jobs(server, tmp_path):
+    path = str(tmp_path / "Plate")
+    (tmp_path / "Plate").mkdir()
+    for out in (str(tmp_path / "elsewhere"), "../elsewhere", "/", "."):
+        assert submit(server, {"path": path, "out": out})[0] == 400
+    assert submit(server, {"path": path}, "text/plain")[0] == 415
+    assert server.jobs.list() == []
+
+def test_failed_job_files_refused(server, tmp_path):
+    (tmp_path / "Empty").mkdir()
+    (tmp_path / "exports" / "Leak").mkdir()
+    (tmp_path / "exports" / "Leak" / "key.txt").write_text("key")
+    status, body = submit(server, {"path": str(tmp_path / "Empty"), "out": "Leak"})
+    id_ = json.loads(body)["id"]
+    deadline = time.time() + 60
+    while json.loads(request(server, "GET", "/jobs/" + id_)[1])["status"] not in ("done", "failed") and time.time() < deadline:
+        time.sleep(0.2)
+    assert json.loads(request(server, "GET", "/jobs/" + id_)[1])["status"] == "failed"
+    assert request(server, "GET", "/jobs/{}/files".format(id_))[0] == 409
+    assert request(server, "GET", "/jobs/{}/files/key.txt".format(id_))[0] == 409
+
+def test_foreign_host_refused(server):
+    assert request(server, "GET", "/jobs", headers={"Host": "evil.example:8765"})[0] == 403
+    assert request(server, "POST", "/jobs", "{}", {"Host": "evil.example", "Content-Type": "application/json"})[0] == 403
+    assert request(server, "GET", "/jobs", headers={"Host": "localhost"})[0] == 200
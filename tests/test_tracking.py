@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+
+import Image
+import SyntheticData
+from Pipeline import HeadlessViewer, NullProgress
+from Tracking import TrackChain, assign, shapePoints
+
+
+def greedyAssign(cost):
+    """Reference for assign(): every pair sorted by (cost, row, column), taken if its row and column are free"""
+    pairs = sorted((cost[r, c], r, c) for r in range(cost.shape[0]) for c in range(cost.shape[1]) if np.isfinite(cost[r, c]))
+    rows, cols, assigned = set(), set(), []
+    for _, r, c in pairs:
+        if r not in rows and c not in cols:
+            rows.add(r)
+            cols.add(c)
+            assigned.append((r, c))
+    return sorted(assigned)
+
+def test_assign_ties():
+    # Small integer costs make ties common, they go to the lowest row, then the lowest column
+    rng = np.random.default_rng(0)
+    for _ in range(2000):
+        cost = rng.integers(0, 4, rng.integers(0, 7, 2)).astype(float)
+        cost[rng.random(cost.shape) < 0.2] = np.inf
+        rows, cols = assign(cost)
+        assert sorted(zip(rows.tolist(), cols.tolist())) == greedyAssign(cost)
+    assert assign(np.full((3, 2), np.inf))[0].size == 0
+
+def test_chain_reuses_prefix():
+    rng = np.random.default_rng(1)
+    base = np.column_stack([rng.uniform(0, 1000, (8, 2)), rng.uniform(20, 40, 8)])
+    days = []
+    for day in range(1, 7):
+        points = base + [day * 3.0, day * -2.0, day * 0.5] + rng.normal(0, 1, base.shape)
+        days.append((("day", day), points[rng.permutation(len(points))], 150))
+    seed = (("base",), list("abcdefgh"), base)
+
+    chain = TrackChain()
+    links = chain.update(seed, days[:4])
+    states = list(chain.states)
+    assert chain.update(seed, days[:2]) == links[:2] # Days already linked are reused as they are
+    assert chain.update(seed, days)[:4] == links and chain.states[:5] == states
+
+    # A changed day is linked again, with every later day, the days before keep their states
+    changed = (("day", 3, "changed"), days[2][1][1:], 150)
+    relinked = chain.update(seed, days[:2] + [changed] + days[3:])
+    assert chain.states[:3] == states[:3] and chain.states[3] is not states[3]
+    assert relinked == TrackChain().update(seed, days[:2] + [changed] + days[3:])
+
+@pytest.fixture
+def driftViewer(tmp_path, monkeypatch):
+    """
+    12 days of 10 spheroids drifting 60 px a day, with the drift correction turned off so tracking alone follows it.
+    Matching every day to the closest base shapes gives over 30 shapes the wrong id here.
+    """
+    truth = []
+    SyntheticData.generateDataset(str(tmp_path / "E"), "timelapse", 12, (1024, 1024), 10, drift=60, seed=1, truth=truth)
+    monkeypatch.setattr(Image.Image, "getRegistration", lambda self: (0.0, 0.0, False))
+    viewer = HeadlessViewer(str(tmp_path / "E") + "/")
+    viewer.getImages(NullProgress())
+    for img in viewer.bfImages.list:
+        img.drawCircle(120, (40, 500), NullProgress())
+    viewer.bfImages.tracking = True
+    return viewer, [circles for circles, _ in truth]
+
+def trueSpheroid(shape, circles):
+    """Returns the index of the true spheroid closest to a detected circle"""
+    points = shapePoints(circles)
+    return int(np.argmin(np.hypot(points[:, 0] - shape[0][0], points[:, 1] - shape[0][1])))
+
+@pytest.mark.parametrize("baseId", ["p00", "p05"])
+def test_ids_follow_drift(driftViewer, baseId):
+    viewer, truth = driftViewer
+    viewer.setBaseImage(baseId)
+    days = sorted(viewer.bfImages.list, key=lambda img: img.id)
+    for img in days:
+        img.matchBaseShapes()
+
+    base = viewer.bfImages.baseImage
+    spheroids = {shape[-1]: trueSpheroid(shape, truth[days.index(base)]) for shape in base.shapes}
+    numLinked = numTracked = 0
+    for i, img in enumerate(days):
+        if img is base:
+            continue
+        # Linked spheroids keep the id of the same spheroid on the base day, before and after it
+        for id_, (shape, _) in img.base_shapes.items():
+            assert trueSpheroid(shape, truth[i]) == spheroids[id_]
+        numLinked = numLinked + len(img.base_shapes)
+        numTracked = numTracked + sum(trueSpheroid(shape, truth[i]) in spheroids.values() for shape in img.shapes)
+    # Spheroids drifting in and out of the edges may be dropped for a few days
+    assert numLinked >= 0.95 * numTracked